@@ -1,40 +1,142 @@
-from fastapi import Depends
+from contextlib import asynccontextmanager
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import (
+    HTTPAuthorizationCredentials,
+    HTTPBasic,
+    HTTPBasicCredentials,
+    HTTPBearer,
+)
+from app.core.config import settings
+from app.core.security import constant_time_eq
+from app.infrastructure.db import cursor
 from app.infrastructure.db.cursor import get_db
 from app.infrastructure.db.user_repo_pg import PostgresUserRepo
 from app.infrastructure.db.token_repo_pg import PostgresTokenRepo
-from app.infrastructure.smtp.smtp_client import SmtpMailer
+from app.infrastructure.db.idempotency_repo_pg import PostgresIdempotencyRepo
+from app.infrastructure.cache.idempotency_cached import (
+    CachedIdempotencyRepo,
+    idempotency_cache,
+)
+from app.infrastructure.cache.user_repo_cached import (
+    CachedUserRepo,
+    user_cache,
+)
+from app.infrastructure.ratelimit.limiter import Rule, limiter
 from app.domain.services.registration_service import RegistrationService
 from app.domain.services.activation_dispatcher_service import (
     ActivationDispatcherService,
 )
 from app.domain.services.activation_service import ActivationService
+from app.domain.services.idempotency_service import IdempotencyService
+from app.domain.services.user_listing_service import UserListingService
 
 
 def get_user_repo(conn=Depends(get_db)):
-    return PostgresUserRepo(conn)
+    repo = PostgresUserRepo(conn)
+    if settings.user_cache_enabled:
+        return CachedUserRepo(repo, user_cache)
+    return repo
 
 
 def get_token_repo(conn=Depends(get_db)):
     return PostgresTokenRepo(conn)
 
 
-def get_mailer():
-    return SmtpMailer()
-
-
 def get_registration_service(user_repo=Depends(get_user_repo)):
     return RegistrationService(user_repo)
 
 
-def get_activation_dispatcher_service(
-    token_repo=Depends(get_token_repo),
-    mailer=Depends(get_mailer),
+def get_activation_dispatcher_service(token_repo=Depends(get_token_repo)):
+    return ActivationDispatcherService(token_repo)
+
+
+def get_activation_service(user_repo=Depends(get_user_repo)):
+    return ActivationService(user_repo)
+
+
+def get_idempotency_service(conn=Depends(get_db)):
+    repo = CachedIdempotencyRepo(
+        PostgresIdempotencyRepo(conn),
+        idempotency_cache,
+        ttl=settings.idempotency_cache_ttl_seconds,
+    )
+    return IdempotencyService(
+        repo,
+        ttl_seconds=settings.idempotency_ttl_seconds,
+        lease_seconds=settings.idempotency_lease_seconds,
+        wait_seconds=settings.idempotency_wait_seconds,
+    )
+
+
+@asynccontextmanager
+async def open_user_repo():
+    """A read-only user repo outside of the request's dependencies, which are
+    torn down before a streaming body is sent. It holds no connection: each
+    read takes one from a replica, or from the primary pool without one."""
+    if cursor.pool is None:
+        raise RuntimeError("Database pool is not open")
+    yield get_user_repo(None)
+
+
+def get_user_listing_service():
+    return UserListingService(
+        open_user_repo, export_page_size=settings.admin_export_page_size
+    )
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def require_admin(
+    credentials: HTTPAuthorizationCredentials | None = Depends(_bearer),
 ):
-    return ActivationDispatcherService(token_repo, mailer)
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if credentials is None or not constant_time_eq(
+        credentials.credentials, settings.admin_token
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 
+basic_auth = HTTPBasic()
 
-def get_activation_service(
-    user_repo=Depends(get_user_repo),
-    token_repo=Depends(get_token_repo),
+_activate_per_ip = Rule.parse("activate_ip", settings.ratelimit_activate_per_ip)
+_activate_per_email = Rule.parse(
+    "activate_email", settings.ratelimit_activate_per_email
+)
+# per email, resends are bounded by the cooldown enforced in Postgres
+_resend_per_ip = Rule.parse("resend_ip", settings.ratelimit_resend_per_ip)
+
+
+async def limit_activation(
+    request: Request,
+    credentials: HTTPBasicCredentials = Depends(basic_auth),
 ):
-    return ActivationService(user_repo, token_repo)
+    """429 before any DB or hashing work; use as a route-level dependency so
+    it runs ahead of the ones that take a connection."""
+    if not settings.ratelimit_enabled:
+        return
+    ip = request.client.host if request.client else "unknown"
+    retry_after = await limiter.check(
+        (_activate_per_ip, ip),
+        (_activate_per_email, credentials.username.lower()),
+    )
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def limit_resend(request: Request):
+    if not settings.ratelimit_enabled:
+        return
+    ip = request.client.host if request.client else "unknown"
+    retry_after = await limiter.check((_resend_per_ip, ip))
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,97 @@
+"""Streaming parsers for bulk user imports (CSV with a header, or NDJSON).
+
+Rows are validated with the same ``UserCreate`` schema as ``POST /users``
+and turned into ``ImportRow``s; invalid rows carry their error instead of
+aborting the import.
+"""
+
+import csv
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable
+from pydantic import ValidationError
+from starlette.responses import StreamingResponse
+from app.api.schemas.users import UserCreate
+from app.domain.services.import_service import ImportRow
+
+MAX_LINE_BYTES = 64 * 1024
+
+
+def validate(line: int, record) -> ImportRow:
+    try:
+        user = UserCreate.model_validate(record)
+    except ValidationError as e:
+        err = e.errors()[0]
+        field = ".".join(str(part) for part in err["loc"]) or "row"
+        return ImportRow(line=line, error=f"{field}: {err['msg']}")
+    return ImportRow(line=line, email=user.email, password=user.password)
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into lines without buffering more than one line."""
+    buffer = b""
+    async for chunk in chunks:
+        # the carried-over partial line has no newline: scan the new bytes only
+        scan_from = len(buffer)
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", scan_from)) != -1:
+            yield buffer[start:end].decode("utf-8").rstrip("\r")
+            start = scan_from = end + 1
+        buffer = buffer[start:]
+        if len(buffer) > MAX_LINE_BYTES:
+            raise ValueError(f"Line longer than {MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+
+class UploadReportResponse(StreamingResponse):
+    """Streams a report while the request body is still being read.
+
+    On ASGI < 2.4 StreamingResponse also listens for the client going
+    away, by calling ``receive()`` alongside the body: it takes the
+    ``http.request`` messages the report is computed from, and the upload
+    stalls. Here only the body reader calls ``receive()``, and a client
+    that leaves surfaces there as a ``ClientDisconnect``.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def aiter_sync(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line.rstrip("\r\n")
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[ImportRow]:
+    # one record per line: quoted fields may not contain newlines
+    header = None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield ImportRow(line=line_no, error=f"row: expected {len(header)} fields")
+            continue
+        yield validate(line_no, dict(zip(header, values)))
+
+
+async def parse_ndjson(lines: AsyncIterable[str]) -> AsyncIterator[ImportRow]:
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ImportRow(line=line_no, error=f"row: invalid JSON ({e.msg})")
+            continue
+        yield validate(line_no, record)
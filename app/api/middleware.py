@@ -0,0 +1,63 @@
+import asyncio
+import time
+from app.core.metrics import errors, http_request_duration
+from app.core.profiler import profiler
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: records one histogram sample per HTTP request,
+    labelled with the route template (``/users/import``, never a raw path,
+    so label cardinality stays bounded)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            errors.inc(type(e).__name__)
+            raise
+        finally:
+            # FastAPI stores the matched route in the scope while routing
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+
+
+class ProfilerMiddleware:
+    """Lets a running profiling session attribute event loop samples to
+    the request being served. Without a session it only checks for one."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if session is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        session.track(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.untrack(task)
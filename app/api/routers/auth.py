@@ -1,24 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from app.api.schemas.tokens import ActivationRequest
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPBasicCredentials
+from app.api.schemas.tokens import ActivationRequest, ResendRequest
 
-from app.api.dependencies import get_activation_service
-from app.core.exceptions import InvalidOTP, ExpiredOTP
+from app.api.dependencies import (
+    basic_auth,
+    get_activation_dispatcher_service,
+    get_activation_service,
+    limit_activation,
+    limit_resend,
+)
+from app.core.exceptions import InvalidOTP, ExpiredOTP, HasherBusy, TokenLocked
+from app.core.metrics import errors
 
-security = HTTPBasic()
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-@router.post("/activate")
-def activate(
+@router.post("/activate", dependencies=[Depends(limit_activation)])
+async def activate(
     payload: ActivationRequest,
-    credentials: HTTPBasicCredentials = Depends(security),
+    credentials: HTTPBasicCredentials = Depends(basic_auth),
     service=Depends(get_activation_service),
 ):
     try:
-        service.activate(credentials.username, credentials.password, payload.code)
+        await service.activate(credentials.username, credentials.password, payload.code)
         return {"detail": "Account activated"}
     except InvalidOTP:
+        errors.inc("InvalidOTP")
         raise HTTPException(status_code=400, detail="Invalid code")
     except ExpiredOTP:
+        errors.inc("ExpiredOTP")
         raise HTTPException(status_code=410, detail="Code expired")
+    except TokenLocked:
+        errors.inc("TokenLocked")
+        raise HTTPException(
+            status_code=429, detail="Too many wrong codes, request a new one"
+        )
+    except HasherBusy as e:
+        errors.inc("HasherBusy")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+@router.post(
+    "/resend",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_resend)],
+)
+async def resend(
+    payload: ResendRequest,
+    dispatcher=Depends(get_activation_dispatcher_service),
+):
+    try:
+        await dispatcher.resend_code(payload.email)
+    except HasherBusy as e:
+        errors.inc("HasherBusy")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    # same answer whether or not a code was issued: no account enumeration
+    return {"detail": "If the account is awaiting activation, a new code is on its way"}
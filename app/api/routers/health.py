@@ -0,0 +1,61 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core.metrics import mail_breaker_state, metrics
+from app.infrastructure.cache.user_repo_cached import user_cache
+from app.infrastructure.db import cursor, replicas
+from app.infrastructure.db.statements import registry
+from app.infrastructure.ratelimit.limiter import limiter
+from app.infrastructure.smtp.circuit_breaker import relay_breaker
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+# The stats endpoints are async: they read state the event loop updates
+# (pools, counters, cache and limiter tables), which must not be read from
+# the threadpool.
+
+
+@router.get("")
+def health():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    stats = cursor.pool_stats()
+    if stats is None:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "pool": stats}
+
+
+@router.get("/replicas")
+async def replica_stats():
+    if replicas.router is None:
+        return {"replicas": []}
+    return replicas.router.stats()
+
+
+@router.get("/statements")
+async def statement_stats():
+    return registry.stats()
+
+
+@router.get("/cache")
+async def cache_stats():
+    return user_cache.stats()
+
+
+@router.get("/ratelimit")
+async def ratelimit_stats():
+    return limiter.stats()
+
+
+@router.get("/mail")
+async def mail_stats():
+    """This process' relay breaker, and with METRICS_DIR how many processes
+    (the mail workers) are in each state."""
+    processes = {}
+    for key, value in metrics.collect().get(mail_breaker_state.name, {}).items():
+        name, state = key.split("|")
+        if name == relay_breaker.name and value:
+            processes[state] = value
+    return {"breaker": relay_breaker.stats(), "processes": processes}
@@ -0,0 +1,44 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.api.dependencies import require_admin
+from app.core.config import settings
+from app.core.exceptions import ProfilerBusy
+from app.core.profiler import profiler
+
+router = APIRouter(
+    prefix="/debug", tags=["debug"], dependencies=[Depends(require_admin)]
+)
+
+
+@router.post("/profile")
+async def profile(
+    seconds: float = Query(10, gt=0, le=settings.profiler_max_seconds),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    by_route: bool = False,
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+):
+    """Sample the stacks of the worker serving this request for ``seconds``.
+
+    ``format=collapsed`` answers a folded-stacks file for flamegraph.pl or
+    speedscope; ``format=json`` the summary, per-route event loop samples
+    included, with the folded stacks under ``collapsed``. ``by_route``
+    roots the event loop's stacks at the route being served.
+    """
+    try:
+        session = await profiler.profile(
+            seconds, interval_ms / 1000, max_stacks=settings.profiler_max_stacks
+        )
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=409, detail="A profile is already running in this worker"
+        )
+    collapsed = session.collapsed(by_route)
+    if format == "json":
+        return {"pid": os.getpid(), **session.summary(), "collapsed": collapsed}
+    return PlainTextResponse(
+        collapsed,
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{os.getpid()}.folded"'
+        },
+    )
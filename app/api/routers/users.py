@@ -1,25 +1,167 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.api.schemas.users import UserCreate, UserIdResponse
-from app.core.exceptions import UserAlreadyExists, MailerError
+import hashlib
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from psycopg.rows import dict_row
+from app.api.importing import (
+    UploadReportResponse,
+    iter_lines,
+    parse_csv,
+    parse_ndjson,
+)
+from app.api.pagination import decode_cursor, encode_cursor
+from app.api.schemas.users import (
+    UserCreate,
+    UserIdResponse,
+    UserPage,
+    UserSummaryOut,
+)
+from app.core.config import settings
+from app.core.exceptions import (
+    HasherBusy,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+    UserAlreadyExists,
+)
+from app.core.metrics import errors
 from app.api.dependencies import (
+    get_idempotency_service,
     get_registration_service,
-    get_activation_dispatcher_service,
+    get_user_listing_service,
+    get_user_repo,
+    require_admin,
 )
+from app.domain.entities.user import UserFilter
+from app.domain.services.import_service import ImportService
+from app.infrastructure.db import cursor
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("", response_model=UserIdResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     payload: UserCreate,
+    idempotency_key: str | None = Header(None, max_length=255),
     reg_service=Depends(get_registration_service),
-    dispatcher=Depends(get_activation_dispatcher_service),
+    idempotency=Depends(get_idempotency_service),
 ):
+    async def register() -> tuple[int, dict]:
+        try:
+            # user, token and outbox row in one statement; the worker sends the mail
+            user_id = await reg_service.register_user(payload.email, payload.password)
+            return 201, {"id": user_id}
+        except UserAlreadyExists:
+            errors.inc("UserAlreadyExists")
+            return 409, {"detail": "Email already exists"}
+
     try:
-        user_id = reg_service.register_user(payload.email, payload.password)
-        dispatcher.dispatch_code(user_id, payload.email)
-        return {"id": user_id}
-    except UserAlreadyExists:
-        raise HTTPException(status_code=409, detail="Email already exists")
-    except MailerError:
-        raise HTTPException(status_code=503, detail="Could not send activation email")
+        if idempotency_key is None:
+            status_code, body = await register()
+            headers = None
+        else:
+            # the password is never stored, not even hashed
+            fingerprint = hashlib.sha256(payload.email.lower().encode()).hexdigest()
+            stored, replayed = await idempotency.run(
+                f"users:{idempotency_key}", fingerprint, register
+            )
+            status_code, body = stored.status_code, stored.body
+            headers = {"Idempotent-Replayed": "true"} if replayed else None
+    except IdempotencyKeyMismatch:
+        raise HTTPException(
+            status_code=422, detail="Idempotency-Key reused for another request"
+        )
+    except IdempotencyKeyInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is in progress",
+            headers={"Retry-After": "1"},
+        )
+    except HasherBusy as e:
+        errors.inc("HasherBusy")
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return JSONResponse(body, status_code=status_code, headers=headers)
+
+
+@router.get("", response_model=UserPage, dependencies=[Depends(require_admin)])
+async def list_users(
+    page_cursor: str | None = Query(None, alias="cursor"),
+    limit: int = Query(
+        settings.admin_list_default_limit, ge=1, le=settings.admin_list_max_limit
+    ),
+    is_active: bool | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    email_prefix: str | None = Query(None, min_length=1, max_length=255),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    listing=Depends(get_user_listing_service),
+):
+    """Users ordered by (created_at, id). ``format=json`` returns one page
+    and the cursor of the next; ``format=ndjson`` streams every match from
+    the cursor on, one user per line."""
+    for bound in (created_from, created_to):
+        if bound is not None and bound.tzinfo is None:
+            raise HTTPException(status_code=422, detail="Timestamps need a timezone")
+    try:
+        after = decode_cursor(page_cursor) if page_cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    filters = UserFilter(
+        is_active=is_active,
+        created_from=created_from,
+        created_to=created_to,
+        email_prefix=email_prefix,
+    )
+
+    if format == "ndjson":
+
+        async def lines():
+            async for user in listing.export(filters, after):
+                yield UserSummaryOut.model_validate(user).model_dump_json() + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    users, next_after = await listing.page(filters, after, limit)
+    return UserPage(
+        items=[UserSummaryOut.model_validate(u) for u in users],
+        next_cursor=encode_cursor(*next_after) if next_after else None,
+    )
+
+
+@router.post("/import", dependencies=[Depends(require_admin)])
+async def import_users(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$"),
+):
+    """Bulk import from a streamed CSV (``email,password`` header) or NDJSON
+    body. Answers with an NDJSON report, one line per input row."""
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    parse = parse_csv if format == "csv" else parse_ndjson
+
+    async def report():
+        # the connection is taken here, not through Depends: dependencies are
+        # torn down before a streaming body is sent
+        async with cursor.pool.connection() as conn:
+            conn.row_factory = dict_row
+            service = ImportService(
+                get_user_repo(conn),
+                chunk_size=settings.import_chunk_size,
+                hash_concurrency=settings.import_hash_concurrency,
+                otp_length=settings.otp_length,
+                otp_ttl_seconds=settings.import_otp_ttl_seconds,
+            )
+            rows = parse(iter_lines(request.stream()))
+            try:
+                async for entry in service.import_rows(rows):
+                    yield json.dumps(entry) + "\n"
+            except ValueError as e:
+                # rows reported so far are committed; the rest was not read
+                yield json.dumps({"status": "aborted", "error": str(e)}) + "\n"
+
+    return UploadReportResponse(report(), media_type="application/x-ndjson")
@@ -1,10 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, EmailStr
 
 
 class ActivationRequest(BaseModel):
     code: str
 
 
+class ResendRequest(BaseModel):
+    email: EmailStr
+
+
 class TokenOut(BaseModel):
     id: int
     user_id: int
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 
 
 class UserCreate(BaseModel):
@@ -8,3 +9,18 @@ class UserCreate(BaseModel):
 
 class UserIdResponse(BaseModel):
     id: int
+
+
+class UserSummaryOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    email: str
+    is_active: bool
+    created_at: datetime
+
+
+class UserPage(BaseModel):
+    items: list[UserSummaryOut]
+    # pass back as ?cursor= for the next page; null on the last one
+    next_cursor: str | None
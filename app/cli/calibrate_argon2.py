@@ -0,0 +1,44 @@
+"""Benchmark Argon2 on this host and print parameters within budget as JSON.
+
+python -m app.cli.calibrate_argon2 [--target-ms 250] [--memory-kib 65536]
+                                   [--parallelism 2] [--write params.json]
+
+Run it on the hardware the API runs on. Put the printed ``env`` in the
+deployment, or pass ``--write`` and point ARGON2_PARAMS_FILE at the file.
+Existing hashes are upgraded as their owners activate.
+"""
+
+import argparse
+import json
+from app.core.calibration import calibrate, store_params
+from app.core.config import settings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=settings.argon2_target_ms)
+    parser.add_argument(
+        "--memory-kib", type=int, default=settings.argon2_memory_budget_kib
+    )
+    parser.add_argument("--parallelism", type=int, default=settings.argon2_parallelism)
+    parser.add_argument("--write", metavar="PATH")
+    args = parser.parse_args()
+
+    params, elapsed = calibrate(args.target_ms, args.memory_kib, args.parallelism)
+    if args.write:
+        params = store_params(args.write, params)
+    print(
+        json.dumps(
+            {
+                "params": params.__dict__,
+                "measured_ms": round(elapsed, 1),
+                # peak hashing memory of one API process
+                "peak_memory_kib": params.memory_cost * settings.hash_workers,
+                "env": {
+                    "ARGON2_TIME_COST": params.time_cost,
+                    "ARGON2_MEMORY_COST": params.memory_cost,
+                    "ARGON2_PARALLELISM": params.parallelism,
+                },
+            },
+            indent=2,
+        )
+    )
@@ -0,0 +1,59 @@
+"""Bulk import users from a file, printing an NDJSON report to stdout.
+
+    python -m app.cli.import_users users.csv
+    python -m app.cli.import_users users.ndjson --format ndjson
+
+CSV files need an ``email,password`` header. The format defaults to the
+file extension.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from psycopg.rows import dict_row
+from app.api.importing import aiter_sync, parse_csv, parse_ndjson
+from app.core.config import settings
+from app.core.hashing import executor
+from app.domain.services.import_service import ImportService
+from app.infrastructure.db import cursor
+from app.infrastructure.db.user_repo_pg import PostgresUserRepo
+
+
+async def run(path: str, format: str) -> dict[str, int]:
+    parse = parse_csv if format == "csv" else parse_ndjson
+    totals: dict[str, int] = {}
+    await cursor.open_pool(min_size=1, max_size=1)
+    try:
+        async with cursor.pool.connection() as conn:
+            conn.row_factory = dict_row
+            service = ImportService(
+                PostgresUserRepo(conn),
+                chunk_size=settings.import_chunk_size,
+                hash_concurrency=settings.import_hash_concurrency,
+                otp_length=settings.otp_length,
+                otp_ttl_seconds=settings.import_otp_ttl_seconds,
+            )
+            with open(path, encoding="utf-8", newline="") as f:
+                async for entry in service.import_rows(parse(aiter_sync(f))):
+                    print(json.dumps(entry))
+                    totals[entry["status"]] = totals.get(entry["status"], 0) + 1
+    finally:
+        await cursor.close_pool()
+        executor.shutdown()
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    args = parser.parse_args()
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    totals = asyncio.run(run(args.path, format))
+    print(json.dumps(totals), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
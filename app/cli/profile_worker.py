@@ -0,0 +1,64 @@
+"""Profile a running API worker and save its stacks for a flamegraph.
+
+python -m app.cli.profile_worker [--url http://localhost:8000] [--seconds 10]
+                                 [--interval-ms 10] [--by-route]
+                                 [--output profile.folded]
+
+Calls POST /debug/profile with ADMIN_TOKEN, writes the folded stacks to
+``--output`` (render them with ``flamegraph.pl profile.folded > out.svg`` or
+open them in speedscope) and prints the summary, per-route event loop
+samples included, as JSON. Under gunicorn the request profiles whichever
+worker accepts it: the ``pid`` of the summary says which.
+"""
+
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from app.core.config import settings
+
+
+def fetch(
+    url: str, token: str, seconds: float, interval_ms: float, by_route: bool
+) -> dict:
+    query = urllib.parse.urlencode(
+        {
+            "seconds": seconds,
+            "interval_ms": interval_ms,
+            "by_route": str(by_route).lower(),
+            "format": "json",
+        }
+    )
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/debug/profile?{query}",
+        method="POST",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    with urllib.request.urlopen(request, timeout=seconds + 30) as response:
+        return json.load(response)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval-ms", type=float, default=10)
+    parser.add_argument("--by-route", action="store_true")
+    parser.add_argument("--output", default="profile.folded")
+    args = parser.parse_args()
+
+    try:
+        report = fetch(
+            args.url,
+            settings.admin_token,
+            args.seconds,
+            args.interval_ms,
+            args.by_route,
+        )
+    except urllib.error.HTTPError as e:
+        sys.exit(f"{e.code}: {e.read().decode(errors='replace')}")
+    with open(args.output, "w") as f:
+        f.write(report.pop("collapsed"))
+    print(json.dumps({"output": args.output, **report}, indent=2))
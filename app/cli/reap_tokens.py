@@ -0,0 +1,23 @@
+"""Reap dead activation tokens once and print the report as JSON.
+
+python -m app.cli.reap_tokens
+"""
+
+import asyncio
+import json
+import logging
+from app.infrastructure.db import cursor
+from app.workers.token_reaper import reap_once
+
+
+async def run() -> dict:
+    await cursor.open_pool(min_size=1, max_size=1)
+    try:
+        return await reap_once()
+    finally:
+        await cursor.close_pool()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(run())))
@@ -0,0 +1,99 @@
+"""Profile worker boot: where import time goes, optionally the lifespan too.
+
+python -m app.cli.startup_profile [--module app.main] [--top 15] [--lifespan]
+
+Imports run in a fresh interpreter under ``-X importtime``, so modules the
+current process already loaded do not hide their cost. The JSON report
+lists the total, the slowest modules (cumulative, children included) and
+self time summed per top-level package. ``--lifespan`` also times the
+FastAPI startup (pool warm-up), which needs the database.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import re
+import subprocess
+import sys
+import time
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_importtime(output: str) -> list[dict]:
+    """Rows of ``-X importtime`` output: module, self and cumulative ms, depth."""
+    rows = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue  # the header or unrelated stderr
+        self_us, cumulative_us, indent, module = match.groups()
+        rows.append(
+            {
+                "module": module,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2,
+            }
+        )
+    return rows
+
+
+def summarize(rows: list[dict], module: str, top: int) -> dict:
+    total = next((r["cumulative_ms"] for r in rows if r["module"] == module), None)
+    packages: dict[str, float] = {}
+    for row in rows:
+        package = row["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + row["self_ms"]
+    slowest = sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)
+    return {
+        "module": module,
+        "total_ms": total,
+        "modules_imported": len(rows),
+        "slowest_modules": [
+            {k: r[k] for k in ("module", "cumulative_ms", "self_ms")}
+            for r in slowest[:top]
+        ],
+        "packages_self_ms": {
+            name: round(ms, 3)
+            for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+        },
+    }
+
+
+def profile_imports(module: str, top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return summarize(parse_importtime(result.stderr), module, top)
+
+
+async def profile_lifespan(module: str) -> dict:
+    start = time.perf_counter()
+    app = importlib.import_module(module).app
+    imported = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return {
+        "import_ms": round((imported - start) * 1000, 3),
+        "lifespan_startup_ms": round((ready - imported) * 1000, 3),
+        "lifespan_shutdown_ms": round((time.perf_counter() - ready) * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--lifespan", action="store_true")
+    args = parser.parse_args()
+
+    report = {"imports": profile_imports(args.module, args.top)}
+    if args.lifespan:
+        report["lifespan"] = asyncio.run(profile_lifespan(args.module))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,8 @@
+"""Retry delays shared by the outbox worker and the mail relay client."""
+
+import random
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given (1-based) attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
@@ -0,0 +1,120 @@
+"""Argon2 parameters calibrated to this host.
+
+Memory is fixed by the budget (every concurrent hash holds ``memory_cost``
+KiB), then the number of passes is the largest that keeps one hash under
+the latency target. If a single pass is already too slow, memory is halved
+down to ``MIN_MEMORY_KIB``.
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from typing import Callable
+from app.core.config import settings
+from app.core.security import (
+    Argon2Params,
+    argon2_params,
+    hash_password,
+    set_argon2_params,
+)
+
+logger = logging.getLogger("calibration")
+
+# OWASP's floor for Argon2id: 19 MiB
+MIN_MEMORY_KIB = 19 * 1024
+MAX_TIME_COST = 10
+
+
+def measure_ms(params: Argon2Params, samples: int = 3) -> float:
+    """Median wall time of one hash, in milliseconds."""
+    timings = []
+    for i in range(samples):
+        start = time.perf_counter()
+        hash_password(f"calibration-{i}", params)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(
+    target_ms: float,
+    memory_kib: int,
+    parallelism: int,
+    measure: Callable[[Argon2Params], float] = measure_ms,
+) -> tuple[Argon2Params, float]:
+    """The strongest parameters within budget, and their measured latency."""
+    if memory_kib < MIN_MEMORY_KIB:
+        logger.warning("memory budget raised to the %d KiB floor", MIN_MEMORY_KIB)
+    memory = max(memory_kib, MIN_MEMORY_KIB, 8 * parallelism)
+    while True:
+        params = Argon2Params(1, memory, parallelism)
+        one_pass = measure(params)
+        if one_pass <= target_ms or memory == MIN_MEMORY_KIB:
+            break
+        memory = max(MIN_MEMORY_KIB, memory // 2)
+    if one_pass > target_ms:
+        logger.warning(
+            "one Argon2 pass at %d KiB takes %.0fms, over the %.0fms target",
+            memory,
+            one_pass,
+            target_ms,
+        )
+        return params, one_pass
+
+    # time grows linearly with passes: estimate, then step down until it fits
+    time_cost = max(1, min(MAX_TIME_COST, int(target_ms // one_pass)))
+    while time_cost > 1:
+        params = Argon2Params(time_cost, memory, parallelism)
+        elapsed = measure(params)
+        if elapsed <= target_ms:
+            return params, elapsed
+        time_cost -= 1
+    return Argon2Params(1, memory, parallelism), one_pass
+
+
+def load_params(path: str) -> Argon2Params | None:
+    try:
+        with open(path) as f:
+            return Argon2Params(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def store_params(path: str, params: Argon2Params) -> Argon2Params:
+    """Write ``params`` unless another process got there first; returns the
+    parameters in the file, so every worker ends up hashing alike."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(params.__dict__, f)
+    try:
+        os.link(tmp, path)  # atomic, and fails if the file exists
+    except FileExistsError:
+        params = load_params(path)
+    finally:
+        os.remove(tmp)
+    return params
+
+
+def configure_argon2() -> Argon2Params:
+    """Startup step: parameters from ARGON2_PARAMS_FILE, else calibrated when
+    ARGON2_CALIBRATE=1, else the ARGON2_* settings. CPU-bound when it
+    calibrates; run it off the event loop. Under gunicorn the master runs it
+    first (``on_starting``), so workers find the file instead of all
+    calibrating at once on the same cores."""
+    path = settings.argon2_params_file
+    if settings.argon2_calibrate and not path:
+        # every process would calibrate, concurrently, to its own result
+        raise RuntimeError("ARGON2_CALIBRATE=1 requires ARGON2_PARAMS_FILE")
+    params = load_params(path) if path else None
+    if params is None and settings.argon2_calibrate:
+        params, elapsed = calibrate(
+            settings.argon2_target_ms,
+            settings.argon2_memory_budget_kib,
+            settings.argon2_parallelism,
+        )
+        logger.info("calibrated Argon2 %s: %.0fms per hash", params, elapsed)
+        params = store_params(path, params)
+    if params is not None:
+        set_argon2_params(params)
+    return argon2_params()
@@ -10,7 +10,55 @@ class ExpiredOTP(Exception):
     pass
 
 
+class TokenLocked(Exception):
+    """Raised when a token has seen too many wrong codes."""
+
+    pass
+
+
 class MailerError(Exception):
     """Raised when mail delivery fails."""
 
+    # a batch send that failed part-way: how many leading messages went out
+    delivered = 0
+
+
+class MailerRejected(MailerError):
+    """Raised when the relay refuses a payload (4xx): retrying will not help."""
+
+    # how many messages after ``delivered`` were refused; 0 for all of them
+    rejected = 0
+
+
+class MailerUnavailable(MailerError):
+    """Raised without calling the relay while its circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Mail relay circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class IdempotencyKeyMismatch(Exception):
+    """Raised when an Idempotency-Key is reused for a different request."""
+
+    pass
+
+
+class IdempotencyKeyInProgress(Exception):
+    """Raised when the first request with a key is still running."""
+
+    pass
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling session is already running in this process."""
+
     pass
@@ -0,0 +1,41 @@
+"""Checks that a preloaded application can be forked safely.
+
+With gunicorn's ``preload_app`` the app is imported once in the master and
+the workers are forked from it. Anything holding a socket, a thread or a
+child process at that point would be shared by every worker, so pools and
+clients are only ever created in the lifespan. ``assert_fork_safe`` is
+called from the master's ``pre_fork`` hook to keep it that way.
+
+Modules are looked up in ``sys.modules`` rather than imported, so calling
+this from a master that did not preload the app imports nothing.
+"""
+
+import asyncio
+import sys
+
+
+def live_resources() -> list[str]:
+    found = []
+    cursor = sys.modules.get("app.infrastructure.db.cursor")
+    if cursor is not None and cursor.pool is not None:
+        found.append("database pool (app.infrastructure.db.cursor.pool)")
+    replicas = sys.modules.get("app.infrastructure.db.replicas")
+    if replicas is not None and replicas.router is not None:
+        found.append("replica pools (app.infrastructure.db.replicas.router)")
+    hashing = sys.modules.get("app.core.hashing")
+    if hashing is not None and hashing.executor._pool is not None:
+        found.append("hashing process pool (app.core.hashing.executor)")
+    profiler = sys.modules.get("app.core.profiler")
+    if profiler is not None and profiler.profiler.session is not None:
+        found.append("profiler thread (app.core.profiler.profiler)")
+    if asyncio._get_running_loop() is not None:
+        found.append("running event loop")
+    return found
+
+
+def assert_fork_safe() -> None:
+    found = live_resources()
+    if found:
+        raise RuntimeError(
+            "Created before fork: " + ", ".join(found) + "; open it in the lifespan"
+        )
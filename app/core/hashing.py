@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.core.config import settings
+from app.core.exceptions import HasherBusy
+
+
+class HashingExecutor:
+    """Runs Argon2 work in a process pool with a bounded number of pending jobs.
+
+    Jobs beyond ``max_pending`` are rejected with ``HasherBusy`` instead of
+    queueing, so a signup burst turns into fast 503s rather than requests
+    piling up behind the CPU.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy(self.retry_after)
+            if self._pool is None:
+                # spawn: never fork a process that already runs an event loop
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            self._pending += 1
+            pool = self._pool
+
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, _future: Future | None = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _after_fork_in_child(self) -> None:
+        # a pool inherited from the parent talks to the parent's processes
+        # over pipes the child must not share; start over lazily
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+
+executor = HashingExecutor(
+    max_workers=settings.hash_workers,
+    max_pending=settings.hash_max_pending,
+    retry_after=settings.hash_retry_after_seconds,
+)
+os.register_at_fork(after_in_child=executor._after_fork_in_child)
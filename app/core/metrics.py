@@ -0,0 +1,341 @@
+"""In-process Prometheus-style metrics: counters and histograms.
+
+Recording is a dict lookup plus a few integer updates, cheap enough to
+stay on in production. Under gunicorn every worker keeps its own values;
+with ``METRICS_DIR`` set each process periodically writes a snapshot to
+``<dir>/metrics-<pid>.json`` and ``render()`` sums all of them, so any
+worker can answer a scrape for the whole server. Snapshots of processes
+that have exited are dropped: their counters restart from the new
+worker's values, which Prometheus treats as a counter reset.
+"""
+
+import asyncio
+import bisect
+import glob
+import inspect
+import json
+import os
+import tempfile
+import time
+from functools import wraps
+from typing import Iterable
+from app.core.config import settings
+
+# seconds; from a cache hit to a slow Argon2 hash behind a full queue
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> dict:
+        return {"|".join(k): v for k, v in self._values.items()}
+
+
+class Gauge(Counter):
+    """A value that is set rather than counted; summed over processes, or
+    the largest one with ``aggregate="max"`` (a value every process measures
+    alike, such as replication lag)."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        aggregate: str = "sum",
+    ):
+        if aggregate not in ("sum", "max"):
+            raise ValueError(f"Unknown gauge aggregate {aggregate!r}")
+        super().__init__(name, help, labelnames)
+        self.aggregate = aggregate
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def time(self, *labels: str) -> "Timer":
+        return Timer(self, labels)
+
+    def snapshot(self) -> dict:
+        return {"|".join(k): [list(c), s] for k, (c, s) in self._values.items()}
+
+
+class Timer:
+    """``with histogram.time("label"):`` also works around awaits."""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self, directory: str = ""):
+        self.directory = directory
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, tuple(labelnames)))
+
+    def gauge(self, name: str, help: str, labelnames=(), aggregate="sum") -> Gauge:
+        return self._add(Gauge(name, help, tuple(labelnames), aggregate))
+
+    def histogram(self, name: str, help: str, labelnames=(), **kwargs) -> Histogram:
+        return self._add(Histogram(name, help, tuple(labelnames), **kwargs))
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        return {name: m.snapshot() for name, m in self._metrics.items()}
+
+    def flush(self) -> None:
+        """Write this process' snapshot for the others to aggregate."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        # a temp file per call: /metrics and the periodic flush may overlap
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    async def flush_periodically(self, stop: asyncio.Event, interval: float) -> None:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush()
+
+    def collect(self) -> dict:
+        """This process' values, or the sum over all processes."""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            if not _alive(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # another worker removed it first
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # a worker is replacing its file
+        maxed = {
+            name
+            for name, m in self._metrics.items()
+            if getattr(m, "aggregate", "sum") == "max"
+        }
+        return merge(snapshots, maxed)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        values = self.collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(values.get(name, {}).items()):
+                labels = dict(zip(metric.labelnames, key.split("|"))) if key else {}
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {value}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, "+Inf"), counts):
+                    cumulative += count
+                    le = {**labels, "le": str(bound)}
+                    lines.append(f"{name}_bucket{_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def merge(snapshots: Iterable[dict], maxed: Iterable[str] = ()) -> dict:
+    """Sum the snapshots, keeping the largest value of the ``maxed`` metrics."""
+    maxed = set(maxed)
+    merged: dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, series in snapshot.items():
+            target = merged.setdefault(name, {})
+            for key, value in series.items():
+                if key not in target:
+                    target[key] = (
+                        [list(value[0]), value[1]] if isinstance(value, list) else value
+                    )
+                elif isinstance(value, list):
+                    counts, total = target[key]
+                    target[key] = [
+                        [a + b for a, b in zip(counts, value[0])],
+                        total + value[1],
+                    ]
+                elif name in maxed:
+                    target[key] = max(target[key], value)
+                else:
+                    target[key] += value
+    return merged
+
+
+def _alive(path: str) -> bool:
+    """Whether the process that wrote the snapshot at ``path`` still runs."""
+    pid = os.path.basename(path)[len("metrics-") : -len(".json")]
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # alive, owned by another user
+    except ValueError:
+        return False
+    return True
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def timed(histogram: Histogram, prefix: str):
+    """Class decorator timing every public coroutine method as
+    ``<prefix>.<method>``."""
+
+    def decorate(cls):
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.iscoroutinefunction(fn):
+                continue
+            setattr(cls, attr, _timed_method(fn, histogram, f"{prefix}.{attr}"))
+        return cls
+
+    return decorate
+
+
+def _timed_method(fn, histogram: Histogram, label: str):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        with histogram.time(label):
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+metrics = MetricsRegistry(settings.metrics_dir)
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP requests by route template and status code",
+    ("method", "route", "status"),
+)
+stage_duration = metrics.histogram(
+    "app_stage_duration_seconds",
+    "Time spent in a request stage (hashing, connection checkout)",
+    ("stage",),
+)
+repo_duration = metrics.histogram(
+    "app_repo_duration_seconds",
+    "Repository method calls, SQL round trips included",
+    ("method",),
+)
+mail_send_duration = metrics.histogram(
+    "app_mail_send_duration_seconds",
+    "Mail relay calls, one per attempt",
+    ("outcome",),
+)
+mail_breaker_state = metrics.gauge(
+    "app_mail_breaker_state",
+    "Processes whose mail relay circuit breaker is in each state",
+    ("breaker", "state"),
+)
+db_reads = metrics.counter(
+    "app_db_reads_total",
+    "Routed repository reads: primary, replica, replica_miss or replica_error"
+    " (both retried on the primary)",
+    ("target",),
+)
+replica_lag = metrics.gauge(
+    "app_db_replica_lag_seconds",
+    "Replication lag at the last check, the largest over processes",
+    ("replica",),
+    aggregate="max",
+)
+singleflight_calls = metrics.counter(
+    "app_singleflight_calls_total",
+    "Calls that ran (leader) or shared the result of an identical call in flight (coalesced)",
+    ("op", "role"),
+)
+errors = metrics.counter(
+    "app_errors_total", "Domain and unhandled errors by exception type", ("error",)
+)
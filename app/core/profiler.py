@@ -0,0 +1,210 @@
+"""On-demand sampling profiler for a running worker.
+
+While a session runs, a daemon thread wakes every ``interval`` seconds,
+reads the Python stack of every other thread with ``sys._current_frames()``
+and counts each distinct stack. No thread exists and nothing is sampled
+outside a session; during one, the cost is a stack walk per thread and per
+sample, bounded by the interval, ``max_depth`` and ``max_stacks``.
+
+Stacks are rendered in the collapsed ("folded") format of flamegraph.pl and
+speedscope: one ``root;frame;...;leaf count`` line per stack. The root is
+the thread's name or, for the event loop thread, what the loop was running:
+the route of the request whose task was current (``track``, called by
+``ProfilerMiddleware``), ``(background)`` for other tasks, ``(loop)`` for
+callbacks outside any task (HTTP parsing) and ``(idle)`` while it waited
+for I/O. Argon2 runs in the hashing processes, which are not sampled.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from types import CodeType, FrameType
+from typing import Optional
+from app.core.exceptions import ProfilerBusy
+
+IDLE = "(idle)"
+LOOP = "(loop)"
+BACKGROUND = "(background)"
+TRUNCATED = "(truncated)"
+
+# where the loop thread sits when no callback is running: the selector of
+# the stdlib loop, or the frame that started uvloop (not a Python frame)
+_IDLE_LEAVES = ("asyncio.runners:Runner.run",)
+
+
+class ProfileSession:
+    def __init__(
+        self,
+        interval: float,
+        max_stacks: int = 10_000,
+        max_depth: int = 128,
+    ):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        # (root, route or None, frames root first) -> samples
+        self.stacks: dict[tuple[str, Optional[str], tuple[str, ...]], int] = {}
+        self.samples = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+        self.sampler_cpu = 0.0
+        self._requests: dict[asyncio.Task, dict] = {}
+        self._labels: dict[CodeType, str] = {}
+        self._names: dict[int, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def track(self, task: asyncio.Task, scope: dict) -> None:
+        self._requests[task] = scope
+
+    def untrack(self, task: asyncio.Task) -> None:
+        self._requests.pop(task, None)
+
+    def start(self) -> None:
+        """Call from the event loop thread."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def sample(self) -> None:
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            frames = self._collapse(frame)
+            if ident == self._loop_thread:
+                root = self._loop_activity(frames)
+                route = root
+            else:
+                root = self._thread_name(ident)
+                route = None
+            key = (root, route, frames)
+            if key not in self.stacks and len(self.stacks) >= self.max_stacks:
+                self.dropped += 1
+                key = (root, route, (TRUNCATED,))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+    def collapsed(self, by_route: bool = False) -> str:
+        """Folded stacks; with ``by_route`` the loop thread's stacks are
+        rooted at the route or activity instead of the thread name."""
+        lines: dict[str, int] = {}
+        loop_name = self._thread_name(self._loop_thread)
+        for (root, route, frames), count in self.stacks.items():
+            if route is not None and not by_route:
+                root = loop_name
+            line = ";".join((root, *frames))
+            lines[line] = lines.get(line, 0) + count
+        return "".join(f"{line} {count}\n" for line, count in sorted(lines.items()))
+
+    def routes(self) -> dict[str, dict]:
+        """Event loop samples per route or activity, busiest first."""
+        counts: dict[str, int] = {}
+        for (_, route, _), count in self.stacks.items():
+            if route is not None:
+                counts[route] = counts.get(route, 0) + count
+        busy = sum(n for route, n in counts.items() if route != IDLE)
+        return {
+            route: {
+                "samples": n,
+                "busy_share": round(n / busy, 4) if busy and route != IDLE else None,
+            }
+            for route, n in sorted(counts.items(), key=lambda kv: -kv[1])
+        }
+
+    def summary(self) -> dict:
+        return {
+            "seconds": round(self.elapsed, 3),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "dropped_stacks": self.dropped,
+            "sampler_cpu_seconds": round(self.sampler_cpu, 4),
+            "routes": self.routes(),
+        }
+
+    def _run(self) -> None:
+        start, cpu = time.monotonic(), time.thread_time()
+        next_at = start
+        while not self._stop.is_set():
+            self.sample()
+            next_at += self.interval
+            # a late sample is skipped, not made up for
+            delay = next_at - time.monotonic()
+            if delay < 0:
+                next_at, delay = time.monotonic(), 0
+            self._stop.wait(delay)
+        self.elapsed = time.monotonic() - start
+        self.sampler_cpu = time.thread_time() - cpu
+
+    def _collapse(self, frame: Optional[FrameType]) -> tuple[str, ...]:
+        labels = []
+        while frame is not None:
+            if len(labels) == self.max_depth:
+                labels.append(TRUNCATED)
+                break
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                module = frame.f_globals.get("__name__", "?")
+                label = self._labels[code] = f"{module}:{code.co_qualname}"
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def _loop_activity(self, frames: tuple[str, ...]) -> str:
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            scope = self._requests.get(task)
+            if scope is None:
+                return BACKGROUND
+            route = getattr(scope.get("route"), "path", "unmatched")
+            return f"{scope['method']} {route}"
+        leaf = frames[-1] if frames else ""
+        if leaf.startswith("selectors:") or leaf in _IDLE_LEAVES:
+            return IDLE
+        return LOOP
+
+    def _thread_name(self, ident: Optional[int]) -> str:
+        name = self._names.get(ident)
+        if name is None:
+            self._names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._names.get(ident, f"thread-{ident}")
+        return name
+
+
+class Profiler:
+    """At most one session at a time per process."""
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+
+    async def profile(
+        self,
+        seconds: float,
+        interval: float,
+        max_stacks: int = 10_000,
+        max_depth: int = 128,
+    ) -> ProfileSession:
+        if self.session is not None:
+            raise ProfilerBusy()
+        session = ProfileSession(interval, max_stacks, max_depth)
+        self.session = session
+        session.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.session = None
+            session.stop()  # within one interval
+        return session
+
+
+profiler = Profiler()
@@ -1,26 +1,172 @@
 import secrets, hmac
-from argon2 import PasswordHasher
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from app.core.config import settings
+from app.core.hashing import executor
+from app.core.metrics import stage_duration
 
-ph = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=2)
 
+@dataclass(frozen=True)
+class Argon2Params:
+    time_cost: int
+    memory_cost: int  # KiB
+    parallelism: int
 
-def hash_password(pw: str) -> str:
-    return ph.hash(pw)
+
+# replaced by calibration at startup; passed along with every job because
+# the hashing processes do not share this module's state
+_params = Argon2Params(
+    time_cost=settings.argon2_time_cost,
+    memory_cost=settings.argon2_memory_cost,
+    parallelism=settings.argon2_parallelism,
+)
+
+
+def argon2_params() -> Argon2Params:
+    return _params
+
+
+def set_argon2_params(params: Argon2Params) -> None:
+    global _params
+    _params = params
+
+
+def password_hasher(params: Argon2Params | None = None):
+    return _password_hasher(params or _params)
+
+
+@lru_cache(maxsize=None)
+def _password_hasher(params: Argon2Params):
+    # argon2 is imported on first use: hashing runs in the hashing
+    # processes, the API workers only parse hashes during activation
+    from argon2 import PasswordHasher
+
+    return PasswordHasher(
+        time_cost=params.time_cost,
+        memory_cost=params.memory_cost,
+        parallelism=params.parallelism,
+    )
+
+
+def hash_password(pw: str, params: Argon2Params | None = None) -> str:
+    return password_hasher(params).hash(pw)
 
 
 def verify_password(hash_: str, pw: str) -> bool:
     try:
-        return ph.verify(hash_, pw)
+        return password_hasher().verify(hash_, pw)
     except Exception:
         return False
 
 
+def password_needs_rehash(hash_: str) -> bool:
+    """True for an Argon2 hash made with other parameters than the current
+    ones. Only parses the hash; no hashing."""
+    from argon2.exceptions import InvalidHashError
+
+    try:
+        return password_hasher().check_needs_rehash(hash_)
+    except InvalidHashError:
+        return False
+
+
+# stage timers include the wait for a free hashing process
+async def hash_password_async(pw: str) -> str:
+    with stage_duration.time("hash_password"):
+        return await executor.run(hash_password, pw, _params)
+
+
+async def verify_password_async(hash_: str, pw: str) -> bool:
+    with stage_duration.time("verify_password"):
+        return await executor.run(verify_password, hash_, pw)
+
+
 def gen_otp(n_digits: int = 4) -> str:
     return f"{secrets.randbelow(10**n_digits):0{n_digits}d}"
 
 
-def hash_otp(code: str) -> str:
-    return ph.hash(code)
+def hash_otp(code: str, params: Argon2Params | None = None) -> str:
+    return password_hasher(params).hash(code)
+
+
+class OtpHasher:
+    """Hashing strategy for short-lived activation codes.
+
+    ``subject`` binds the hash to its owner (the account email), so a stored
+    hash cannot be replayed for another account.
+    """
+
+    async def hash(self, code: str, subject: str) -> str: ...
+    async def verify(self, hash_: str, code: str, subject: str) -> bool: ...
+
+
+class Argon2OtpHasher(OtpHasher):
+    async def hash(self, code: str, subject: str) -> str:
+        return await executor.run(hash_otp, code, _params)
+
+    async def verify(self, hash_: str, code: str, subject: str) -> bool:
+        return await executor.run(verify_password, hash_, code)
+
+
+class HmacOtpHasher(OtpHasher):
+    """Keyed HMAC-SHA256: a few microseconds instead of a 64 MiB Argon2 run.
+
+    A 4-digit code that lives for a minute gains nothing from a slow hash; the
+    server secret is what keeps a leaked table from being brute-forced.
+    """
+
+    PREFIX = "hmac-sha256$"
+
+    def __init__(self, secret: bytes):
+        self.secret = secret
+
+    def _digest(self, code: str, subject: str) -> str:
+        message = f"{subject.lower()}:{code}".encode()
+        return self.PREFIX + hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    async def hash(self, code: str, subject: str) -> str:
+        return self._digest(code, subject)
+
+    async def verify(self, hash_: str, code: str, subject: str) -> bool:
+        return constant_time_eq(hash_, self._digest(code, subject))
+
+
+@lru_cache(maxsize=None)
+def _hmac_hasher() -> HmacOtpHasher | None:
+    return HmacOtpHasher(settings.otp_secret.encode()) if settings.otp_secret else None
+
+
+def otp_hasher() -> OtpHasher:
+    """The strategy used for new codes, selected by OTP_HASHER."""
+    if settings.otp_hasher == "argon2":
+        return Argon2OtpHasher()
+    if settings.otp_hasher == "hmac":
+        hasher = _hmac_hasher()
+        if hasher is None:
+            raise RuntimeError("OTP_HASHER=hmac requires OTP_SECRET")
+        return hasher
+    raise RuntimeError(f"Unknown OTP_HASHER {settings.otp_hasher!r}")
+
+
+async def hash_otp_async(code: str, subject: str) -> str:
+    with stage_duration.time("hash_otp"):
+        return await otp_hasher().hash(code, subject)
+
+
+async def verify_otp_async(hash_: str, code: str, subject: str) -> bool:
+    """Verify against whichever scheme produced ``hash_``.
+
+    Tokens issued before switching OTP_HASHER stay valid until they expire,
+    so the switch needs no migration of stored rows.
+    """
+    with stage_duration.time("verify_otp"):
+        if hash_.startswith("$argon2"):
+            return await Argon2OtpHasher().verify(hash_, code, subject)
+        if hash_.startswith(HmacOtpHasher.PREFIX):
+            hasher = _hmac_hasher()
+            return hasher is not None and await hasher.verify(hash_, code, subject)
+        return False
 
 
 def constant_time_eq(a: str, b: str) -> bool:
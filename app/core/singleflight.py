@@ -0,0 +1,82 @@
+"""Single-flight: identical calls in flight in this process run once.
+
+A double-tapped form or a proxy retry sends the same signup or activation
+twice within milliseconds. Without coalescing, each copy does its own reads
+and Argon2 work, then all but one lose a race in the database. Here the
+first call runs; duplicates arriving while it is in flight await it and
+get its result, or its exception (so the same HTTP status).
+
+Calls are identical when the operation, the email and the other inputs
+match. Inputs are keyed by an HMAC under a per-process secret, so a
+password never sits in the table, not even as a plain digest.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+from typing import Awaitable, Callable, TypeVar
+from app.core.metrics import singleflight_calls
+
+T = TypeVar("T")
+
+_secret = os.urandom(32)
+
+
+def flight_key(email: str, *inputs: str) -> str:
+    digest = hmac.new(_secret, digestmod=hashlib.sha256)
+    for value in inputs:
+        digest.update(value.encode())
+        digest.update(b"\0")
+    return f"{email.lower()}:{digest.hexdigest()}"
+
+
+class SingleFlight:
+    def __init__(self, op: str):
+        self.op = op
+        self._calls: dict[str, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """``await fn()``, unless a call with ``key`` is already running."""
+        result, _ = await self.call(key, fn)
+        return result
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Like ``do``, and whether the result was shared by another call."""
+        while True:
+            pending = self._calls.get(key)
+            if pending is None:
+                break
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # the first caller went away (client disconnect): unless this
+                # one was cancelled too, run the call itself
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                continue
+            except BaseException:
+                singleflight_calls.inc(self.op, "coalesced")
+                raise
+            singleflight_calls.inc(self.op, "coalesced")
+            return result, True
+
+        singleflight_calls.inc(self.op, "leader")
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: there may be no duplicates
+            raise
+        finally:
+            del self._calls[key]
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class IdempotentResponse:
+    fingerprint: str
+    # None while the first execution is still running
+    status_code: int | None
+    body: dict | None
@@ -0,0 +1,9 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxMessage:
+    id: int
+    email: str
+    code: str
+    attempts: int
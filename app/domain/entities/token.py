@@ -2,10 +2,11 @@ from dataclasses import dataclass
 from datetime import datetime
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ActivationToken:
     id: int
     user_id: int
     code_hash: str
     expires_at: datetime
     consumed_at: datetime | None
+    failed_attempts: int = 0
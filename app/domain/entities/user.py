@@ -1,9 +1,28 @@
 from dataclasses import dataclass
+from datetime import datetime
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class User:
     id: int
     email: str
     is_active: bool
     password_hash: str
+
+
+@dataclass(frozen=True, slots=True)
+class UserSummary:
+    """A user as listed to admins: no credentials."""
+
+    id: int
+    email: str
+    is_active: bool
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class UserFilter:
+    is_active: bool | None = None
+    created_from: datetime | None = None  # inclusive
+    created_to: datetime | None = None  # exclusive
+    email_prefix: str | None = None  # case-insensitive
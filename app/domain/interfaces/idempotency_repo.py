@@ -0,0 +1,12 @@
+from typing import Optional
+from app.domain.entities.idempotency import IdempotentResponse
+
+
+class IdempotencyRepo:
+    async def claim(
+        self, key: str, fingerprint: str, ttl_seconds: float, lease_seconds: float
+    ) -> bool: ...
+    async def get(self, key: str) -> Optional[IdempotentResponse]: ...
+    async def complete(self, key: str, status_code: int, body: dict) -> None: ...
+    async def release(self, key: str) -> None: ...
+    async def delete_expired(self, limit: int) -> int: ...
@@ -1,2 +1,3 @@
 class Mailer:
-    def send_code(self, email: str, code: str) -> None: ...
+    async def send_code(self, email: str, code: str) -> None: ...
+    async def send_codes(self, messages: list[tuple[str, str]]) -> None: ...
@@ -0,0 +1,14 @@
+from app.domain.entities.outbox import OutboxMessage
+
+
+class OutboxRepo:
+    async def enqueue(self, email: str, code: str) -> None: ...
+    async def claim_batch(
+        self, limit: int, lease_seconds: float
+    ) -> list[OutboxMessage]: ...
+    async def mark_sent(self, message_ids: list[int]) -> None: ...
+    async def retry_later(
+        self, message_ids: list[int], delays_seconds: list[float], error: str
+    ) -> None: ...
+    async def mark_failed(self, message_ids: list[int], error: str) -> None: ...
+    async def delete_expired(self, limit: int) -> int: ...
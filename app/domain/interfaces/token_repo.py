@@ -3,6 +3,12 @@ from app.domain.entities.token import ActivationToken
 
 
 class TokenRepo:
-    def upsert(self, user_id: int, code_hash: str) -> ActivationToken: ...
-    def get_active_for_user(self, user_id: int) -> Optional[ActivationToken]: ...
-    def consume(self, token_id: int) -> None: ...
+    async def upsert(self, user_id: int, code_hash: str) -> ActivationToken: ...
+    async def reissue_for_email(
+        self, email: str, code_hash: str, code: str, cooldown_seconds: float
+    ) -> Optional[ActivationToken]: ...
+    async def reissue_due(self, email: str, cooldown_seconds: float) -> bool: ...
+    async def get_active_for_user(self, user_id: int) -> Optional[ActivationToken]: ...
+    async def consume(self, token_id: int) -> None: ...
+    async def delete_consumed(self, limit: int) -> int: ...
+    async def delete_expired(self, limit: int, grace_seconds: float) -> int: ...
@@ -1,9 +1,34 @@
+from datetime import datetime
 from typing import Optional
-from app.domain.entities.user import User
+from app.domain.entities.token import ActivationToken
+from app.domain.entities.user import User, UserFilter, UserSummary
 
 
 class UserRepo:
-    def create(self, email: str, password_hash: str) -> int: ...
-    def get_by_email(self, email: str) -> Optional[User]: ...
-    def get_by_id(self, user_id: int) -> Optional[User]: ...
-    def activate(self, user_id: int) -> bool: ...
+    async def create(self, email: str, password_hash: str) -> int: ...
+    async def create_with_token(
+        self, email: str, password_hash: str, code_hash: str, code: str
+    ) -> int: ...
+    async def bulk_create_with_tokens(
+        self, rows: list[tuple[int, str, str, str, str]], ttl_seconds: int
+    ) -> dict[int, int]: ...
+    async def get_by_email(self, email: str) -> Optional[User]: ...
+    async def get_by_id(self, user_id: int) -> Optional[User]: ...
+    async def get_with_active_token(
+        self, email: str
+    ) -> tuple[Optional[User], Optional[ActivationToken]]: ...
+    async def get_active_token(self, user_id: int) -> Optional[ActivationToken]: ...
+    async def activate(self, user_id: int) -> bool: ...
+    async def record_failed_attempt(self, user_id: int, token_id: int) -> int: ...
+    async def activate_with_token(
+        self, user_id: int, token_id: int, max_failed_attempts: int
+    ) -> bool: ...
+    async def update_password_hash(
+        self, user_id: int, old_hash: str, new_hash: str
+    ) -> bool: ...
+    async def list_users(
+        self,
+        filters: UserFilter,
+        after: Optional[tuple[datetime, int]],
+        limit: int,
+    ) -> list[UserSummary]: ...
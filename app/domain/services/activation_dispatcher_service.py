@@ -1,15 +1,47 @@
-from app.core.security import gen_otp, hash_otp
+from app.core.config import settings
+from app.core.security import gen_otp, hash_otp_async
+from app.core.singleflight import SingleFlight
 from app.domain.interfaces.token_repo import TokenRepo
-from app.domain.interfaces.mailer import Mailer
 
+# resends running in this process, by email: a burst shares one execution
+_flights = SingleFlight("resend")
 
-# in charge of token generation + mail sending (now RegistrationService is only responsible for user creation.)
+
+# in charge of token generation + queueing the mail (now RegistrationService is only responsible for user creation.)
+# delivery itself happens out of band, see OutboxService
 class ActivationDispatcherService:
-    def __init__(self, token_repo: TokenRepo, mailer: Mailer):
+    def __init__(
+        self,
+        token_repo: TokenRepo,
+        resend_cooldown_seconds: float = settings.otp_resend_cooldown_seconds,
+        flights: SingleFlight = _flights,
+    ):
         self.token_repo = token_repo
-        self.mailer = mailer
+        self.resend_cooldown_seconds = resend_cooldown_seconds
+        self.flights = flights
+
+    async def resend_code(self, email: str) -> bool:
+        """Issue a fresh code to an inactive account, at most once per
+        cooldown. Returns whether a code was issued (False for unknown or
+        active accounts too: callers must not reveal the difference)."""
+        # a burst shares one code: only its first request reports it issued
+        issued, shared = await self.flights.call(
+            email.lower(), lambda: self._reissue(email)
+        )
+        return issued and not shared
 
-    def dispatch_code(self, user_id: int, email: str) -> None:
-        code = gen_otp()
-        self.token_repo.upsert(user_id, hash_otp(code))
-        self.mailer.send_code(email, code)
+    async def _reissue(self, email: str) -> bool:
+        # cheap check first: unknown or active accounts, and resends within
+        # the cooldown, must not take a hashing slot
+        if not await self.token_repo.reissue_due(email, self.resend_cooldown_seconds):
+            return False
+        code = gen_otp(settings.otp_length)
+        # token and outbox row in one statement, cooldown included;
+        # the mail worker paces delivery
+        token = await self.token_repo.reissue_for_email(
+            email,
+            await hash_otp_async(code, email),
+            code,
+            self.resend_cooldown_seconds,
+        )
+        return token is not None
@@ -1,29 +1,82 @@
+import logging
 from datetime import datetime, timezone
-from app.core.security import verify_password
-from app.core.exceptions import InvalidOTP, ExpiredOTP
+from app.core.config import settings
+from app.core.security import (
+    hash_password_async,
+    password_needs_rehash,
+    verify_otp_async,
+    verify_password_async,
+)
+from app.core.exceptions import HasherBusy, InvalidOTP, ExpiredOTP, TokenLocked
+from app.core.singleflight import SingleFlight, flight_key
 from app.domain.interfaces.user_repo import UserRepo
-from app.domain.interfaces.token_repo import TokenRepo
+
+logger = logging.getLogger("activation")
+
+# activations running in this process, so duplicates share one outcome
+_flights = SingleFlight("activate")
 
 
 class ActivationService:
-    def __init__(self, user_repo: UserRepo, token_repo: TokenRepo):
+    def __init__(
+        self,
+        user_repo: UserRepo,
+        max_failed_attempts: int = settings.otp_max_failed_attempts,
+        flights: SingleFlight = _flights,
+    ):
         self.user_repo = user_repo
-        self.token_repo = token_repo
+        self.max_failed_attempts = max_failed_attempts
+        self.flights = flights
+
+    async def activate(self, email: str, password: str, code: str) -> None:
+        """Activate the account; a duplicate submitted while this runs
+        shares its outcome instead of verifying again."""
+        await self.flights.do(
+            flight_key(email, password, code),
+            lambda: self._activate(email, password, code),
+        )
 
-    def activate(self, email: str, password: str, code: str) -> None:
-        user = self.user_repo.get_by_email(email)
-        if not user or not verify_password(user.password_hash, password):
+    async def _activate(self, email: str, password: str, code: str) -> None:
+        user, token = await self.user_repo.get_with_active_token(email)
+        if not user or not await verify_password_async(user.password_hash, password):
             raise InvalidOTP("Bad credentials")
 
-        token = self.token_repo.get_active_for_user(user.id)
+        # only after the password: a locked token must not tell anyone who
+        # knows the email that the account exists
+        if token and token.failed_attempts >= self.max_failed_attempts:
+            raise TokenLocked()
+
         if not token:
             raise InvalidOTP("No active token")
 
         if datetime.now(timezone.utc) > token.expires_at:
             raise ExpiredOTP()
 
-        if not verify_password(token.code_hash, code):
+        if not await verify_otp_async(token.code_hash, code, user.email):
+            await self.user_repo.record_failed_attempt(user.id, token.id)
             raise InvalidOTP()
 
-        self.token_repo.consume(token.id)
-        self.user_repo.activate(user.id)
+        # a concurrent submit of the same code may have won the race
+        if not await self.user_repo.activate_with_token(
+            user.id, token.id, self.max_failed_attempts
+        ):
+            raise InvalidOTP("Token already used")
+
+        await self._upgrade_hash(user, password)
+
+    async def _upgrade_hash(self, user, password: str) -> None:
+        """Rehash a password stored with older Argon2 parameters while the
+        plaintext is at hand, so stored hashes follow recalibrations."""
+        if not password_needs_rehash(user.password_hash):
+            return
+        # best effort: the account is already active, a failure here must
+        # not turn the activation into an error
+        try:
+            new_hash = await hash_password_async(password)
+            await self.user_repo.update_password_hash(
+                user.id, user.password_hash, new_hash
+            )
+        except HasherBusy:
+            logger.info("password rehash of user %s skipped: hasher busy", user.id)
+        except Exception:
+            logger.exception("password rehash of user %s failed", user.id)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+from app.core.exceptions import IdempotencyKeyMismatch, IdempotencyKeyInProgress
+from app.core.singleflight import SingleFlight
+from app.domain.entities.idempotency import IdempotentResponse
+from app.domain.interfaces.idempotency_repo import IdempotencyRepo
+
+# executions running in this process, so local duplicates share one result
+_flights = SingleFlight("idempotency")
+
+
+class IdempotencyService:
+    def __init__(
+        self,
+        repo: IdempotencyRepo,
+        ttl_seconds: float,
+        lease_seconds: float,
+        wait_seconds: float,
+        flights: SingleFlight = _flights,
+    ):
+        self.repo = repo
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.flights = flights
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> tuple[IdempotentResponse, bool]:
+        """Run ``execute`` once per key and store its ``(status, body)``.
+
+        Returns the response and whether it is a replay. Exceptions are not
+        stored: the key is released and a retry runs ``execute`` again. A
+        local duplicate of a request that was cancelled claims the key and
+        runs ``execute`` itself.
+        """
+        (response, replayed), shared = await self.flights.call(
+            key, lambda: self._run(key, fingerprint, execute)
+        )
+        if shared:
+            return self._check(response, fingerprint), True
+        return response, replayed
+
+    async def _run(self, key, fingerprint, execute):
+        deadline = time.monotonic() + self.wait_seconds
+        delay = 0.05
+        while True:
+            if await self.repo.claim(
+                key, fingerprint, self.ttl_seconds, self.lease_seconds
+            ):
+                try:
+                    status_code, body = await execute()
+                except BaseException:
+                    await self.repo.release(key)
+                    raise
+                await self.repo.complete(key, status_code, body)
+                return IdempotentResponse(fingerprint, status_code, body), False
+
+            # another process holds the key: wait for its response
+            stored = await self.repo.get(key)
+            if stored is not None:
+                self._check(stored, fingerprint)
+                if stored.status_code is not None:
+                    return stored, True
+            if time.monotonic() > deadline:
+                raise IdempotencyKeyInProgress()
+            # (gone meanwhile: released or expired, claim it on the next turn)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    @staticmethod
+    def _check(stored: IdempotentResponse, fingerprint: str) -> IdempotentResponse:
+        if stored.fingerprint != fingerprint:
+            raise IdempotencyKeyMismatch()
+        return stored
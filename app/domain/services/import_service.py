@@ -0,0 +1,103 @@
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Optional
+from app.core.exceptions import HasherBusy
+from app.core.security import gen_otp, hash_otp_async, hash_password_async
+from app.domain.interfaces.user_repo import UserRepo
+
+
+@dataclass
+class ImportRow:
+    line: int
+    email: Optional[str] = None
+    password: Optional[str] = None
+    error: Optional[str] = None
+
+
+# bulk counterpart of RegistrationService, for tenant migrations
+class ImportService:
+    def __init__(
+        self,
+        user_repo: UserRepo,
+        chunk_size: int,
+        hash_concurrency: int,
+        otp_length: int,
+        otp_ttl_seconds: int,
+    ):
+        self.user_repo = user_repo
+        self.chunk_size = chunk_size
+        self.otp_length = otp_length
+        self.otp_ttl_seconds = otp_ttl_seconds
+        # leave room in the hashing queue for interactive signups
+        self._hash_slots = asyncio.Semaphore(hash_concurrency)
+
+    async def import_rows(self, rows: AsyncIterable[ImportRow]) -> AsyncIterator[dict]:
+        """Import rows chunk by chunk, yielding one report entry per row.
+
+        At most one chunk is held in memory, whatever the input size.
+        """
+        chunk: list[ImportRow] = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                for entry in await self._import_chunk(chunk):
+                    yield entry
+                chunk = []
+        if chunk:
+            for entry in await self._import_chunk(chunk):
+                yield entry
+
+    async def _import_chunk(self, chunk: list[ImportRow]) -> list[dict]:
+        valid = [row for row in chunk if row.error is None]
+        codes = [gen_otp(self.otp_length) for _ in valid]
+        hashed = await asyncio.gather(
+            *(self._hash(row, code) for row, code in zip(valid, codes))
+        )
+        created = {}
+        if valid:
+            created = await self.user_repo.bulk_create_with_tokens(
+                [
+                    (row.line, row.email, password_hash, code_hash, code)
+                    for row, code, (password_hash, code_hash) in zip(
+                        valid, codes, hashed
+                    )
+                ],
+                self.otp_ttl_seconds,
+            )
+
+        report = []
+        for row in chunk:
+            if row.error is not None:
+                report.append(
+                    {"line": row.line, "status": "invalid", "error": row.error}
+                )
+            elif row.line in created:
+                report.append(
+                    {
+                        "line": row.line,
+                        "email": row.email,
+                        "status": "created",
+                        "id": created[row.line],
+                    }
+                )
+            else:
+                report.append(
+                    {"line": row.line, "email": row.email, "status": "duplicate"}
+                )
+        return report
+
+    async def _hash(self, row: ImportRow, code: str) -> tuple[str, str]:
+        async with self._hash_slots:
+            # the OTP goes to the same queue unless OTP_HASHER=hmac
+            password_hash = await _when_free(hash_password_async, row.password)
+            code_hash = await _when_free(hash_otp_async, code, row.email)
+            return password_hash, code_hash
+
+
+async def _when_free(hash_async, *args) -> str:
+    """Signups own the hashing queue: wait our turn instead of failing."""
+    while True:
+        try:
+            return await hash_async(*args)
+        except HasherBusy as e:
+            await asyncio.sleep(e.retry_after)
@@ -0,0 +1,69 @@
+from app.core.backoff import backoff_delay
+from app.core.exceptions import MailerRejected
+from app.domain.entities.outbox import OutboxMessage
+from app.domain.interfaces.mailer import Mailer
+from app.domain.interfaces.outbox_repo import OutboxRepo
+
+
+# drains the outbox: claim a batch, send it in one relay call, ack or reschedule
+class OutboxService:
+    def __init__(
+        self,
+        outbox_repo: OutboxRepo,
+        mailer: Mailer,
+        batch_size: int,
+        lease_seconds: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+    ):
+        self.outbox_repo = outbox_repo
+        self.mailer = mailer
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def process_batch(self) -> int:
+        """Deliver one batch and return how many messages were claimed."""
+        messages = await self.outbox_repo.claim_batch(
+            self.batch_size, self.lease_seconds
+        )
+        if not messages:
+            return 0
+
+        try:
+            await self.mailer.send_codes([(m.email, m.code) for m in messages])
+        except Exception as e:
+            # chunks sent before the failure are acked, not sent twice
+            delivered = getattr(e, "delivered", 0)
+            if delivered:
+                await self.outbox_repo.mark_sent([m.id for m in messages[:delivered]])
+            rest = messages[delivered:]
+            if isinstance(e, MailerRejected):
+                # refused by the relay: these would be refused again
+                refused = e.rejected or len(rest)
+                await self.outbox_repo.mark_failed(
+                    [m.id for m in rest[:refused]], str(e)
+                )
+                rest = rest[refused:]
+            await self._reschedule(rest, str(e))
+        else:
+            await self.outbox_repo.mark_sent([m.id for m in messages])
+        return len(messages)
+
+    async def _reschedule(self, messages: list[OutboxMessage], error: str) -> None:
+        exhausted = [m.id for m in messages if m.attempts >= self.max_attempts]
+        retry = [m for m in messages if m.attempts < self.max_attempts]
+        if exhausted:
+            await self.outbox_repo.mark_failed(exhausted, error)
+        if retry:
+            await self.outbox_repo.retry_later(
+                [m.id for m in retry],
+                [
+                    backoff_delay(m.attempts, self.backoff_base, self.backoff_max)
+                    for m in retry
+                ],
+                error,
+            )
@@ -1,13 +1,35 @@
-from app.core.security import hash_password
-from app.core.exceptions import UserAlreadyExists
+import asyncio
+from app.core.config import settings
+from app.core.security import gen_otp, hash_otp_async, hash_password_async
+from app.core.singleflight import SingleFlight, flight_key
 from app.domain.interfaces.user_repo import UserRepo
 
+# signups running in this process, so duplicates share one outcome
+_flights = SingleFlight("register")
+
 
 class RegistrationService:
-    def __init__(self, user_repo: UserRepo):
+    def __init__(self, user_repo: UserRepo, flights: SingleFlight = _flights):
         self.user_repo = user_repo
+        self.flights = flights
+
+    async def register_user(self, email: str, password: str) -> int:
+        """Create the user with its activation token and queued mail.
+
+        Duplicates are detected by the insert itself (``UserAlreadyExists``),
+        so a signup is a single statement and a single commit. An identical
+        signup already running in this process is awaited instead: both get
+        its user id.
+        """
+        return await self.flights.do(
+            flight_key(email, password), lambda: self._register(email, password)
+        )
 
-    def register_user(self, email: str, password: str) -> int:
-        if self.user_repo.get_by_email(email):
-            raise UserAlreadyExists()
-        return self.user_repo.create(email, hash_password(password))
+    async def _register(self, email: str, password: str) -> int:
+        code = gen_otp(settings.otp_length)
+        password_hash, code_hash = await asyncio.gather(
+            hash_password_async(password), hash_otp_async(code, email)
+        )
+        return await self.user_repo.create_with_token(
+            email, password_hash, code_hash, code
+        )
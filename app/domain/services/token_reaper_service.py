@@ -0,0 +1,45 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+from app.domain.interfaces.token_repo import TokenRepo
+
+
+# deletes dead activation tokens in small batches instead of one long DELETE
+class TokenReaperService:
+    def __init__(
+        self,
+        token_repo: TokenRepo,
+        batch_size: int,
+        grace_seconds: float,
+        pause: float = 0.0,
+    ):
+        self.token_repo = token_repo
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+        self.pause = pause
+
+    async def run_once(self) -> dict:
+        """Reap until batches come back short; returns the rows reclaimed."""
+        started = time.perf_counter()
+        consumed, consumed_batches = await self._drain(
+            lambda: self.token_repo.delete_consumed(self.batch_size)
+        )
+        expired, expired_batches = await self._drain(
+            lambda: self.token_repo.delete_expired(self.batch_size, self.grace_seconds)
+        )
+        return {
+            "consumed": consumed,
+            "expired": expired,
+            "batches": consumed_batches + expired_batches,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    async def _drain(self, delete: Callable[[], Awaitable[int]]) -> tuple[int, int]:
+        total = batches = 0
+        while True:
+            deleted = await delete()
+            total += deleted
+            batches += 1
+            if deleted < self.batch_size:
+                return total, batches
+            await asyncio.sleep(self.pause)
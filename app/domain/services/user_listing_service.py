@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import AsyncContextManager, AsyncIterator, Callable, Optional
+from app.domain.entities.user import UserFilter, UserSummary
+from app.domain.interfaces.user_repo import UserRepo
+
+Cursor = tuple[datetime, int]
+
+
+# admin listing: keyset pages on (created_at, id), never OFFSET.
+# ``open_repo`` opens a repository per query, and each query takes its own
+# connection, so a slow export reader does not hold one for the whole stream.
+class UserListingService:
+    def __init__(
+        self,
+        open_repo: Callable[[], AsyncContextManager[UserRepo]],
+        export_page_size: int,
+    ):
+        self.open_repo = open_repo
+        self.export_page_size = export_page_size
+
+    async def page(
+        self,
+        filters: UserFilter,
+        after: Optional[Cursor],
+        limit: int,
+    ) -> tuple[list[UserSummary], Optional[Cursor]]:
+        """One page, and the cursor of the next one (None on the last page)."""
+        # one extra row tells whether there is a next page
+        async with self.open_repo() as user_repo:
+            users = await user_repo.list_users(filters, after, limit + 1)
+        if len(users) <= limit:
+            return users, None
+        users = users[:limit]
+        return users, (users[-1].created_at, users[-1].id)
+
+    async def export(
+        self, filters: UserFilter, after: Optional[Cursor] = None
+    ) -> AsyncIterator[UserSummary]:
+        """Every matching user from ``after`` on, one page in memory at a time."""
+        while True:
+            async with self.open_repo() as user_repo:
+                users = await user_repo.list_users(
+                    filters, after, self.export_page_size
+                )
+            for user in users:
+                yield user
+            if len(users) < self.export_page_size:
+                return
+            after = (users[-1].created_at, users[-1].id)
@@ -0,0 +1,9 @@
+from typing import Optional
+
+
+class CacheBackend:
+    """Shared cache tier (e.g. Redis/memcached) holding serialized values."""
+
+    async def get(self, key: str) -> Optional[str]: ...
+    async def set(self, key: str, value: str, ttl: float) -> None: ...
+    async def delete(self, *keys: str) -> None: ...
@@ -0,0 +1,45 @@
+from typing import Optional
+from app.core.config import settings
+from app.domain.entities.idempotency import IdempotentResponse
+from app.domain.interfaces.idempotency_repo import IdempotencyRepo
+from app.infrastructure.cache.memory import MISSING, TTLCache
+
+
+class CachedIdempotencyRepo(IdempotencyRepo):
+    """In-process front for completed responses.
+
+    A completed response never changes until the key expires, so a replay
+    that hits this process twice reads Postgres once. In-flight rows are
+    never cached.
+    """
+
+    def __init__(self, inner: IdempotencyRepo, cache: TTLCache, ttl: float):
+        self.inner = inner
+        self.cache = cache
+        self.ttl = ttl
+
+    async def claim(
+        self, key: str, fingerprint: str, ttl_seconds: float, lease_seconds: float
+    ) -> bool:
+        return await self.inner.claim(key, fingerprint, ttl_seconds, lease_seconds)
+
+    async def get(self, key: str) -> Optional[IdempotentResponse]:
+        stored = self.cache.get(key)
+        if stored is not MISSING:
+            return stored
+        stored = await self.inner.get(key)
+        if stored is not None and stored.status_code is not None:
+            self.cache.set(key, stored, self.ttl)
+        return stored
+
+    async def complete(self, key: str, status_code: int, body: dict) -> None:
+        await self.inner.complete(key, status_code, body)
+
+    async def release(self, key: str) -> None:
+        await self.inner.release(key)
+
+    async def delete_expired(self, limit: int) -> int:
+        return await self.inner.delete_expired(limit)
+
+
+idempotency_cache = TTLCache(settings.idempotency_cache_max_entries)
@@ -0,0 +1,221 @@
+import json
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Optional
+from app.core.config import settings
+from app.domain.entities.user import User, UserFilter, UserSummary
+from app.domain.interfaces.user_repo import UserRepo
+from app.infrastructure.cache.backend import CacheBackend
+from app.infrastructure.cache.memory import MISSING, TTLCache
+
+
+def _email_key(email: str) -> str:
+    # emails are CITEXT: lookups are case-insensitive, so are the keys
+    return f"user:email:{email.lower()}"
+
+
+def _id_key(user_id: int) -> str:
+    return f"user:id:{user_id}"
+
+
+def _idmap_key(user_id: int) -> str:
+    return f"user:idmap:{user_id}"
+
+
+def _dump(user: Optional[User]) -> str:
+    return json.dumps({"user": asdict(user) if user else None})
+
+
+def _load(raw: str) -> Optional[User]:
+    data = json.loads(raw)
+    return User(**data["user"]) if data["user"] else None
+
+
+class UserCache:
+    """Two-tier read-through cache for user lookups.
+
+    The in-process tier is a bounded TTL+LRU. Misses ("no such user") are
+    cached too, but only for ``negative_ttl`` seconds.
+
+    Users carry their password hash: those entries stay in the in-process
+    tier. The optional shared tier only gets the misses and the id -> email
+    map, so credentials are never copied out of Postgres into a less
+    protected store. Activation tokens are never cached.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        negative_ttl: float,
+        shared: Optional[CacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.shared = shared
+        self.local = TTLCache(max_entries)
+        # user id -> email, to drop the email-keyed entries on activate(user_id)
+        self._emails = TTLCache(max_entries)
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    async def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        if value is not MISSING or self.shared is None:
+            return value
+        raw = await self.shared.get(key)
+        if raw is None:
+            self.shared_misses += 1
+            return MISSING
+        self.shared_hits += 1
+        value = _load(raw)
+        self.local.set(key, value, self._ttl_for(value))
+        return value
+
+    async def set(self, key: str, user: Optional[User]) -> None:
+        ttl = self._ttl_for(user)
+        self.local.set(key, user, ttl)
+        if user is not None:
+            self._emails.set(_idmap_key(user.id), user.email, self.ttl)
+        if self.shared is not None:
+            if user is None:
+                await self.shared.set(key, _dump(user), ttl)
+            else:
+                await self.shared.set(_idmap_key(user.id), user.email, self.ttl)
+
+    async def invalidate_email(self, email: str) -> None:
+        key = _email_key(email)
+        self.local.delete(key)
+        if self.shared is not None:
+            await self.shared.delete(key)
+
+    async def invalidate_user(self, user_id: int) -> None:
+        keys = [_id_key(user_id)]
+        email = self._emails.get(_idmap_key(user_id))
+        if email is MISSING and self.shared is not None:
+            email = await self.shared.get(_idmap_key(user_id))
+        if email not in (MISSING, None):
+            keys.append(_email_key(email))
+        self.local.delete(*keys)
+        if self.shared is not None:
+            await self.shared.delete(*keys)
+
+    def stats(self) -> dict:
+        return {
+            "local": self.local.stats(),
+            "shared": (
+                {"hits": self.shared_hits, "misses": self.shared_misses}
+                if self.shared is not None
+                else None
+            ),
+        }
+
+    def _ttl_for(self, user: Optional[User]) -> float:
+        return self.ttl if user is not None else self.negative_ttl
+
+
+class CachedUserRepo(UserRepo):
+    """Caching decorator around any UserRepo; writes invalidate."""
+
+    def __init__(self, inner: UserRepo, cache: UserCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def create(self, email: str, password_hash: str) -> int:
+        try:
+            return await self.inner.create(email, password_hash)
+        finally:
+            await self.cache.invalidate_email(email)
+
+    async def create_with_token(
+        self, email: str, password_hash: str, code_hash: str, code: str
+    ) -> int:
+        try:
+            return await self.inner.create_with_token(
+                email, password_hash, code_hash, code
+            )
+        finally:
+            await self.cache.invalidate_email(email)
+
+    async def bulk_create_with_tokens(
+        self, rows: list[tuple[int, str, str, str, str]], ttl_seconds: int
+    ) -> dict[int, int]:
+        try:
+            return await self.inner.bulk_create_with_tokens(rows, ttl_seconds)
+        finally:
+            for row in rows:
+                await self.cache.invalidate_email(row[1])
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        key = _email_key(email)
+        user = await self.cache.get(key)
+        if user is MISSING:
+            user = await self.inner.get_by_email(email)
+            await self.cache.set(key, user)
+        return user
+
+    async def get_by_id(self, user_id: int) -> Optional[User]:
+        key = _id_key(user_id)
+        user = await self.cache.get(key)
+        if user is MISSING:
+            user = await self.inner.get_by_id(user_id)
+            await self.cache.set(key, user)
+        return user
+
+    async def get_with_active_token(self, email: str):
+        # The user half is cached with get_by_email's entry. The token is
+        # always read fresh: a resend served by another worker replaces its
+        # hash under the same token id, and failed attempts count toward
+        # lockout.
+        key = _email_key(email)
+        user = await self.cache.get(key)
+        if user is MISSING:
+            user, token = await self.inner.get_with_active_token(email)
+            await self.cache.set(key, user)
+            return user, token
+        if user is None:
+            return None, None
+        return user, await self.inner.get_active_token(user.id)
+
+    async def activate(self, user_id: int) -> bool:
+        try:
+            return await self.inner.activate(user_id)
+        finally:
+            await self.cache.invalidate_user(user_id)
+
+    async def record_failed_attempt(self, user_id: int, token_id: int) -> int:
+        return await self.inner.record_failed_attempt(user_id, token_id)
+
+    async def activate_with_token(
+        self, user_id: int, token_id: int, max_failed_attempts: int
+    ) -> bool:
+        try:
+            return await self.inner.activate_with_token(
+                user_id, token_id, max_failed_attempts
+            )
+        finally:
+            await self.cache.invalidate_user(user_id)
+
+    async def update_password_hash(
+        self, user_id: int, old_hash: str, new_hash: str
+    ) -> bool:
+        try:
+            return await self.inner.update_password_hash(user_id, old_hash, new_hash)
+        finally:
+            await self.cache.invalidate_user(user_id)
+
+    async def list_users(
+        self,
+        filters: UserFilter,
+        after: Optional[tuple[datetime, int]],
+        limit: int,
+    ) -> list[UserSummary]:
+        # admin scans are not cached
+        return await self.inner.list_users(filters, after, limit)
+
+
+user_cache = UserCache(
+    max_entries=settings.user_cache_max_entries,
+    ttl=settings.user_cache_ttl_seconds,
+    negative_ttl=settings.user_cache_negative_ttl_seconds,
+)
@@ -1,13 +1,83 @@
-from psycopg_pool import ConnectionPool
+from psycopg_pool import AsyncConnectionPool
 from psycopg.rows import dict_row
-from psycopg import Connection
-from typing import Generator
+from psycopg import AsyncConnection
+from typing import AsyncGenerator
+import time
 from app.core.config import settings
+from app.core.metrics import stage_duration
+from app.infrastructure.db.statements import registry
 
-pool = ConnectionPool(conninfo=settings.database_url, kwargs={"autocommit": False})
+# The single connection pool of the process. It is created and opened by the
+# FastAPI lifespan (or a worker's main), never at import time, so nothing
+# connects before gunicorn forks its workers.
+pool: AsyncConnectionPool | None = None
 
 
-def get_db() -> Generator[Connection, None, None]:
-    with pool.connection() as conn:
+def create_pool(**overrides) -> AsyncConnectionPool:
+    options = dict(
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        timeout=settings.db_pool_timeout,
+        max_waiting=settings.db_pool_max_waiting,
+        max_lifetime=settings.db_pool_max_lifetime,
+        max_idle=settings.db_pool_max_idle,
+    )
+    options.update(overrides)
+    options.setdefault("conninfo", settings.database_url)
+    options.setdefault("name", "app")
+    # autocommit: single-statement writes commit in their own round trip,
+    # multi-statement work opens an explicit conn.transaction()
+    return AsyncConnectionPool(
+        kwargs={"autocommit": True},
+        configure=registry.configure,
+        open=False,
+        **options,
+    )
+
+
+async def open_pool(**overrides) -> AsyncConnectionPool:
+    """Create the pool and wait until ``min_size`` connections are established."""
+    global pool
+    if pool is None:
+        pool = create_pool(**overrides)
+        await pool.open(wait=True, timeout=settings.db_pool_open_timeout)
+    return pool
+
+
+async def close_pool() -> None:
+    global pool
+    if pool is not None:
+        closing, pool = pool, None
+        await closing.close()
+
+
+def pool_stats() -> dict | None:
+    """Pool counters for readiness checks, or None while the pool is closed."""
+    if pool is None or pool.closed:
+        return None
+    stats = pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    return {
+        "min_size": stats["pool_min"],
+        "max_size": stats["pool_max"],
+        "size": stats["pool_size"],
+        "available": stats["pool_available"],
+        "in_use": stats["pool_size"] - stats["pool_available"],
+        "requests_waiting": stats["requests_waiting"],
+        "requests_total": requests,
+        "requests_queued": stats.get("requests_queued", 0),
+        "requests_errors": stats.get("requests_errors", 0),
+        "avg_acquire_ms": (
+            round(stats.get("requests_wait_ms", 0) / requests, 3) if requests else 0.0
+        ),
+    }
+
+
+async def get_db() -> AsyncGenerator[AsyncConnection, None]:
+    if pool is None:
+        raise RuntimeError("Database pool is not open")
+    start = time.perf_counter()
+    async with pool.connection() as conn:
+        stage_duration.observe(time.perf_counter() - start, "db_checkout")
         conn.row_factory = dict_row
         yield conn
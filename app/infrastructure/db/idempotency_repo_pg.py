@@ -0,0 +1,102 @@
+from typing import Optional
+from psycopg import AsyncConnection
+from psycopg.rows import args_row
+from psycopg.types.json import Jsonb
+from app.core.metrics import repo_duration, timed
+from app.domain.entities.idempotency import IdempotentResponse
+from app.domain.interfaces.idempotency_repo import IdempotencyRepo
+from app.infrastructure.db.statements import registry
+
+# Takes the key if it is new, expired, or left in flight longer than the
+# lease by a process that died; returns no row when someone else holds it.
+CLAIM = registry.register(
+    "idempotency.claim",
+    """
+    INSERT INTO idempotency_keys (key, fingerprint, expires_at)
+    VALUES (%(key)s, %(fingerprint)s, now() + make_interval(secs => %(ttl)s))
+    ON CONFLICT (key) DO UPDATE
+    SET fingerprint = EXCLUDED.fingerprint,
+        status_code = NULL,
+        response = NULL,
+        created_at = now(),
+        expires_at = EXCLUDED.expires_at
+    WHERE idempotency_keys.expires_at <= now()
+       OR (idempotency_keys.status_code IS NULL
+           AND idempotency_keys.created_at
+               < now() - make_interval(secs => %(lease)s))
+    RETURNING key
+    """,
+)
+
+GET = registry.register(
+    "idempotency.get",
+    """
+    SELECT fingerprint, status_code, response
+    FROM idempotency_keys
+    WHERE key = %s AND expires_at > now()
+    """,
+)
+_response_row = args_row(IdempotentResponse)
+
+COMPLETE = registry.register(
+    "idempotency.complete",
+    "UPDATE idempotency_keys SET status_code = %s, response = %s WHERE key = %s",
+)
+
+RELEASE = registry.register(
+    "idempotency.release",
+    "DELETE FROM idempotency_keys WHERE key = %s AND status_code IS NULL",
+)
+
+DELETE_EXPIRED_BATCH = registry.register(
+    "idempotency.delete_expired_batch",
+    """
+    DELETE FROM idempotency_keys
+    WHERE key IN (
+        SELECT key FROM idempotency_keys
+        WHERE expires_at <= now()
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+)
+
+
+@timed(repo_duration, "idempotency")
+class PostgresIdempotencyRepo(IdempotencyRepo):
+    def __init__(self, conn: AsyncConnection):
+        self.conn = conn
+
+    async def claim(
+        self, key: str, fingerprint: str, ttl_seconds: float, lease_seconds: float
+    ) -> bool:
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur,
+                CLAIM,
+                {
+                    "key": key,
+                    "fingerprint": fingerprint,
+                    "ttl": ttl_seconds,
+                    "lease": lease_seconds,
+                },
+            )
+            return await cur.fetchone() is not None
+
+    async def get(self, key: str) -> Optional[IdempotentResponse]:
+        async with self.conn.cursor(row_factory=_response_row) as cur:
+            await registry.execute(cur, GET, (key,))
+            return await cur.fetchone()
+
+    async def complete(self, key: str, status_code: int, body: dict) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, COMPLETE, (status_code, Jsonb(body), key))
+
+    async def release(self, key: str) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, RELEASE, (key,))
+
+    async def delete_expired(self, limit: int) -> int:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, DELETE_EXPIRED_BATCH, (limit,))
+            return cur.rowcount
@@ -0,0 +1,116 @@
+from psycopg import AsyncConnection
+from psycopg.rows import args_row
+from app.core.config import settings
+from app.domain.entities.outbox import OutboxMessage
+from app.domain.interfaces.outbox_repo import OutboxRepo
+from app.core.metrics import repo_duration, timed
+from app.infrastructure.db.statements import registry
+
+ENQUEUE = registry.register(
+    "outbox.enqueue",
+    """
+    INSERT INTO outbox (email, code, expires_at)
+    VALUES (%s, %s, now() + make_interval(secs => %s))
+    """,
+)
+
+# Claimed rows are leased by pushing available_at forward: a worker that
+# dies mid-send releases them automatically once the lease expires. Rows
+# whose code has expired are left to the reaper.
+CLAIM_BATCH = registry.register(
+    "outbox.claim_batch",
+    """
+    UPDATE outbox
+    SET attempts = attempts + 1,
+        available_at = now() + make_interval(secs => %s)
+    WHERE id IN (
+        SELECT id FROM outbox
+        WHERE failed_at IS NULL AND available_at <= now() AND expires_at > now()
+        ORDER BY available_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, email, code, attempts
+    """,
+)
+_message_row = args_row(OutboxMessage)
+
+MARK_SENT = registry.register(
+    "outbox.mark_sent", "DELETE FROM outbox WHERE id = ANY(%s)"
+)
+
+# one statement for the whole batch, each row with its own delay
+RETRY_LATER = registry.register(
+    "outbox.retry_later",
+    """
+    UPDATE outbox
+    SET available_at = now() + make_interval(secs => d.delay),
+        last_error = %s
+    FROM unnest(%s::bigint[], %s::float8[]) AS d(id, delay)
+    WHERE outbox.id = d.id
+    """,
+)
+
+# the row is kept for its error, the code it can no longer deliver is not
+MARK_FAILED = registry.register(
+    "outbox.mark_failed",
+    """
+    UPDATE outbox SET failed_at = now(), last_error = %s, code = NULL
+    WHERE id = ANY(%s)
+    """,
+)
+
+# Reaper batches, as for activation tokens: failed rows go once their code
+# would have expired anyway, pending ones as soon as it has
+DELETE_EXPIRED_BATCH = registry.register(
+    "outbox.delete_expired_batch",
+    """
+    DELETE FROM outbox
+    WHERE id IN (
+        SELECT id FROM outbox
+        WHERE expires_at < now()
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+)
+
+
+@timed(repo_duration, "outbox")
+class PostgresOutboxRepo(OutboxRepo):
+    def __init__(self, conn: AsyncConnection):
+        self.conn = conn
+
+    async def enqueue(self, email: str, code: str) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur, ENQUEUE, (email, code, settings.otp_ttl_seconds)
+            )
+
+    async def claim_batch(
+        self, limit: int, lease_seconds: float
+    ) -> list[OutboxMessage]:
+        async with self.conn.cursor(row_factory=_message_row) as cur:
+            await registry.execute(cur, CLAIM_BATCH, (lease_seconds, limit))
+            return await cur.fetchall()
+
+    async def mark_sent(self, message_ids: list[int]) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, MARK_SENT, (message_ids,))
+
+    async def retry_later(
+        self, message_ids: list[int], delays_seconds: list[float], error: str
+    ) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur, RETRY_LATER, (error, message_ids, delays_seconds)
+            )
+
+    async def mark_failed(self, message_ids: list[int], error: str) -> None:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, MARK_FAILED, (error, message_ids))
+
+    async def delete_expired(self, limit: int) -> int:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, DELETE_EXPIRED_BATCH, (limit,))
+            return cur.rowcount
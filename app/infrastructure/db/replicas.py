@@ -0,0 +1,274 @@
+"""Read replicas: one pool per replica, lag-based ejection, read routing.
+
+Repositories send their read-only queries through ``ReplicaRouter``. A read
+goes to the primary connection instead when:
+
+- no replica is healthy (unreachable, or more than ``max_lag`` seconds
+  behind the primary at the last check);
+- the repository already wrote in this request;
+- the key being read (an email, a user id) was written by this process
+  within ``sticky_seconds``, the longest a healthy replica can be behind;
+- the replica did not find the row: a miss is confirmed on the primary, so
+  a user created a moment ago by another process is never reported missing;
+- the replica failed the read (pool timeout, connection lost): the replica
+  is ejected until the next lag check admits it again, and the read is
+  retried on the primary.
+
+Like the primary pool, replica pools are opened by the lifespan, never at
+import time.
+"""
+
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from psycopg import AsyncConnection, OperationalError
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from app.core.config import settings
+from app.core.metrics import db_reads, replica_lag
+from app.infrastructure.cache.memory import MISSING, TTLCache
+from app.infrastructure.db import cursor
+
+logger = logging.getLogger("replicas")
+
+PRIMARY_LSN = "SELECT pg_current_wal_lsn()::text AS lsn"
+# a replica that replayed everything the primary had is not behind, however
+# long ago its last replayed transaction was
+REPLICA_LAG = """
+    SELECT pg_last_wal_replay_lsn()::text AS lsn,
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS behind
+"""
+
+
+def parse_lsn(lsn: str) -> int:
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class Replica:
+    def __init__(self, name: str, pool: AsyncConnectionPool):
+        self.name = name
+        self.pool = pool
+        self.lag: Optional[float] = None  # None until checked, or unreachable
+        self.healthy = False
+        self.in_flight = 0
+
+    def stats(self) -> dict:
+        stats = self.pool.get_stats()
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "in_flight": self.in_flight,
+            "size": stats["pool_size"],
+            "available": stats["pool_available"],
+        }
+
+
+class ReplicaRouter:
+    def __init__(
+        self,
+        replicas: list[Replica],
+        max_lag: float,
+        sticky_seconds: float,
+        policy: str = "least_busy",
+        recent_writes_max_entries: int = 100_000,
+    ):
+        if policy not in ("least_busy", "round_robin"):
+            raise ValueError(f"Unknown replica policy {policy!r}")
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.policy = policy
+        self.sticky_seconds = sticky_seconds
+        self._turn = itertools.count()
+        self._recent_writes = TTLCache(recent_writes_max_entries)
+
+    def wrote(self, *keys: str) -> None:
+        """Pin reads of ``keys`` to the primary until replicas caught up."""
+        for key in keys:
+            self._recent_writes.set(key, True, self.sticky_seconds)
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        return key is not None and self._recent_writes.get(key) is not MISSING
+
+    def pick(self) -> Optional[Replica]:
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        if self.policy == "round_robin":
+            return healthy[next(self._turn) % len(healthy)]
+        # least busy; rotate the start so ties spread evenly
+        start = next(self._turn) % len(healthy)
+        rotated = healthy[start:] + healthy[:start]
+        return min(rotated, key=lambda r: r.in_flight)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Optional[AsyncConnection]]:
+        """A replica connection, or None when reads should use the primary."""
+        replica = self.pick()
+        if replica is None:
+            yield None
+            return
+        replica.in_flight += 1
+        try:
+            async with replica.pool.connection() as conn:
+                conn.row_factory = dict_row
+                yield conn
+        except (PoolTimeout, OperationalError) as e:
+            replica.lag = None
+            self._set_health(replica, False, f"read failed: {e}")
+            raise
+        finally:
+            replica.in_flight -= 1
+
+    async def check_lag(self) -> None:
+        """Measure every replica against the primary's current WAL position."""
+        async with cursor.pool.connection() as conn:
+            async with conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(PRIMARY_LSN)
+                primary_lsn = parse_lsn((await cur.fetchone())[0])
+        for replica in self.replicas:
+            try:
+                async with replica.pool.connection(timeout=self.max_lag) as conn:
+                    async with conn.cursor(row_factory=tuple_row) as cur:
+                        await cur.execute(REPLICA_LAG)
+                        lsn, behind = await cur.fetchone()
+            except Exception as e:
+                replica.lag = None
+                self._set_health(replica, False, f"unreachable: {e}")
+                continue
+            if lsn is None:
+                replica.lag = None
+                self._set_health(replica, False, "not a replica")
+                continue
+            if parse_lsn(lsn) >= primary_lsn:
+                replica.lag = 0.0
+            elif behind is None:
+                replica.lag = None
+                self._set_health(replica, False, "still catching up")
+                continue
+            else:
+                replica.lag = float(behind)
+            replica_lag.set(replica.lag, replica.name)
+            healthy = replica.lag <= self.max_lag
+            self._set_health(replica, healthy, f"{replica.lag:.1f}s behind")
+
+    async def monitor(self, stop: asyncio.Event, interval: float) -> None:
+        while not stop.is_set():
+            try:
+                await self.check_lag()
+            except Exception:
+                logger.exception("replica lag check failed")
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "max_lag_seconds": self.max_lag,
+            "replicas": [r.stats() for r in self.replicas],
+        }
+
+    def _set_health(self, replica: Replica, healthy: bool, reason: str) -> None:
+        if healthy != replica.healthy:
+            action = "admitted" if healthy else "ejected"
+            logger.warning("replica %s %s (%s)", replica.name, action, reason)
+        replica.healthy = healthy
+
+
+# The router of the process, None without DATABASE_REPLICA_URLS
+router: ReplicaRouter | None = None
+
+
+async def open_replicas() -> ReplicaRouter | None:
+    """Open a pool per replica and take a first lag measurement."""
+    global router
+    if router is not None or not settings.database_replica_urls:
+        return router
+    replicas = []
+    for i, dsn in enumerate(settings.database_replica_urls):
+        pool = cursor.create_pool(
+            conninfo=dsn,
+            name=f"replica{i}",
+            min_size=settings.db_replica_pool_min_size,
+            max_size=settings.db_replica_pool_max_size,
+        )
+        # a replica that is down must not keep the API from starting
+        await pool.open(wait=False)
+        replicas.append(Replica(f"replica{i}", pool))
+    router = ReplicaRouter(
+        replicas,
+        max_lag=settings.db_replica_max_lag_seconds,
+        sticky_seconds=(
+            settings.db_replica_max_lag_seconds + settings.db_replica_lag_check_interval
+        ),
+        policy=settings.db_replica_policy,
+    )
+    await router.check_lag()
+    return router
+
+
+async def close_replicas() -> None:
+    global router
+    if router is not None:
+        closing, router = router, None
+        for replica in closing.replicas:
+            await replica.pool.close()
+
+
+async def read(
+    primary: AsyncConnection,
+    run,
+    key: Optional[str] = None,
+    sticky: bool = False,
+    confirm_miss: bool = True,
+):
+    """``await run(conn)`` on a replica when allowed, else on ``primary``.
+
+    ``primary`` may be None: a primary connection is then checked out only
+    if the read goes there. With ``confirm_miss`` a None from a replica is
+    retried on the primary. A read the replica failed always is.
+    """
+    if router is None or sticky or router.is_pinned(key):
+        db_reads.inc("primary")
+        return await _on_primary(primary, run)
+    try:
+        async with router.connection() as conn:
+            if conn is not None:
+                result = await run(conn)
+    except (PoolTimeout, OperationalError):
+        db_reads.inc("replica_error")
+        return await _on_primary(primary, run)
+    if conn is None:
+        db_reads.inc("primary")
+        return await _on_primary(primary, run)
+    if result is not None or not confirm_miss:
+        db_reads.inc("replica")
+        return result
+    db_reads.inc("replica_miss")
+    return await _on_primary(primary, run)
+
+
+async def _on_primary(primary: Optional[AsyncConnection], run):
+    if primary is not None:
+        return await run(primary)
+    async with cursor.pool.connection() as conn:
+        conn.row_factory = dict_row
+        return await run(conn)
+
+
+def wrote(*keys: str) -> None:
+    if router is not None:
+        router.wrote(*keys)
+
+
+def email_key(email: str) -> str:
+    return f"email:{email.lower()}"
+
+
+def user_key(user_id: int) -> str:
+    return f"user:{user_id}"
@@ -0,0 +1,95 @@
+"""Registry of the named SQL statements used by the Postgres repositories.
+
+Every repository query is registered here once and executed through
+``execute()``, which asks psycopg to run it as a server-side prepared
+statement and keeps per-statement counters. psycopg prepares a statement
+in the same round trip as its first execution on a connection, so the
+cost of parse/plan is paid once per pooled connection instead of once per
+request.
+
+``first_uses`` counts the executions that were the first of a statement
+on their connection. It is not a count of server-side prepares: psycopg
+prepares again after evicting a statement from its per-connection cache
+(``prepared_max``) or after the server discarded it, and none of that is
+visible here.
+"""
+
+import time
+import weakref
+from dataclasses import dataclass
+from psycopg import AsyncConnection, AsyncCursor
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    sql: str
+
+
+@dataclass
+class StatementStats:
+    executions: int = 0
+    first_uses: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+
+
+class StatementRegistry:
+    def __init__(self, prepare: bool = True):
+        self.prepare = prepare
+        self._statements: dict[str, Statement] = {}
+        self._stats: dict[str, StatementStats] = {}
+        # statement names already executed, per live connection
+        self._prepared: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def register(self, name: str, sql: str) -> Statement:
+        if name in self._statements:
+            raise ValueError(f"Statement {name!r} is already registered")
+        statement = Statement(name, sql)
+        self._statements[name] = statement
+        self._stats[name] = StatementStats()
+        return statement
+
+    def __len__(self) -> int:
+        return len(self._statements)
+
+    async def configure(self, conn: AsyncConnection) -> None:
+        """Pool ``configure`` hook, run once for every new connection."""
+        if self.prepare:
+            # keep every registered statement in psycopg's per-connection cache
+            conn.prepared_max = max(conn.prepared_max or 0, 2 * len(self))
+        self._prepared[conn] = set()
+
+    async def execute(self, cur: AsyncCursor, statement: Statement, params=None):
+        stats = self._stats[statement.name]
+        start = time.perf_counter()
+        try:
+            await cur.execute(statement.sql, params, prepare=self.prepare)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.executions += 1
+            stats.total_seconds += time.perf_counter() - start
+
+        if self.prepare:
+            seen = self._prepared.setdefault(cur.connection, set())
+            if statement.name not in seen:
+                seen.add(statement.name)
+                stats.first_uses += 1
+        return cur
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            name: {
+                "executions": s.executions,
+                "first_uses": s.first_uses,
+                "errors": s.errors,
+                "total_ms": round(s.total_seconds * 1000, 3),
+            }
+            for name, s in self._stats.items()
+        }
+
+
+registry = StatementRegistry(prepare=settings.db_prepared_statements)
@@ -1,31 +1,191 @@
-from datetime import datetime, timedelta, timezone
+from typing import Optional
 from app.core.config import settings
 from app.domain.entities.token import ActivationToken
 from app.domain.interfaces.token_repo import TokenRepo
-from psycopg import Connection
+from app.core.metrics import repo_duration, timed
+from app.infrastructure.db import replicas
+from app.infrastructure.db.replicas import email_key, user_key
+from app.infrastructure.db.statements import registry
+from psycopg import AsyncConnection
+from psycopg.rows import args_row
 
+# UNIQUE (user_id): a new code replaces the user's token in place, whether
+# the previous one is live, expired or consumed
+_REPLACE_TOKEN = """
+    ON CONFLICT (user_id) DO UPDATE
+    SET code_hash = EXCLUDED.code_hash,
+        expires_at = EXCLUDED.expires_at,
+        created_at = now(),
+        consumed_at = NULL,
+        failed_attempts = 0
+"""
 
+# ActivationToken's fields, in order: rows are built positionally
+_TOKEN_COLUMNS = "id, user_id, code_hash, expires_at, consumed_at, failed_attempts"
+_token_row = args_row(ActivationToken)
+
+UPSERT = registry.register(
+    "tokens.upsert",
+    f"""
+    INSERT INTO activation_tokens (user_id, code_hash, expires_at)
+    VALUES (%s, %s, now() + make_interval(secs => %s))
+    {_REPLACE_TOKEN}
+    RETURNING {_TOKEN_COLUMNS}
+    """,
+)
+
+# Resend in one statement: the upsert above, limited to inactive users and
+# to tokens older than the cooldown, plus the outbox row. Within the
+# cooldown nothing is written and no row comes back.
+REISSUE_FOR_EMAIL = registry.register(
+    "tokens.reissue_for_email",
+    f"""
+    WITH target AS (
+        SELECT id, email FROM users
+        WHERE email = %(email)s AND NOT is_active
+    ), token AS (
+        INSERT INTO activation_tokens (user_id, code_hash, expires_at)
+        SELECT id, %(code_hash)s, now() + make_interval(secs => %(ttl)s)
+        FROM target
+        {_REPLACE_TOKEN}
+        WHERE activation_tokens.created_at
+              <= now() - make_interval(secs => %(cooldown)s)
+        RETURNING {_TOKEN_COLUMNS}
+    ), mail AS (
+        INSERT INTO outbox (email, code, expires_at)
+        SELECT target.email, %(code)s, token.expires_at
+        FROM target JOIN token ON token.user_id = target.id
+    )
+    SELECT {_TOKEN_COLUMNS} FROM token
+    """,
+)
+
+# The same conditions, read only: lets a resend skip hashing a code that
+# the statement above would not store. A user without a token (reaped)
+# gets one whatever the cooldown.
+REISSUE_DUE = registry.register(
+    "tokens.reissue_due",
+    """
+    SELECT 1
+    FROM users u
+    LEFT JOIN activation_tokens t ON t.user_id = u.id
+    WHERE u.email = %(email)s AND NOT u.is_active
+      AND (t.id IS NULL
+           OR t.created_at <= now() - make_interval(secs => %(cooldown)s))
+    """,
+)
+
+GET_ACTIVE_FOR_USER = registry.register(
+    "tokens.get_active_for_user",
+    f"""
+    SELECT {_TOKEN_COLUMNS}
+    FROM activation_tokens
+    WHERE user_id = %s AND consumed_at IS NULL
+    """,
+)
+
+CONSUME = registry.register(
+    "tokens.consume",
+    """
+    UPDATE activation_tokens SET consumed_at = now()
+    WHERE id = %s AND consumed_at IS NULL
+    """,
+)
+
+# Reaper batches: bounded, and SKIP LOCKED so they never wait on (or block)
+# an activation in flight. Each one runs on its own partial index.
+DELETE_CONSUMED_BATCH = registry.register(
+    "tokens.delete_consumed_batch",
+    """
+    DELETE FROM activation_tokens
+    WHERE id IN (
+        SELECT id FROM activation_tokens
+        WHERE consumed_at IS NOT NULL
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+)
+
+DELETE_EXPIRED_BATCH = registry.register(
+    "tokens.delete_expired_batch",
+    """
+    DELETE FROM activation_tokens
+    WHERE id IN (
+        SELECT id FROM activation_tokens
+        WHERE consumed_at IS NULL
+          AND expires_at < now() - make_interval(secs => %s)
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    """,
+)
+
+
+@timed(repo_duration, "tokens")
 class PostgresTokenRepo(TokenRepo):
-    def __init__(self, conn: Connection):
+    def __init__(self, conn: AsyncConnection):
         self.conn = conn
+        # once this repo wrote, its reads stay on the primary
+        self._sticky = False
+
+    def _wrote(self, *keys: str) -> None:
+        self._sticky = True
+        replicas.wrote(*keys)
+
+    async def upsert(self, user_id: int, code_hash: str) -> ActivationToken:
+        self._wrote(user_key(user_id))
+        async with self.conn.cursor(row_factory=_token_row) as cur:
+            await registry.execute(
+                cur, UPSERT, (user_id, code_hash, settings.otp_ttl_seconds)
+            )
+            return await cur.fetchone()
+
+    async def reissue_for_email(
+        self, email: str, code_hash: str, code: str, cooldown_seconds: float
+    ) -> Optional[ActivationToken]:
+        self._wrote(email_key(email))
+        async with self.conn.cursor(row_factory=_token_row) as cur:
+            await registry.execute(
+                cur,
+                REISSUE_FOR_EMAIL,
+                {
+                    "email": email,
+                    "code_hash": code_hash,
+                    "code": code,
+                    "ttl": settings.otp_ttl_seconds,
+                    "cooldown": cooldown_seconds,
+                },
+            )
+            return await cur.fetchone()
+
+    async def reissue_due(self, email: str, cooldown_seconds: float) -> bool:
+        # on the primary: the cooldown is measured from the last write
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur, REISSUE_DUE, {"email": email, "cooldown": cooldown_seconds}
+            )
+            return await cur.fetchone() is not None
+
+    async def get_active_for_user(self, user_id: int) -> Optional[ActivationToken]:
+        async def run(conn):
+            async with conn.cursor(row_factory=_token_row) as cur:
+                await registry.execute(cur, GET_ACTIVE_FOR_USER, (user_id,))
+                return await cur.fetchone()
+
+        return await replicas.read(self.conn, run, user_key(user_id), self._sticky)
+
+    async def consume(self, token_id: int) -> None:
+        self._sticky = True
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, CONSUME, (token_id,))
+
+    async def delete_consumed(self, limit: int) -> int:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, DELETE_CONSUMED_BATCH, (limit,))
+            return cur.rowcount
 
-    def upsert(self, user_id: int, code_hash: str) -> ActivationToken:
-        expires_at = datetime.now(timezone.utc) + timedelta(
-            seconds=settings.otp_ttl_seconds
-        )
-        with self.conn.transaction():
-            with self.conn.cursor() as cur:
-                cur.execute(
-                    "DELETE FROM activation_tokens WHERE user_id = %s AND consumed_at IS NULL",
-                    (user_id,),
-                )
-                cur.execute(
-                    """
-                    INSERT INTO activation_tokens (user_id, code_hash, expires_at)
-                    VALUES (%s, %s, %s)
-                    RETURNING id, user_id, code_hash, expires_at, consumed_at
-                    """,
-                    (user_id, code_hash, expires_at),
-                )
-                row = cur.fetchone()
-                return ActivationToken(**row)
+    async def delete_expired(self, limit: int, grace_seconds: float) -> int:
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, DELETE_EXPIRED_BATCH, (grace_seconds, limit))
+            return cur.rowcount
@@ -1,48 +1,394 @@
-from psycopg import Connection
+from datetime import datetime, timezone
+from typing import Optional
+from psycopg import AsyncConnection
 from psycopg.errors import UniqueViolation
-from app.domain.entities.user import User
+from psycopg.rows import args_row, tuple_row
+from app.core.config import settings
+from app.domain.entities.token import ActivationToken
+from app.domain.entities.user import User, UserFilter, UserSummary
 from app.domain.interfaces.user_repo import UserRepo
 from app.core.exceptions import UserAlreadyExists
+from app.core.metrics import repo_duration, timed
+from app.infrastructure.db import replicas
+from app.infrastructure.db.replicas import email_key, user_key
+from app.infrastructure.db.statements import registry
 
+CREATE = registry.register(
+    "users.create",
+    """
+    INSERT INTO users (email, password_hash, is_active)
+    VALUES (%s, %s, false)
+    RETURNING id
+    """,
+)
 
+# One statement: user, activation token and outbox row are inserted
+# together, and a duplicate email simply yields no row.
+CREATE_WITH_TOKEN = registry.register(
+    "users.create_with_token",
+    """
+    WITH new_user AS (
+        INSERT INTO users (email, password_hash, is_active)
+        VALUES (%(email)s, %(password_hash)s, false)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    ), new_token AS (
+        INSERT INTO activation_tokens (user_id, code_hash, expires_at)
+        SELECT id, %(code_hash)s, now() + make_interval(secs => %(ttl)s)
+        FROM new_user
+    ), new_mail AS (
+        INSERT INTO outbox (email, code, expires_at)
+        SELECT email, %(code)s, now() + make_interval(secs => %(ttl)s)
+        FROM new_user
+    )
+    SELECT id FROM new_user
+    """,
+)
+
+# Reads project the entity's fields in declaration order, so rows are
+# built positionally by args_row: no per-row dict, and columns added to the
+# table later are not fetched.
+_USER_COLUMNS = "id, email, is_active, password_hash"
+
+GET_BY_EMAIL = registry.register(
+    "users.get_by_email", f"SELECT {_USER_COLUMNS} FROM users WHERE email = %s"
+)
+
+GET_BY_ID = registry.register(
+    "users.get_by_id", f"SELECT {_USER_COLUMNS} FROM users WHERE id = %s"
+)
+
+# UNIQUE (user_id) on activation_tokens: at most one joined row. The first
+# four columns are the User, the rest the ActivationToken, NULL without one
+GET_WITH_ACTIVE_TOKEN = registry.register(
+    "users.get_with_active_token",
+    """
+    SELECT u.id, u.email, u.is_active, u.password_hash,
+           t.id, t.user_id, t.code_hash, t.expires_at, t.consumed_at,
+           t.failed_attempts
+    FROM users u
+    LEFT JOIN activation_tokens t
+           ON t.user_id = u.id AND t.consumed_at IS NULL
+    WHERE u.email = %s
+    """,
+)
+
+# the token half of the above, for callers that already hold the user
+GET_ACTIVE_TOKEN = registry.register(
+    "users.get_active_token",
+    """
+    SELECT id, user_id, code_hash, expires_at, consumed_at, failed_attempts
+    FROM activation_tokens
+    WHERE user_id = %s AND consumed_at IS NULL
+    """,
+)
+
+# Consuming the token and activating the user is one statement; the row
+# lock on the token makes concurrent submits serialize, and only the
+# first one still sees consumed_at IS NULL. A token locked by wrong codes
+# submitted concurrently is refused as well.
+ACTIVATE_WITH_TOKEN = registry.register(
+    "users.activate_with_token",
+    """
+    WITH consumed AS (
+        UPDATE activation_tokens
+        SET consumed_at = now()
+        WHERE id = %s AND user_id = %s
+          AND consumed_at IS NULL AND expires_at > now()
+          AND failed_attempts < %s
+        RETURNING user_id
+    )
+    UPDATE users
+    SET is_active = true, updated_at = now()
+    FROM consumed
+    WHERE users.id = consumed.user_id
+    RETURNING users.id
+    """,
+)
+
+RECORD_FAILED_ATTEMPT = registry.register(
+    "users.record_failed_attempt",
+    """
+    UPDATE activation_tokens
+    SET failed_attempts = failed_attempts + 1
+    WHERE id = %s AND user_id = %s AND consumed_at IS NULL
+    RETURNING failed_attempts
+    """,
+)
+
+# compare-and-set: a hash changed since it was read is left alone
+UPDATE_PASSWORD_HASH = registry.register(
+    "users.update_password_hash",
+    """
+    UPDATE users SET password_hash = %s, updated_at = now()
+    WHERE id = %s AND password_hash = %s
+    RETURNING id
+    """,
+)
+
+ACTIVATE = registry.register(
+    "users.activate", "UPDATE users SET is_active = true WHERE id = %s RETURNING id"
+)
+
+
+# Bulk import: rows are COPYed into a per-connection staging table and merged
+# in one statement. The first occurrence of an email in a chunk wins; later
+# lines and existing accounts are left out of the result (duplicates).
+# DDL and COPY are not prepared, so they stay out of the registry
+CREATE_IMPORT_STAGING = """
+    CREATE TEMP TABLE IF NOT EXISTS import_staging (
+        line          INT NOT NULL,
+        email         CITEXT NOT NULL,
+        password_hash TEXT NOT NULL,
+        code_hash     TEXT NOT NULL,
+        code          TEXT NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+COPY_IMPORT_STAGING = (
+    "COPY import_staging (line, email, password_hash, code_hash, code) FROM STDIN"
+)
+
+MERGE_IMPORT_STAGING = registry.register(
+    "users.merge_import_staging",
+    """
+    WITH first_lines AS (
+        SELECT DISTINCT ON (email) line, email, password_hash, code_hash, code
+        FROM import_staging
+        ORDER BY email, line
+    ), new_users AS (
+        INSERT INTO users (email, password_hash, is_active)
+        SELECT email, password_hash, false FROM first_lines
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email
+    ), new_tokens AS (
+        INSERT INTO activation_tokens (user_id, code_hash, expires_at)
+        SELECT u.id, f.code_hash, now() + make_interval(secs => %(ttl)s)
+        FROM new_users u JOIN first_lines f ON f.email = u.email
+    ), new_mail AS (
+        INSERT INTO outbox (email, code, expires_at)
+        SELECT u.email, f.code, now() + make_interval(secs => %(ttl)s)
+        FROM new_users u JOIN first_lines f ON f.email = u.email
+    )
+    SELECT f.line, u.id
+    FROM new_users u JOIN first_lines f ON f.email = u.email
+    """,
+)
+
+
+# Admin listing, keyset-paginated on (created_at, id): the row comparison
+# and the created_at range are one index range scan, whatever the page. The
+# is_active and email prefix filters change which index serves the query,
+# so each combination is its own prepared statement.
+def _list_statement(by_active: bool, by_prefix: bool):
+    where = [
+        "(created_at, id) > (%(after_created_at)s, %(after_id)s)",
+        "created_at >= %(created_from)s",
+        "created_at < %(created_to)s",
+    ]
+    if by_active:
+        where.append("is_active = %(is_active)s")
+    if by_prefix:
+        # matches idx_users_email_prefix; CITEXT semantics are lower().
+        # That index is ordered by email, not by the keyset: a page either
+        # reads and sorts every match of the prefix or walks the keyset
+        # index until it finds enough of them, so its cost grows with the
+        # matches (or with the rows before them), unlike the other variants
+        where.append("lower(email::text) LIKE %(email_pattern)s")
+    name = (
+        "users.list"
+        + ("_active" if by_active else "")
+        + ("_prefix" if by_prefix else "")
+    )
+    return registry.register(
+        name,
+        f"""
+        SELECT id, email, is_active, created_at
+        FROM users
+        WHERE {" AND ".join(where)}
+        ORDER BY created_at, id
+        LIMIT %(limit)s
+        """,
+    )
+
+
+LIST = {
+    (by_active, by_prefix): _list_statement(by_active, by_prefix)
+    for by_active in (False, True)
+    for by_prefix in (False, True)
+}
+
+
+# open ends of the created_at range and of the keyset
+_MIN_TIME = datetime.min.replace(tzinfo=timezone.utc)
+_MAX_TIME = datetime.max.replace(tzinfo=timezone.utc)
+
+_user_row = args_row(User)
+_token_row = args_row(ActivationToken)
+_summary_row = args_row(UserSummary)
+
+
+def _like_prefix(prefix: str) -> str:
+    escaped = (
+        prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return escaped + "%"
+
+
+@timed(repo_duration, "users")
 class PostgresUserRepo(UserRepo):
-    def __init__(self, conn: Connection):
+    """``conn`` is a primary connection. Lookups by email or id and the
+    admin listing may be served by a read replica (see ``replicas``); the
+    activation read stays on the primary, as it feeds the writes after it.
+    Without ``conn`` the repo is read-only: each read checks out a primary
+    connection only when no replica serves it."""
+
+    def __init__(self, conn: Optional[AsyncConnection]):
         self.conn = conn
+        # once this repo wrote, its reads stay on the primary
+        self._sticky = False
+
+    def _wrote(self, *keys: str) -> None:
+        self._sticky = True
+        replicas.wrote(*keys)
+
+    async def _read_one(self, statement, params, key: str) -> Optional[User]:
+        async def run(conn):
+            async with conn.cursor(row_factory=_user_row) as cur:
+                await registry.execute(cur, statement, params)
+                return await cur.fetchone()
 
-    def create(self, email: str, password_hash: str) -> int:
+        return await replicas.read(self.conn, run, key, self._sticky)
+
+    async def create(self, email: str, password_hash: str) -> int:
+        self._wrote(email_key(email))
         try:
-            with self.conn.transaction():
-                with self.conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        INSERT INTO users (email, password_hash, is_active)
-                        VALUES (%s, %s, false)
-                        RETURNING id
-                        """,
-                        (email, password_hash),
-                    )
-                    return cur.fetchone()["id"]
+            async with self.conn.transaction():
+                async with self.conn.cursor() as cur:
+                    await registry.execute(cur, CREATE, (email, password_hash))
+                    return (await cur.fetchone())["id"]
         except UniqueViolation:
             # Map infra error → domain exception
             raise UserAlreadyExists()
 
-    def get_by_email(self, email: str):
-        with self.conn.cursor() as cur:
-            cur.execute("SELECT * FROM users WHERE email = %s", (email,))
-            row = cur.fetchone()
-            return User(**row) if row else None
-
-    def get_by_id(self, user_id: int):
-        with self.conn.cursor() as cur:
-            cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-            row = cur.fetchone()
-            return User(**row) if row else None
-
-    def activate(self, user_id: int) -> bool:
-        with self.conn.transaction():
-            with self.conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE users SET is_active = true WHERE id = %s RETURNING id",
-                    (user_id,),
-                )
-                return cur.fetchone() is not None
+    async def create_with_token(
+        self, email: str, password_hash: str, code_hash: str, code: str
+    ) -> int:
+        self._wrote(email_key(email))
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur,
+                CREATE_WITH_TOKEN,
+                {
+                    "email": email,
+                    "password_hash": password_hash,
+                    "code_hash": code_hash,
+                    "code": code,
+                    "ttl": settings.otp_ttl_seconds,
+                },
+            )
+            row = await cur.fetchone()
+        if row is None:
+            raise UserAlreadyExists()
+        return row["id"]
+
+    async def bulk_create_with_tokens(
+        self, rows: list[tuple[int, str, str, str, str]], ttl_seconds: int
+    ) -> dict[int, int]:
+        """Insert (line, email, password_hash, code_hash, code) rows.
+
+        Returns ``{line: user_id}`` for the rows that created a user.
+        """
+        self._wrote(*(email_key(row[1]) for row in rows))
+        async with self.conn.transaction():
+            async with self.conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(CREATE_IMPORT_STAGING)
+                async with cur.copy(COPY_IMPORT_STAGING) as copy:
+                    for row in rows:
+                        await copy.write_row(row)
+                await registry.execute(cur, MERGE_IMPORT_STAGING, {"ttl": ttl_seconds})
+                return dict(await cur.fetchall())
+
+    async def get_by_email(self, email: str):
+        return await self._read_one(GET_BY_EMAIL, (email,), email_key(email))
+
+    async def get_by_id(self, user_id: int):
+        return await self._read_one(GET_BY_ID, (user_id,), user_key(user_id))
+
+    async def get_with_active_token(self, email: str):
+        async with self.conn.cursor(row_factory=tuple_row) as cur:
+            await registry.execute(cur, GET_WITH_ACTIVE_TOKEN, (email,))
+            row = await cur.fetchone()
+        if row is None:
+            return None, None
+        user = User(*row[:4])
+        if row[4] is None:
+            return user, None
+        return user, ActivationToken(*row[4:])
+
+    async def get_active_token(self, user_id: int) -> Optional[ActivationToken]:
+        async with self.conn.cursor(row_factory=_token_row) as cur:
+            await registry.execute(cur, GET_ACTIVE_TOKEN, (user_id,))
+            return await cur.fetchone()
+
+    async def record_failed_attempt(self, user_id: int, token_id: int) -> int:
+        self._wrote(user_key(user_id))
+        async with self.conn.cursor() as cur:
+            await registry.execute(cur, RECORD_FAILED_ATTEMPT, (token_id, user_id))
+            row = await cur.fetchone()
+            return row["failed_attempts"] if row else 0
+
+    async def activate_with_token(
+        self, user_id: int, token_id: int, max_failed_attempts: int
+    ) -> bool:
+        self._wrote(user_key(user_id))
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur,
+                ACTIVATE_WITH_TOKEN,
+                (token_id, user_id, max_failed_attempts),
+            )
+            return await cur.fetchone() is not None
+
+    async def update_password_hash(
+        self, user_id: int, old_hash: str, new_hash: str
+    ) -> bool:
+        self._wrote(user_key(user_id))
+        async with self.conn.cursor() as cur:
+            await registry.execute(
+                cur, UPDATE_PASSWORD_HASH, (new_hash, user_id, old_hash)
+            )
+            return await cur.fetchone() is not None
+
+    async def list_users(
+        self,
+        filters: UserFilter,
+        after: Optional[tuple[datetime, int]],
+        limit: int,
+    ) -> list[UserSummary]:
+        after_created_at, after_id = after or (_MIN_TIME, 0)
+        statement = LIST[filters.is_active is not None, bool(filters.email_prefix)]
+        params = {
+            "after_created_at": after_created_at,
+            "after_id": after_id,
+            "created_from": filters.created_from or _MIN_TIME,
+            "created_to": filters.created_to or _MAX_TIME,
+            "is_active": filters.is_active,
+            "email_pattern": _like_prefix(filters.email_prefix or ""),
+            "limit": limit,
+        }
+
+        async def run(conn):
+            async with conn.cursor(row_factory=_summary_row) as cur:
+                await registry.execute(cur, statement, params)
+                return await cur.fetchall()
+
+        # an admin listing tolerates lag: an empty page is not retried
+        return await replicas.read(self.conn, run, None, self._sticky, False)
+
+    async def activate(self, user_id: int) -> bool:
+        self._wrote(user_key(user_id))
+        async with self.conn.transaction():
+            async with self.conn.cursor() as cur:
+                await registry.execute(cur, ACTIVATE, (user_id,))
+                return await cur.fetchone() is not None
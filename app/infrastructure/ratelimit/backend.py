@@ -0,0 +1,42 @@
+"""Sliding-window rate limiting.
+
+Windows are approximated with two fixed buckets (the sliding window
+counter): the previous bucket's count is weighted by how much of it still
+overlaps the window. Two integers per key, and no per-hit timestamps.
+"""
+
+from typing import Optional
+
+
+def estimate(previous: int, current: int, elapsed: float, window: float) -> float:
+    return previous * (1 - elapsed / window) + current
+
+
+def wait_time(
+    previous: int, current: int, elapsed: float, window: float, limit: int
+) -> float:
+    """Seconds until one more hit fits under ``limit``, 0 if it fits now."""
+    room = limit - 1
+    if estimate(previous, current, elapsed, window) <= room:
+        return 0.0
+    if current <= room:
+        # the previous bucket has to fade out a little more
+        return window * (1 - (room - current) / previous) - elapsed
+    # the current bucket alone is full: wait until it is the previous one
+    # and has faded enough
+    return (window - elapsed) + window * (1 - room / current)
+
+
+class RateLimitStore:
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """Count a hit on ``key`` if it fits under ``limit`` per ``window``
+        seconds. Returns 0 when allowed, else the seconds to wait."""
+        ...
+
+
+class CounterBackend:
+    """Shared counter store (e.g. Redis INCR/EXPIRE) so limits hold across
+    workers and hosts."""
+
+    async def get(self, key: str) -> Optional[int]: ...
+    async def incr(self, key: str, ttl: float) -> int: ...
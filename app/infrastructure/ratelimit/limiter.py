@@ -0,0 +1,51 @@
+import math
+from dataclasses import dataclass
+from app.core.config import settings
+from app.infrastructure.ratelimit.backend import RateLimitStore
+from app.infrastructure.ratelimit.memory import ShardedMemoryStore
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    limit: int
+    window: float
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Rule":
+        """``"10/60"`` is 10 hits per 60 seconds."""
+        limit, window = spec.split("/")
+        rule = cls(name, int(limit), float(window))
+        if rule.limit < 1 or rule.window <= 0:
+            raise ValueError(f"Invalid rate limit {spec!r} for {name}")
+        return rule
+
+
+class RateLimiter:
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+        self.rejected: dict[str, int] = {}
+
+    async def check(self, *hits: tuple[Rule, str]) -> int:
+        """Count one hit per (rule, subject). Returns 0 when every rule allows
+        it, else the Retry-After in seconds of the first rule that does not
+        (later rules are not counted)."""
+        for rule, subject in hits:
+            wait = await self.store.hit(
+                f"rl:{rule.name}:{subject}", rule.limit, rule.window
+            )
+            if wait > 0:
+                self.rejected[rule.name] = self.rejected.get(rule.name, 0) + 1
+                return max(1, math.ceil(wait))
+        return 0
+
+    def stats(self) -> dict:
+        store = self.store.stats() if hasattr(self.store, "stats") else None
+        return {"rejected": dict(self.rejected), "store": store}
+
+
+limiter = RateLimiter(
+    ShardedMemoryStore(
+        shards=settings.ratelimit_shards, max_keys=settings.ratelimit_max_keys
+    )
+)
@@ -0,0 +1,81 @@
+import time
+from typing import Callable, Optional
+from app.infrastructure.ratelimit.backend import (
+    CounterBackend,
+    RateLimitStore,
+    wait_time,
+)
+
+
+class ShardedMemoryStore(RateLimitStore):
+    """In-process sliding windows, spread over independent shards.
+
+    Each shard is bounded; when one fills up, only that shard is swept for
+    stale windows (then trimmed oldest first), so the cost of a sweep does
+    not grow with the total number of tracked keys. Like TTLCache, it is
+    meant to be used from the event loop only.
+    """
+
+    def __init__(
+        self,
+        shards: int = 16,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.clock = clock
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        # key -> [window, bucket, previous, current]
+        self._shards: list[dict[str, list]] = [{} for _ in range(shards)]
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = self.clock()
+        bucket = int(now // window)
+        shard = self._shards[hash(key) % len(self._shards)]
+
+        entry = shard.get(key)
+        if entry is None:
+            if len(shard) >= self.max_keys_per_shard:
+                self._sweep(shard, now)
+            entry = shard[key] = [window, bucket, 0, 0]
+        elif entry[1] != bucket:
+            # roll the buckets forward
+            entry[2] = entry[3] if entry[1] == bucket - 1 else 0
+            entry[1], entry[3] = bucket, 0
+
+        wait = wait_time(entry[2], entry[3], now - bucket * window, window, limit)
+        if wait == 0:
+            entry[3] += 1
+        return wait
+
+    def _sweep(self, shard: dict[str, list], now: float) -> None:
+        for key in [k for k, e in shard.items() if int(now // e[0]) - e[1] > 1]:
+            del shard[key]
+        while len(shard) >= self.max_keys_per_shard:
+            del shard[next(iter(shard))]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {"keys": len(self), "evictions": self.evictions}
+
+
+class InMemoryCounterBackend(CounterBackend):
+    """Local stand-in for a shared counter store: per-process only."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._data: dict[str, tuple[float, int]] = {}
+
+    async def get(self, key: str) -> Optional[int]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self.clock():
+            return None
+        return entry[1]
+
+    async def incr(self, key: str, ttl: float) -> int:
+        value = (await self.get(key) or 0) + 1
+        self._data[key] = (self.clock() + ttl, value)
+        return value
@@ -0,0 +1,31 @@
+import time
+from typing import Callable
+from app.infrastructure.ratelimit.backend import (
+    CounterBackend,
+    RateLimitStore,
+    wait_time,
+)
+
+
+class SharedStore(RateLimitStore):
+    """Sliding windows kept in a shared counter store.
+
+    Buckets are keyed on wall-clock time so every process agrees on them.
+    Reading and incrementing are two round trips: concurrent workers may
+    overshoot a limit by a few hits, never by a window's worth.
+    """
+
+    def __init__(self, backend: CounterBackend, clock: Callable[[], float] = time.time):
+        self.backend = backend
+        self.clock = clock
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        now = self.clock()
+        bucket = int(now // window)
+        previous = await self.backend.get(f"{key}:{bucket - 1}") or 0
+        current = await self.backend.get(f"{key}:{bucket}") or 0
+        wait = wait_time(previous, current, now - bucket * window, window, limit)
+        if wait == 0:
+            # the bucket is still read as "previous" during the next window
+            await self.backend.incr(f"{key}:{bucket}", ttl=2 * window)
+        return wait
@@ -0,0 +1,152 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from app.core.config import settings
+from app.core.exceptions import MailerUnavailable
+from app.core.metrics import mail_breaker_state
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Fails calls to a dependency fast while it is down.
+
+    Closed: calls go through and their outcomes are kept for
+    ``window_seconds``. Once at least ``min_calls`` of them failed at
+    ``failure_rate`` or more, the breaker opens and every call is rejected
+    with ``MailerUnavailable`` without touching the network. After
+    ``open_seconds`` it is half-open: ``half_open_probes`` calls are let
+    through, the first success closes it, a failure opens it again.
+
+    Not thread-safe; one breaker per event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_seconds: float = 30,
+        open_seconds: float = 15,
+        half_open_probes: int = 1,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._state = CLOSED
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._reported = False
+        self.opened_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.retry_after() == 0:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until calls are let through again; 0 unless open."""
+        if self._state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - self.clock())
+
+    @contextmanager
+    def call(self):
+        """Guard one call; an exception escaping the block is a failure."""
+        self._acquire()
+        ok = None
+        try:
+            yield
+            ok = True
+        except Exception:
+            ok = False
+            raise
+        finally:
+            # None (cancelled): frees a probe without judging the dependency
+            self._record(ok)
+
+    def stats(self) -> dict:
+        self._trim()
+        calls = len(self._outcomes)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            "retry_after": round(self.retry_after(), 3),
+            "opened_total": self.opened_total,
+            "rejected_total": self.rejected_total,
+        }
+
+    def _acquire(self) -> None:
+        if not self._reported:
+            self._reported = True
+            mail_breaker_state.set(1, self.name, self._state)
+        state = self.state
+        if state == OPEN or (
+            state == HALF_OPEN and self._probes >= self.half_open_probes
+        ):
+            self.rejected_total += 1
+            raise MailerUnavailable(self.retry_after() or self.open_seconds)
+        if state == HALF_OPEN:
+            self._probes += 1
+
+    def _record(self, ok: bool | None) -> None:
+        if self._state == HALF_OPEN:
+            self._probes -= 1
+            if ok is True:
+                self._transition(CLOSED)
+            elif ok is False:
+                self._transition(OPEN)
+            return
+        if ok is None or self._state == OPEN:
+            return  # a call that started before the breaker opened
+
+        self._outcomes.append((self.clock(), ok))
+        if not ok:
+            self._failures += 1
+        self._trim()
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+            self._transition(OPEN)
+
+    def _trim(self) -> None:
+        horizon = self.clock() - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < horizon:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def _transition(self, state: str) -> None:
+        if self._reported:
+            mail_breaker_state.set(0, self.name, self._state)
+            mail_breaker_state.set(1, self.name, state)
+        self._state = state
+        if state == OPEN:
+            self._opened_at = self.clock()
+            self.opened_total += 1
+        elif state == CLOSED:
+            # judge the relay on calls made after it came back
+            self._outcomes.clear()
+            self._failures = 0
+
+
+relay_breaker = CircuitBreaker(
+    "mail_relay",
+    failure_rate=settings.smtp_breaker_failure_rate,
+    min_calls=settings.smtp_breaker_min_calls,
+    window_seconds=settings.smtp_breaker_window_seconds,
+    open_seconds=settings.smtp_breaker_open_seconds,
+    half_open_probes=settings.smtp_breaker_half_open_probes,
+)
@@ -1,26 +1,123 @@
-import requests
+import asyncio
+import importlib.util
+import time
+import httpx
 from app.domain.interfaces.mailer import Mailer
-from app.core.exceptions import MailerError
+from app.core.backoff import backoff_delay
+from app.core.exceptions import MailerError, MailerRejected, MailerUnavailable
 from app.core.config import settings
+from app.core.metrics import errors, mail_send_duration
+from app.infrastructure.smtp.circuit_breaker import CircuitBreaker, relay_breaker
+
+
+def _http2_available() -> bool:
+    # httpx only negotiates HTTP/2 (over TLS) when the optional h2 package is installed
+    return importlib.util.find_spec("h2") is not None
 
 
 class SmtpMailer(Mailer):
-    def send_code(self, email: str, code: str) -> None:
-        payload = {
-            "to": email,
-            "subject": "Activation Code",
-            "body": f"Your activation code is {code}",
-        }
-
-        for attempt in range(settings.smtp_max_retries):
+    """HTTP mail relay client sharing one keep-alive connection pool.
+
+    The underlying ``httpx.AsyncClient`` is created on first use so that no
+    sockets exist before the process forks or the event loop starts; call
+    ``aclose()`` on shutdown.
+
+    Calls go through ``breaker``: while the relay is down they fail with
+    ``MailerUnavailable`` immediately instead of waiting for timeouts, and
+    retries back off with jitter instead of hammering it.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = settings.smtp_max_retries,
+        client: httpx.AsyncClient | None = None,
+        breaker: CircuitBreaker = relay_breaker,
+    ):
+        self.max_retries = max_retries
+        self._client = client
+        self.breaker = breaker
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.smtp_timeout,
+                http2=settings.smtp_http2 and _http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.smtp_max_connections,
+                    max_keepalive_connections=settings.smtp_max_connections,
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def send_code(self, email: str, code: str) -> None:
+        await self._post(settings.smtp_url, _message(email, code), email)
+
+    async def send_codes(self, messages: list[tuple[str, str]]) -> None:
+        """Send in chunks of ``SMTP_BATCH_SIZE``. On failure the error's
+        ``delivered`` is the number of messages sent by earlier chunks, and
+        a ``MailerRejected``'s ``rejected`` the size of the refused one."""
+        size = settings.smtp_batch_size
+        for start in range(0, len(messages), size):
+            chunk = messages[start : start + size]
+            try:
+                await self._post(
+                    settings.smtp_batch_url,
+                    [_message(email, code) for email, code in chunk],
+                    f"{len(chunk)} recipients",
+                )
+            except MailerError as e:
+                e.delivered = start
+                if isinstance(e, MailerRejected):
+                    e.rejected = len(chunk)
+                raise
+
+    async def _post(self, url: str, payload, recipient: str) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            start = time.perf_counter()
             try:
-                resp = requests.post(
-                    settings.smtp_url,
-                    json=payload,
-                    timeout=settings.smtp_timeout,
+                with self.breaker.call():
+                    resp = await self.client.post(url, json=payload)
+                    if resp.status_code >= 500:
+                        resp.raise_for_status()
+            except MailerUnavailable:
+                errors.inc("MailerUnavailable")
+                raise
+            except httpx.HTTPError as e:
+                mail_send_duration.observe(time.perf_counter() - start, "failed")
+                if attempt == self.max_retries:
+                    errors.inc("MailerError")
+                    raise MailerError(
+                        f"Failed to send email to {recipient}: {e}"
+                    ) from e
+                await asyncio.sleep(
+                    backoff_delay(
+                        attempt,
+                        settings.smtp_retry_backoff_base,
+                        settings.smtp_retry_backoff_max,
+                    )
                 )
-                resp.raise_for_status()
-                return
-            except requests.RequestException as e:
-                if attempt + 1 == settings.smtp_max_retries:
-                    raise MailerError(f"Failed to send email to {email}: {e}") from e
+                continue
+
+            if resp.is_error:
+                # the relay is up but refuses this payload: retrying will not help
+                mail_send_duration.observe(time.perf_counter() - start, "rejected")
+                errors.inc("MailerRejected")
+                raise MailerRejected(
+                    f"Relay rejected email to {recipient}: {resp.status_code}"
+                )
+            mail_send_duration.observe(time.perf_counter() - start, "sent")
+            return
+
+
+def _message(email: str, code: str) -> dict:
+    return {
+        "to": email,
+        "subject": "Activation Code",
+        "body": f"Your activation code is {code}",
+    }
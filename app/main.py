@@ -1,12 +1,58 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.routers import users, auth
+from app.api.middleware import MetricsMiddleware, ProfilerMiddleware
+from app.api.routers import users, auth, health, metrics as metrics_router, profile
+from app.core.calibration import configure_argon2
+from app.core.config import settings
+from app.core.hashing import executor
+from app.core.metrics import metrics
+from app.infrastructure.db.cursor import open_pool, close_pool
+from app.infrastructure.db.replicas import close_replicas, open_replicas
+from app.workers import token_reaper
 
-app = FastAPI(title="User Registration API")
 
-app.include_router(users.router)
-app.include_router(auth.router)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # CPU-bound when ARGON2_CALIBRATE=1 and no params file exists yet
+    await asyncio.to_thread(configure_argon2)
+    # warm up: min_size connections are established before we serve traffic
+    await open_pool()
+    replica_router = await open_replicas()
+    stop = asyncio.Event()
+    tasks = []
+    if replica_router is not None:
+        tasks.append(
+            asyncio.create_task(
+                replica_router.monitor(stop, settings.db_replica_lag_check_interval)
+            )
+        )
+    if settings.token_reaper_interval > 0:
+        tasks.append(
+            asyncio.create_task(token_reaper.run(stop, settings.token_reaper_interval))
+        )
+    if metrics.directory:
+        tasks.append(
+            asyncio.create_task(
+                metrics.flush_periodically(stop, settings.metrics_flush_interval)
+            )
+        )
+    try:
+        yield
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+        await close_replicas()
+        await close_pool()
+        executor.shutdown()
+
 
+app = FastAPI(title="User Registration API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilerMiddleware)
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+app.include_router(users.router)
+app.include_router(auth.router)
+app.include_router(health.router)
+app.include_router(metrics_router.router)
+app.include_router(profile.router)
@@ -0,0 +1,91 @@
+"""Mail dispatcher worker: delivers activation emails queued in the outbox.
+
+    python -m app.workers.mail_dispatcher
+
+Several replicas can run side by side; rows are claimed with
+FOR UPDATE SKIP LOCKED so each message goes to exactly one worker.
+"""
+
+import asyncio
+import logging
+import signal
+from psycopg.rows import dict_row
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.domain.services.outbox_service import OutboxService
+from app.infrastructure.db import cursor
+from app.infrastructure.db.outbox_repo_pg import PostgresOutboxRepo
+from app.infrastructure.smtp.circuit_breaker import OPEN
+from app.infrastructure.smtp.smtp_client import SmtpMailer
+
+logger = logging.getLogger("mail_dispatcher")
+
+
+async def run(stop: asyncio.Event) -> None:
+    # retries are driven by the outbox backoff, not by the mailer
+    mailer = SmtpMailer(max_retries=1)
+
+    # one connection is enough for the claim/ack cycle
+    await cursor.open_pool(min_size=1, max_size=2)
+    # mail send timings reach the API's /metrics through METRICS_DIR
+    flusher = None
+    if metrics.directory:
+        flusher = asyncio.create_task(
+            metrics.flush_periodically(stop, settings.metrics_flush_interval)
+        )
+    try:
+        await _loop(stop, mailer)
+    finally:
+        if flusher is not None:
+            await flusher
+        await mailer.aclose()
+        await cursor.close_pool()
+
+
+async def _loop(stop: asyncio.Event, mailer: SmtpMailer) -> None:
+    while not stop.is_set():
+        if mailer.breaker.state == OPEN:
+            # leave messages unclaimed (and their attempts untouched) until
+            # the breaker lets a probe through
+            await _wait(stop, mailer.breaker.retry_after())
+            continue
+        try:
+            async with cursor.pool.connection() as conn:
+                conn.row_factory = dict_row
+                service = OutboxService(
+                    PostgresOutboxRepo(conn),
+                    mailer,
+                    batch_size=settings.outbox_batch_size,
+                    lease_seconds=settings.outbox_lease_seconds,
+                    max_attempts=settings.outbox_max_attempts,
+                    backoff_base=settings.outbox_backoff_base,
+                    backoff_max=settings.outbox_backoff_max,
+                )
+                claimed = await service.process_batch()
+        except Exception:
+            logger.exception("outbox batch failed")
+            claimed = 0
+
+        # a full batch means there is probably more waiting
+        if claimed < settings.outbox_batch_size:
+            await _wait(stop, settings.outbox_poll_interval)
+
+
+async def _wait(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def main() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await run(stop)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Token reaper: deletes consumed activation tokens, expired ones past
+their grace period, outbox mails whose code has expired, and expired
+idempotency keys.
+
+    python -m app.cli.reap_tokens        # one pass, e.g. from cron
+
+or in the API process itself when TOKEN_REAPER_INTERVAL is set (see
+app/main.py). Concurrent reapers are safe: batches skip locked rows.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from psycopg.rows import dict_row
+from app.core.config import settings
+from app.domain.services.token_reaper_service import TokenReaperService
+from app.infrastructure.db import cursor
+from app.infrastructure.db.idempotency_repo_pg import PostgresIdempotencyRepo
+from app.infrastructure.db.outbox_repo_pg import PostgresOutboxRepo
+from app.infrastructure.db.token_repo_pg import PostgresTokenRepo
+
+logger = logging.getLogger("token_reaper")
+
+
+async def reap_once() -> dict:
+    async with cursor.pool.connection() as conn:
+        conn.row_factory = dict_row
+        service = TokenReaperService(
+            PostgresTokenRepo(conn),
+            batch_size=settings.token_reaper_batch_size,
+            grace_seconds=settings.token_reaper_grace_seconds,
+            pause=settings.token_reaper_pause,
+        )
+        report = await service.run_once()
+        report["outbox"] = await _drain(PostgresOutboxRepo(conn).delete_expired)
+        report["idempotency_keys"] = await _drain(
+            PostgresIdempotencyRepo(conn).delete_expired
+        )
+    logger.info("reaped activation tokens: %s", report)
+    return report
+
+
+async def _drain(delete: Callable[[int], Awaitable[int]]) -> int:
+    total = 0
+    while True:
+        deleted = await delete(settings.token_reaper_batch_size)
+        total += deleted
+        if deleted < settings.token_reaper_batch_size:
+            return total
+        await asyncio.sleep(settings.token_reaper_pause)
+
+
+async def run(stop: asyncio.Event, interval: float) -> None:
+    while not stop.is_set():
+        try:
+            await reap_once()
+        except Exception:
+            logger.exception("token reaper pass failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,48 @@
+"""Compare two benchmark results (from benchmarks.load or benchmarks.micro).
+
+    python -m benchmarks.compare before.json after.json
+
+Prints one line per phase/case with the relative change of each metric.
+"""
+
+import argparse
+import json
+
+METRICS = ("throughput_rps", "ops_per_s", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def rows(report: dict) -> dict[str, dict]:
+    entries = report.get("phases") or report.get("results") or []
+    return {e.get("phase") or e["case"]: e for e in entries}
+
+
+def change(old, new) -> str:
+    if not old:
+        return f"{old} -> {new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)"
+
+
+def main(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    old_rows, new_rows = rows(before), rows(after)
+    for name, new in new_rows.items():
+        old = old_rows.get(name)
+        if old is None:
+            print(f"{name}: new")
+            continue
+        parts = [
+            f"{m} {change(old[m], new[m])}" for m in METRICS if m in old and m in new
+        ]
+        print(f"{name}: " + ", ".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    main(args.before, args.after)
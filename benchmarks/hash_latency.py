@@ -0,0 +1,87 @@
+"""Signup hashing latency: inline (threadpool) vs the bounded process pool.
+
+Simulates N concurrent signups that each hash one password and reports
+p50/p99 latency and the number of requests rejected with HasherBusy.
+
+    python -m benchmarks.hash_latency --concurrency 50 200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from anyio import to_thread
+
+from app.core.exceptions import HasherBusy
+from app.core.hashing import executor
+from app.core.security import hash_password, hash_password_async
+from benchmarks.common import percentile
+
+
+async def _inline(pw: str) -> None:
+    # what a sync FastAPI handler does: hash on a Starlette threadpool thread
+    await to_thread.run_sync(hash_password, pw)
+
+
+async def _pooled(pw: str) -> None:
+    await hash_password_async(pw)
+
+
+async def run_case(mode: str, concurrency: int) -> dict:
+    fn = _inline if mode == "inline" else _pooled
+    latencies: list[float] = []
+    rejected = 0
+
+    async def one(i: int) -> None:
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            await fn(f"password-{i}")
+        except HasherBusy:
+            rejected += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "rejected": rejected,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "wall_s": round(elapsed, 2),
+    }
+
+
+async def main(concurrencies: list[int]) -> list[dict]:
+    # match Starlette's default threadpool size for the inline case
+    to_thread.current_default_thread_limiter().total_tokens = 40
+    # warm up the worker processes so spawn cost is not measured
+    await asyncio.gather(
+        *(hash_password_async("warmup") for _ in range(executor.max_workers))
+    )
+
+    results = []
+    for concurrency in concurrencies:
+        for mode in ("inline", "pool"):
+            results.append(await run_case(mode, concurrency))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(main(args.concurrency))
+    finally:
+        executor.shutdown()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,138 @@
+"""End-to-end load generator: signup, mail delivery, then activation.
+
+    python -m benchmarks.load --users 500 --concurrency 50 \\
+        --url http://localhost:8001 --smtp-url http://localhost:18080
+
+Runs against the stack started with ``docker compose --profile bench up``
+(see README). Each virtual user registers with a fresh email, waits for
+its code to reach smtp-mock, then activates. Prints one JSON document per
+run with throughput, p50/p95/p99 and error rates per phase; save it and
+compare runs with ``python -m benchmarks.compare``.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import httpx
+from benchmarks.common import latency_summary, run_metadata
+
+PASSWORD = "bench-password"
+
+
+async def run_phase(name: str, jobs: list, concurrency: int, expected: int) -> dict:
+    """Run ``jobs`` (coroutine factories returning a status code) with at most
+    ``concurrency`` in flight."""
+    samples: list[float] = []
+    statuses: dict[str, int] = {}
+    queue = iter(jobs)
+
+    async def worker():
+        for job in queue:
+            start = time.perf_counter()
+            try:
+                status = str(await job())
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    errors = len(jobs) - statuses.get(str(expected), 0)
+    return {
+        "phase": name,
+        "requests": len(jobs),
+        "concurrency": concurrency,
+        "wall_s": round(elapsed, 3),
+        "throughput_rps": round(len(jobs) / elapsed, 1) if elapsed else 0.0,
+        "error_rate": round(errors / len(jobs), 4) if jobs else 0.0,
+        "statuses": statuses,
+        **latency_summary(samples),
+    }
+
+
+async def main(args) -> dict:
+    run = uuid.uuid4().hex[:8]
+    emails = [f"bench+{run}-{i}@example.com" for i in range(args.users)]
+    codes: dict[str, str] = {}
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as app, httpx.AsyncClient(
+        base_url=args.smtp_url, timeout=args.timeout, limits=limits
+    ) as smtp:
+
+        def signup(email):
+            async def job():
+                r = await app.post(
+                    "/users", json={"email": email, "password": PASSWORD}
+                )
+                return r.status_code
+
+            return job
+
+        def fetch_code(email):
+            async def job():
+                # the outbox worker delivers asynchronously: poll until it has
+                deadline = time.monotonic() + args.mail_timeout
+                while True:
+                    r = await smtp.get(f"/messages/{email}")
+                    if r.status_code == 200:
+                        codes[email] = r.json()["code"]
+                        return 200
+                    if time.monotonic() > deadline:
+                        return r.status_code
+                    await asyncio.sleep(0.05)
+
+            return job
+
+        def activate(email):
+            async def job():
+                r = await app.post(
+                    "/auth/activate",
+                    json={"code": codes.get(email, "0000")},
+                    auth=(email, PASSWORD),
+                )
+                return r.status_code
+
+            return job
+
+        phases = [
+            await run_phase(
+                "signup", [signup(e) for e in emails], args.concurrency, 201
+            ),
+            await run_phase(
+                "mail_delivery", [fetch_code(e) for e in emails], args.concurrency, 200
+            ),
+            await run_phase(
+                "activate", [activate(e) for e in emails], args.concurrency, 200
+            ),
+        ]
+
+    return {
+        "meta": run_metadata(
+            label=args.label,
+            url=args.url,
+            users=args.users,
+            concurrency=args.concurrency,
+        ),
+        "phases": phases,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--smtp-url", default="http://localhost:18080")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--mail-timeout", type=float, default=30)
+    parser.add_argument("--label", default="", help="e.g. the configuration swept")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main(args)), indent=2))
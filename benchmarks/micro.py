@@ -0,0 +1,304 @@
+"""Micro-benchmarks for app/core/security.py, row decoding and every repository method.
+
+    python -m benchmarks.micro                       # no database needed
+    python -m benchmarks.micro --repos --iterations 500
+
+``--repos`` needs DATABASE_URL to point at a throwaway, migrated Postgres
+(``docker compose --profile bench up -d postgres-bench migrate-bench``):
+it inserts users, tokens and outbox rows and does not clean them up.
+Prints one JSON document with per-case latency percentiles; the row
+building cases also report the bytes each decoded row keeps alive.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from dataclasses import fields, make_dataclass
+from datetime import datetime, timezone
+from psycopg.rows import args_row, dict_row
+from app.core.config import settings
+from app.core.hashing import executor
+from app.core.security import (
+    Argon2OtpHasher,
+    HmacOtpHasher,
+    gen_otp,
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_password_async,
+)
+from app.domain.entities.user import User
+from app.infrastructure.db import cursor
+from app.infrastructure.db.outbox_repo_pg import PostgresOutboxRepo
+from app.infrastructure.db.token_repo_pg import PostgresTokenRepo
+from app.infrastructure.db.user_repo_pg import PostgresUserRepo
+from benchmarks.common import latency_summary, run_metadata
+
+
+async def measure(name: str, iterations: int, fn) -> dict:
+    """Await ``fn(i)`` sequentially ``iterations`` times."""
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await fn(i)
+        samples.append(time.perf_counter() - start)
+    total = sum(samples)
+    return {
+        "case": name,
+        "iterations": iterations,
+        "ops_per_s": round(iterations / total, 1) if total else 0.0,
+        **latency_summary(samples),
+    }
+
+
+def sync(fn):
+    async def wrapper(i):
+        fn(i)
+
+    return wrapper
+
+
+async def security_cases(iterations: int) -> list[dict]:
+    # Argon2 is ~50ms per call: fewer iterations keep the run short
+    slow = max(1, iterations // 20)
+    pw_hash = hash_password("password-0")
+    hmac_hasher = HmacOtpHasher(b"bench-secret")
+    argon2_otp = Argon2OtpHasher()
+    hmac_hash = await hmac_hasher.hash("1234", "bench@example.com")
+    argon2_hash = await argon2_otp.hash("1234", "bench@example.com")
+    await verify_password_async(pw_hash, "warm up the worker processes")
+
+    return [
+        await measure("gen_otp", iterations, sync(lambda i: gen_otp(4))),
+        await measure(
+            "hash_password", slow, sync(lambda i: hash_password(f"password-{i}"))
+        ),
+        await measure(
+            "verify_password", slow, sync(lambda i: verify_password(pw_hash, "x"))
+        ),
+        await measure(
+            "hash_password_async", slow, lambda i: hash_password_async(f"pw-{i}")
+        ),
+        await measure(
+            "verify_password_async", slow, lambda i: verify_password_async(pw_hash, "x")
+        ),
+        await measure(
+            "otp_hmac.hash", iterations, lambda i: hmac_hasher.hash("1234", f"u{i}")
+        ),
+        await measure(
+            "otp_hmac.verify",
+            iterations,
+            lambda i: hmac_hasher.verify(hmac_hash, "1234", "bench@example.com"),
+        ),
+        await measure(
+            "otp_argon2.verify",
+            slow,
+            lambda i: argon2_otp.verify(argon2_hash, "1234", "bench@example.com"),
+        ),
+    ]
+
+
+def retained_bytes(build, n: int = 10_000) -> float:
+    """Bytes allocated and still alive per ``build(i)`` result."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = [build(i) for i in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return round((after - before) / n, 1)
+
+
+async def row_cases(iterations: int) -> list[dict]:
+    """Building a user from already decoded values the way the repositories
+    used to (a dict of every column, then a regular dataclass) and the way
+    they do now (the projected values, positionally into a slotted
+    dataclass). No database and no psycopg row factory: only the Python
+    objects; ``cursor_row_cases`` measures the row factories themselves."""
+    names = [f.name for f in fields(User)] + ["created_at", "updated_at"]
+    now = datetime.now(timezone.utc)
+    LegacyUser = make_dataclass("LegacyUser", [f.name for f in fields(User)])
+
+    def projected(i):
+        return (i, f"user{i}@example.com", False, "$argon2id$v=19$...")
+
+    def dict_row_user(i):
+        row = dict(zip(names, projected(i) + (now, now)))
+        del row["created_at"], row["updated_at"]  # SELECT * fetched them
+        return LegacyUser(**row)
+
+    def args_row_user(i):
+        return User(*projected(i))
+
+    batch = 100
+    results = []
+    for name, build in (("dict", dict_row_user), ("slotted", args_row_user)):
+        one = await measure(f"rows.user({name})", iterations, sync(build))
+        one["bytes_per_row"] = retained_bytes(build)
+        results.append(one)
+        results.append(
+            await measure(
+                f"rows.users({name}, {batch})",
+                iterations,
+                sync(lambda i: [build(i * batch + n) for n in range(batch)]),
+            )
+        )
+    return results
+
+
+async def cursor_row_cases(conn, ids: list[int], iterations: int) -> list[dict]:
+    """The same comparison on a real cursor: ``SELECT *`` through dict_row
+    into a regular dataclass, against the projection through args_row into
+    User, for one row by id and for a batch of rows."""
+    LegacyUser = make_dataclass("LegacyUser", [f.name for f in fields(User)])
+    names = [f.name for f in fields(User)]
+    projection = ", ".join(names)
+    batch = ids[:100]
+
+    async def dict_row_users(sql, params):
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(sql, params, prepare=True)
+            return [
+                LegacyUser(**{n: row[n] for n in names}) for row in await cur.fetchall()
+            ]
+
+    async def args_row_users(sql, params):
+        async with conn.cursor(row_factory=args_row(User)) as cur:
+            await cur.execute(sql, params, prepare=True)
+            return await cur.fetchall()
+
+    results = []
+    for name, fetch, columns in (
+        ("dict_row", dict_row_users, "*"),
+        ("args_row", args_row_users, projection),
+    ):
+        one = f"SELECT {columns} FROM users WHERE id = %s"
+        many = f"SELECT {columns} FROM users WHERE id = ANY(%s)"
+        results.append(
+            await measure(
+                f"rows.cursor.user({name})",
+                iterations,
+                lambda i: fetch(one, (ids[i % len(ids)],)),
+            )
+        )
+        results.append(
+            await measure(
+                f"rows.cursor.users({name}, {len(batch)})",
+                iterations,
+                lambda i: fetch(many, (batch,)),
+            )
+        )
+    return results
+
+
+async def repo_cases(iterations: int) -> list[dict]:
+    run = uuid.uuid4().hex[:8]
+    email = lambda i: f"micro+{run}-{i}@example.com"  # noqa: E731
+    pw_hash = hash_password("password")
+
+    await cursor.open_pool(min_size=1, max_size=1)
+    try:
+        async with cursor.pool.connection() as conn:
+            conn.row_factory = dict_row
+            users = PostgresUserRepo(conn)
+            tokens = PostgresTokenRepo(conn)
+            outbox = PostgresOutboxRepo(conn)
+            ids: list[int] = []
+            pairs: list[tuple] = []
+
+            async def create(i):
+                ids.append(await users.create_with_token(email(i), pw_hash, "h", "1"))
+
+            async def lookup_pair(i):
+                pairs.append(await users.get_with_active_token(email(i)))
+
+            async def activate(i):
+                user, token = pairs[i]
+                await users.activate_with_token(
+                    user.id, token.id, settings.otp_max_failed_attempts
+                )
+
+            results = [
+                await measure("users.create_with_token", iterations, create),
+                await measure(
+                    "users.get_by_email",
+                    iterations,
+                    lambda i: users.get_by_email(email(i)),
+                ),
+                await measure(
+                    "users.get_by_id", iterations, lambda i: users.get_by_id(ids[i])
+                ),
+                await measure("users.get_with_active_token", iterations, lookup_pair),
+                *await cursor_row_cases(conn, ids, iterations),
+                await measure(
+                    "users.record_failed_attempt",
+                    iterations,
+                    lambda i: users.record_failed_attempt(ids[i], pairs[i][1].id),
+                ),
+                await measure("users.activate_with_token", iterations, activate),
+                await measure(
+                    "tokens.upsert", iterations, lambda i: tokens.upsert(ids[i], "h2")
+                ),
+                await measure(
+                    "tokens.get_active_for_user",
+                    iterations,
+                    lambda i: tokens.get_active_for_user(ids[i]),
+                ),
+                await measure(
+                    "users.bulk_create_with_tokens(100)",
+                    max(1, iterations // 100),
+                    lambda i: users.bulk_create_with_tokens(
+                        [
+                            (n, f"bulk+{run}-{i}-{n}@example.com", pw_hash, "h", "1")
+                            for n in range(100)
+                        ],
+                        60,
+                    ),
+                ),
+                await measure(
+                    "outbox.enqueue",
+                    iterations,
+                    lambda i: outbox.enqueue(email(i), "1"),
+                ),
+            ]
+
+            claimed = []
+
+            async def claim(i):
+                claimed.extend(m.id for m in await outbox.claim_batch(50, 60))
+
+            results.append(await measure("outbox.claim_batch(50)", 10, claim))
+            results.append(
+                await measure(
+                    "outbox.mark_sent", 1, lambda i: outbox.mark_sent(claimed)
+                )
+            )
+            return results
+    finally:
+        await cursor.close_pool()
+
+
+async def main(iterations: int, repos: bool) -> dict:
+    results = await security_cases(iterations)
+    results += await row_cases(iterations)
+    if repos:
+        results += await repo_cases(iterations)
+    return {"meta": run_metadata(iterations=iterations), "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--repos", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(main(args.iterations, args.repos))
+    finally:
+        executor.shutdown()
+    print(json.dumps(report, indent=2))
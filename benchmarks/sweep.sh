@@ -0,0 +1,47 @@
+#!/usr/bin/env bash
+# Sweep gunicorn workers/threads and pool sizes on the bench profile.
+#
+#   WORKERS="1 2 4" THREADS="1" POOLS="5 20" ./benchmarks/sweep.sh
+#
+# Each configuration gets a fresh stack (tmpfs Postgres) and one
+# benchmarks.load run; results go to benchmarks/results/<commit>/.
+set -euo pipefail
+
+WORKERS="${WORKERS:-1 2 4}"
+THREADS="${THREADS:-1}"
+POOLS="${POOLS:-5 20}"
+USERS="${USERS:-500}"
+CONCURRENCY="${CONCURRENCY:-50}"
+APP_URL="${APP_URL:-http://localhost:8001}"
+SMTP_URL="${SMTP_URL:-http://localhost:18080}"
+
+OUT="benchmarks/results/$(git rev-parse --short HEAD)"
+mkdir -p "$OUT"
+
+wait_ready() {
+  for _ in $(seq 1 60); do
+    curl -fsS "$APP_URL/health/ready" >/dev/null 2>&1 && return 0
+    sleep 1
+  done
+  echo "app-bench did not become ready" >&2
+  return 1
+}
+
+for w in $WORKERS; do
+  for t in $THREADS; do
+    for p in $POOLS; do
+      label="w${w}-t${t}-pool${p}"
+      echo "==> $label"
+      docker compose --profile bench down -v >/dev/null 2>&1 || true
+      BENCH_WORKERS="$w" BENCH_THREADS="$t" BENCH_POOL_MAX="$p" \
+        docker compose --profile bench up -d >/dev/null
+      wait_ready
+      python -m benchmarks.load --url "$APP_URL" --smtp-url "$SMTP_URL" \
+        --users "$USERS" --concurrency "$CONCURRENCY" --label "$label" \
+        > "$OUT/$label.json"
+    done
+  done
+done
+
+docker compose --profile bench down -v >/dev/null
+echo "results in $OUT"
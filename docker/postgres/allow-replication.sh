@@ -0,0 +1,5 @@
+#!/bin/sh
+# Let the postgres-replica service (profile "replica") stream WAL from this
+# instance. Runs once, when the data volume is initialized.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
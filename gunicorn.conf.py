@@ -0,0 +1,37 @@
+"""gunicorn -c gunicorn.conf.py app.main:app
+
+With GUNICORN_PRELOAD=1 the app is imported once in the master and the
+workers are forked from it, so they boot without re-importing FastAPI and
+share those pages copy-on-write. Pools, clients and background tasks are
+created per worker by the lifespan; ``pre_fork`` refuses to fork if any of
+them already exists in the master.
+"""
+
+import glob
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+
+def on_starting(server):
+    # snapshots of a previous run would be summed into /metrics
+    directory = os.getenv("METRICS_DIR", "")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "metrics-*.json*")):
+            os.remove(path)
+    # calibrate once, before the workers exist; they load the params file
+    if os.getenv("ARGON2_CALIBRATE", "0") == "1":
+        from app.core.calibration import configure_argon2
+
+        configure_argon2()
+
+
+def pre_fork(server, worker):
+    from app.core.forksafety import assert_fork_safe
+
+    assert_fork_safe()
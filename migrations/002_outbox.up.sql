@@ -0,0 +1,15 @@
+-- activation emails are written here in the signup transaction and
+-- delivered by the mail dispatcher worker (app/workers/mail_dispatcher.py)
+CREATE TABLE IF NOT EXISTS outbox (
+  id            BIGSERIAL PRIMARY KEY,
+  email         CITEXT NOT NULL,
+  code          TEXT NOT NULL,
+  attempts      INT NOT NULL DEFAULT 0,
+  available_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_error    TEXT,
+  failed_at     TIMESTAMPTZ,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- only pending rows are ever polled
+CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox(available_at) WHERE failed_at IS NULL;
@@ -0,0 +1,4 @@
+-- wrong codes submitted against a token; the token is locked past
+-- OTP_MAX_FAILED_ATTEMPTS until a new code is issued
+ALTER TABLE activation_tokens
+  ADD COLUMN IF NOT EXISTS failed_attempts INT NOT NULL DEFAULT 0;
@@ -0,0 +1,10 @@
+-- UNIQUE (user_id) already indexes user_id
+DROP INDEX IF EXISTS idx_activation_tokens_userid;
+
+-- live tokens only: the expiry index no longer carries consumed rows,
+-- which the reaper deletes through their own (small) index
+DROP INDEX IF EXISTS idx_activation_tokens_exp;
+CREATE INDEX IF NOT EXISTS idx_activation_tokens_live_exp
+  ON activation_tokens(expires_at) WHERE consumed_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_activation_tokens_consumed
+  ON activation_tokens(consumed_at) WHERE consumed_at IS NOT NULL;
@@ -0,0 +1,12 @@
+-- responses of POST /users keyed by the client's Idempotency-Key; a row
+-- with a NULL status_code is an execution still in flight
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  key          TEXT PRIMARY KEY,
+  fingerprint  TEXT NOT NULL,
+  status_code  INT,
+  response     JSONB,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+  expires_at   TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_exp ON idempotency_keys(expires_at);
@@ -0,0 +1,10 @@
+-- admin listing (GET /users): keyset pagination on (created_at, id), so every
+-- page is an index range scan starting at the cursor
+CREATE INDEX IF NOT EXISTS idx_users_created_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_active_created_id
+  ON users(is_active, created_at, id);
+
+-- email prefix search: CITEXT compares lowercased text, and so does this
+-- index; text_pattern_ops makes LIKE 'prefix%' a range scan
+CREATE INDEX IF NOT EXISTS idx_users_email_prefix
+  ON users(lower(email::text) text_pattern_ops);
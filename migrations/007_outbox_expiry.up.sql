@@ -0,0 +1,13 @@
+-- a queued code is only worth mailing while its token is live: rows carry
+-- the token's expiry, are no longer claimed past it, and are deleted by the
+-- token reaper. Rows queued before this migration get the longest OTP TTL.
+ALTER TABLE outbox
+  ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ NOT NULL
+  DEFAULT now() + interval '1 day';
+ALTER TABLE outbox ALTER COLUMN expires_at DROP DEFAULT;
+
+-- failed rows keep their error, not the plaintext code
+ALTER TABLE outbox ALTER COLUMN code DROP NOT NULL;
+UPDATE outbox SET code = NULL WHERE failed_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_outbox_expires ON outbox(expires_at);
@@ -72,7 +72,7 @@ if [ "$RUN_SMOKE" = "1" ]; then
     -d "{\"email\":\"$EMAIL\",\"password\":\"$PASS\"}"
 
   say "Reading activation code from smtp-mock logs"
-  sleep 1
+  sleep 3
   CODE=$(docker compose logs smtp-mock --since 2m | grep -Eo 'Code: [0-9]{4}' | tail -n1 | awk '{print $2}')
 
   if [ -z "${CODE:-}" ]; then
@@ -97,7 +97,7 @@ if [ "$RUN_SMOKE" = "1" ]; then
     -d "{\"email\":\"$EMAIL2\",\"password\":\"$PASS2\"}"
 
   say "Reading activation code from smtp-mock logs"
-  sleep 1
+  sleep 3
   CODE2=$(docker compose logs smtp-mock --since 2m | grep -Eo 'Code: [0-9]{4}' | tail -n1 | awk '{print $2}')
   echo "  -> Code detected for second user: $CODE2"
 
@@ -1,10 +1,15 @@
-from fastapi import FastAPI, Body
+from collections import OrderedDict
+from fastapi import FastAPI, Body, HTTPException
 from pydantic import BaseModel
 import sys
 import re
 
 app = FastAPI(title="SMTP Mock")
 
+# last code per recipient, read back by benchmarks/load.py (bounded)
+MAX_INBOX = 100_000
+_inbox: OrderedDict[str, str] = OrderedDict()
+
 
 class SendPayload(BaseModel):
     to: str
@@ -17,15 +22,38 @@ def health():
     return {"status": "ok"}
 
 
-@app.post("/send")
-def send_email(payload: SendPayload = Body(...)):
+def _deliver(payload: SendPayload) -> None:
     # Extract 4-digit code from body if present
     match = re.search(r"\b(\d{4})\b", payload.body)
     code = match.group(1) if match else "????"
+    _inbox[payload.to.lower()] = code
+    _inbox.move_to_end(payload.to.lower())
+    if len(_inbox) > MAX_INBOX:
+        _inbox.popitem(last=False)
 
     # Important: match smoke test parser (expects "Code: XXXX")
     print(
         f"[SMTP] Code: {code} To={payload.to} Subject={payload.subject}",
         file=sys.stderr,
     )
+
+
+@app.post("/send")
+def send_email(payload: SendPayload = Body(...)):
+    _deliver(payload)
     return {"status": "sent"}
+
+
+@app.post("/send_batch")
+def send_batch(payloads: list[SendPayload] = Body(...)):
+    for payload in payloads:
+        _deliver(payload)
+    return {"status": "sent", "count": len(payloads)}
+
+
+@app.get("/messages/{email}")
+def last_code(email: str):
+    code = _inbox.get(email.lower())
+    if code is None:
+        raise HTTPException(status_code=404, detail="No message")
+    return {"to": email, "code": code}
@@ -1,43 +1,64 @@
+import asyncio
 import pytest
+from dataclasses import replace
 from datetime import datetime, timedelta, timezone
 from app.domain.services.activation_service import ActivationService
-from app.core.exceptions import InvalidOTP, ExpiredOTP
+from app.core.exceptions import InvalidOTP, ExpiredOTP, TokenLocked
+from app.core.singleflight import SingleFlight
 from app.domain.entities.user import User
 from app.domain.entities.token import ActivationToken
 
 
 class FakeUserRepo:
-    def __init__(self, user):
+    def __init__(self, user, token):
         self.user = user
+        self.token = token
+        self.consumed = False
+        self.failed = []
+        self.rehashed = []
 
-    def get_by_email(self, email):
-        return self.user
+    async def get_with_active_token(self, email):
+        return self.user, None if self.consumed else self.token
 
-    def activate(self, user_id):
-        self.user.is_active = True
+    async def record_failed_attempt(self, user_id, token_id):
+        self.failed.append(token_id)
+        return len(self.failed)
+
+    async def activate_with_token(self, user_id, token_id, max_failed_attempts):
+        if self.consumed:
+            return False
+        self.consumed = True
+        self.user = replace(self.user, is_active=True)
         return True
 
+    async def update_password_hash(self, user_id, old_hash, new_hash):
+        self.rehashed.append((old_hash, new_hash))
+        return True
 
-class FakeTokenRepo:
-    def __init__(self, token):
-        self.token = token
-        self.consumed = False
 
-    def get_active_for_user(self, user_id):
-        return None if self.consumed else self.token
+async def fake_verify(hash_, value, *subject):
+    return True
 
-    def consume(self, token_id):
-        self.consumed = True
 
-
-def test_activation_invalid_password():
+@pytest.mark.asyncio
+async def test_activation_invalid_password(monkeypatch):
     user = User(id=1, email="u@example.com", is_active=False, password_hash="bad")
-    service = ActivationService(FakeUserRepo(user), FakeTokenRepo(None))
+    service = ActivationService(FakeUserRepo(user, None))
+
+    async def fake_verify_fails(hash_, pw):
+        return False
+
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_password_async",
+        fake_verify_fails,
+    )
+
     with pytest.raises(InvalidOTP):
-        service.activate("u@example.com", "wrongpw", "1234")
+        await service.activate("u@example.com", "wrongpw", "1234")
 
 
-def test_activation_expired_token(monkeypatch):
+@pytest.mark.asyncio
+async def test_activation_expired_token(monkeypatch):
     user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
     expired = ActivationToken(
         id=1,
@@ -46,18 +67,22 @@ def test_activation_expired_token(monkeypatch):
         expires_at=datetime.now(timezone.utc) - timedelta(seconds=1),
         consumed_at=None,
     )
-    service = ActivationService(FakeUserRepo(user), FakeTokenRepo(expired))
+    service = ActivationService(FakeUserRepo(user, expired))
 
     # Patch password check to succeed so we can test expiry logic
     monkeypatch.setattr(
-        "app.domain.services.activation_service.verify_password", lambda h, pw: True
+        "app.domain.services.activation_service.verify_password_async", fake_verify
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_otp_async", fake_verify
     )
 
     with pytest.raises(ExpiredOTP):
-        service.activate("u@example.com", "hash", "1234")
+        await service.activate("u@example.com", "hash", "1234")
 
 
-def test_activation_happy_path(monkeypatch):
+@pytest.mark.asyncio
+async def test_activation_happy_path(monkeypatch):
     user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
     valid = ActivationToken(
         id=1,
@@ -66,12 +91,209 @@ def test_activation_happy_path(monkeypatch):
         expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
         consumed_at=None,
     )
-    service = ActivationService(FakeUserRepo(user), FakeTokenRepo(valid))
+    repo = FakeUserRepo(user, valid)
+    service = ActivationService(repo)
 
     # Patch verify_password to always succeed
     monkeypatch.setattr(
-        "app.domain.services.activation_service.verify_password", lambda h, pw: True
+        "app.domain.services.activation_service.verify_password_async", fake_verify
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_otp_async", fake_verify
+    )
+
+    await service.activate("u@example.com", "hash", "1234")
+    assert repo.user.is_active
+
+
+@pytest.mark.asyncio
+async def test_activation_concurrent_submit_loses(monkeypatch):
+    class RaceLostUserRepo(FakeUserRepo):
+        async def activate_with_token(self, user_id, token_id, max_failed_attempts):
+            # another request consumed the token between load and update
+            return False
+
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
+    valid = ActivationToken(
+        id=1,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    repo = RaceLostUserRepo(user, valid)
+    service = ActivationService(repo)
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_password_async", fake_verify
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_otp_async", fake_verify
+    )
+
+    with pytest.raises(InvalidOTP):
+        await service.activate("u@example.com", "hash", "1234")
+    assert not repo.user.is_active
+
+
+@pytest.mark.asyncio
+async def test_activation_wrong_code_is_recorded(monkeypatch):
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
+    valid = ActivationToken(
+        id=7,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    repo = FakeUserRepo(user, valid)
+    service = ActivationService(repo)
+
+    async def wrong_code(hash_, value, *subject):
+        return False
+
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_password_async", fake_verify
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_otp_async", wrong_code
+    )
+
+    with pytest.raises(InvalidOTP):
+        await service.activate("u@example.com", "hash", "0000")
+    assert repo.failed == [7]
+
+
+@pytest.mark.asyncio
+async def test_activation_locked_token_is_only_reported_to_the_owner(monkeypatch):
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
+    locked = ActivationToken(
+        id=1,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+        failed_attempts=5,
+    )
+    repo = FakeUserRepo(user, locked)
+    service = ActivationService(repo, max_failed_attempts=5)
+
+    async def must_not_verify(*args):
+        raise AssertionError("verified the code of a locked token")
+
+    async def password_is(hash_, value, *subject):
+        return value == "secret123"
+
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_password_async", password_is
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.verify_otp_async", must_not_verify
+    )
+
+    # without the password, a locked token looks like any bad login
+    with pytest.raises(InvalidOTP):
+        await service.activate("u@example.com", "wrong", "1234")
+    with pytest.raises(TokenLocked):
+        await service.activate("u@example.com", "secret123", "1234")
+    assert not repo.user.is_active
+
+
+@pytest.mark.asyncio
+async def test_activation_upgrades_a_stale_password_hash(monkeypatch):
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="old")
+    valid = ActivationToken(
+        id=1,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    repo = FakeUserRepo(user, valid)
+    service = ActivationService(repo)
+
+    async def fake_hash(pw):
+        return f"new:{pw}"
+
+    for name in ("verify_password_async", "verify_otp_async"):
+        monkeypatch.setattr(
+            f"app.domain.services.activation_service.{name}", fake_verify
+        )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.hash_password_async", fake_hash
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.password_needs_rehash",
+        lambda hash_: hash_ == "old",
     )
 
-    service.activate("u@example.com", "hash", "1234")
-    assert user.is_active
+    await service.activate("u@example.com", "secret123", "1234")
+    assert repo.user.is_active
+    assert repo.rehashed == [("old", "new:secret123")]
+
+
+@pytest.mark.asyncio
+async def test_failed_rehash_does_not_fail_the_activation(monkeypatch):
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="old")
+    valid = ActivationToken(
+        id=1,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    repo = FakeUserRepo(user, valid)
+    service = ActivationService(repo)
+
+    async def fake_hash(pw):
+        return f"new:{pw}"
+
+    async def db_down(user_id, old_hash, new_hash):
+        raise ConnectionError("server closed the connection")
+
+    for name in ("verify_password_async", "verify_otp_async"):
+        monkeypatch.setattr(
+            f"app.domain.services.activation_service.{name}", fake_verify
+        )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.hash_password_async", fake_hash
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_service.password_needs_rehash",
+        lambda hash_: True,
+    )
+    monkeypatch.setattr(repo, "update_password_hash", db_down)
+
+    await service.activate("u@example.com", "secret123", "1234")
+    assert repo.user.is_active
+
+
+@pytest.mark.asyncio
+async def test_duplicate_activations_share_one_verification(monkeypatch):
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="hash")
+    valid = ActivationToken(
+        id=1,
+        user_id=1,
+        code_hash="hash",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    repo = FakeUserRepo(user, valid)
+    service = ActivationService(repo, flights=SingleFlight("test_activate"))
+    verified = []
+
+    async def slow_verify(hash_, value, *subject):
+        verified.append(value)
+        await asyncio.sleep(0.01)
+        return True
+
+    for name in ("verify_password_async", "verify_otp_async"):
+        monkeypatch.setattr(
+            f"app.domain.services.activation_service.{name}", slow_verify
+        )
+
+    # without coalescing the second submit would fail: "Token already used"
+    await asyncio.gather(
+        service.activate("u@example.com", "hash", "1234"),
+        service.activate("u@example.com", "hash", "1234"),
+    )
+    assert verified == ["hash", "1234"] and repo.user.is_active
@@ -1,18 +1,29 @@
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.infrastructure.db.user_repo_pg import PostgresUserRepo
 
-client = TestClient(app)
 
+@pytest.fixture
+def client():
+    # context manager runs the lifespan, which opens the connection pool
+    with TestClient(app) as client:
+        yield client
 
-def test_register_and_activate(monkeypatch):
+
+def test_register_and_activate(client, monkeypatch):
     sent_codes = {}
 
-    # Patch mailer to capture OTP
-    def fake_send_code(email, code):
+    # Capture the OTP as it is written to the outbox
+    create_with_token = PostgresUserRepo.create_with_token
+
+    async def capture_code(self, email, password_hash, code_hash, code):
         sent_codes[email] = code
+        return await create_with_token(self, email, password_hash, code_hash, code)
 
     monkeypatch.setattr(
-        "app.infrastructure.smtp.smtp_client.SmtpMailer.send_code", fake_send_code
+        "app.infrastructure.db.user_repo_pg.PostgresUserRepo.create_with_token",
+        capture_code,
     )
 
     # 1) Register user
@@ -20,12 +31,13 @@ def test_register_and_activate(monkeypatch):
         "/users", json={"email": "carol@example.com", "password": "Secret123!"}
     )
     assert r.status_code == 201
-    uid = r.json()["id"]
 
     # 2) Activate user with Basic Auth
     code = sent_codes["carol@example.com"]
     r = client.post(
-        f"/auth/activate?code={code}", auth=("carol@example.com", "Secret123!")
+        "/auth/activate",
+        json={"code": code},
+        auth=("carol@example.com", "Secret123!"),
     )
     assert r.status_code == 200
     assert r.json()["detail"] == "Account activated"
@@ -0,0 +1,28 @@
+import time
+import pytest
+from app.core.hashing import HashingExecutor
+from app.core.exceptions import HasherBusy
+
+
+@pytest.fixture
+def executor():
+    ex = HashingExecutor(max_workers=1, max_pending=1, retry_after=7)
+    yield ex
+    ex.shutdown()
+
+
+def test_rejects_when_queue_full(executor):
+    first = executor.submit(time.sleep, 0.5)
+
+    with pytest.raises(HasherBusy) as exc:
+        executor.submit(time.sleep, 0)
+    assert exc.value.retry_after == 7
+
+    first.result(timeout=30)
+    assert executor.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_run_returns_result(executor):
+    assert await executor.run(abs, -3) == 3
+    assert executor.pending == 0
@@ -0,0 +1,46 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.infrastructure.db import cursor
+
+# no context manager: the lifespan (and the real pool) is not started
+client = TestClient(app)
+
+
+class FakePool:
+    closed = False
+
+    def get_stats(self):
+        return {
+            "pool_min": 5,
+            "pool_max": 20,
+            "pool_size": 8,
+            "pool_available": 3,
+            "requests_waiting": 2,
+            "requests_num": 10,
+            "requests_wait_ms": 25,
+        }
+
+
+def test_liveness():
+    assert client.get("/health").json() == {"status": "ok"}
+
+
+def test_not_ready_without_pool(monkeypatch):
+    monkeypatch.setattr(cursor, "pool", None)
+    assert client.get("/health/ready").status_code == 503
+
+
+def test_ready_reports_pool_stats(monkeypatch):
+    monkeypatch.setattr(cursor, "pool", FakePool())
+    r = client.get("/health/ready")
+    assert r.status_code == 200
+    pool = r.json()["pool"]
+    assert pool["in_use"] == 5
+    assert pool["requests_waiting"] == 2
+    assert pool["avg_acquire_ms"] == 2.5
+
+
+def test_mail_reports_breaker_state():
+    body = client.get("/health/mail").json()
+    assert body["breaker"]["name"] == "mail_relay"
+    assert body["breaker"]["state"] == "closed"
@@ -0,0 +1,145 @@
+import asyncio
+from dataclasses import replace
+import pytest
+from app.core.exceptions import (
+    HasherBusy,
+    IdempotencyKeyInProgress,
+    IdempotencyKeyMismatch,
+)
+from app.core.singleflight import SingleFlight
+from app.domain.entities.idempotency import IdempotentResponse
+from app.domain.interfaces.idempotency_repo import IdempotencyRepo
+from app.domain.services.idempotency_service import IdempotencyService
+
+
+class FakeIdempotencyRepo(IdempotencyRepo):
+    def __init__(self):
+        self.rows: dict[str, IdempotentResponse] = {}
+
+    async def claim(self, key, fingerprint, ttl_seconds, lease_seconds):
+        if key in self.rows:
+            return False
+        self.rows[key] = IdempotentResponse(fingerprint, None, None)
+        return True
+
+    async def get(self, key):
+        return self.rows.get(key)
+
+    async def complete(self, key, status_code, body):
+        self.rows[key] = replace(self.rows[key], status_code=status_code, body=body)
+
+    async def release(self, key):
+        if self.rows.get(key) and self.rows[key].status_code is None:
+            del self.rows[key]
+
+
+def make_service(repo, wait_seconds=1.0):
+    return IdempotencyService(
+        repo,
+        ttl_seconds=60,
+        lease_seconds=30,
+        wait_seconds=wait_seconds,
+        flights=SingleFlight("test_idempotency"),
+    )
+
+
+class Register:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return 201, {"id": 1}
+
+
+@pytest.mark.asyncio
+async def test_replay_returns_stored_response_without_executing():
+    service, register = make_service(FakeIdempotencyRepo()), Register()
+
+    first, replayed = await service.run("k", "fp", register)
+    assert (first.status_code, first.body, replayed) == (201, {"id": 1}, False)
+
+    again, replayed = await service.run("k", "fp", register)
+    assert (again.body, replayed) == ({"id": 1}, True)
+    assert register.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first():
+    service, register = make_service(FakeIdempotencyRepo()), Register(delay=0.05)
+
+    results = await asyncio.gather(
+        *(service.run("k", "fp", register) for _ in range(5))
+    )
+
+    assert register.calls == 1
+    assert [replayed for _, replayed in results].count(False) == 1
+    assert all(r.body == {"id": 1} for r, _ in results)
+
+
+@pytest.mark.asyncio
+async def test_waits_for_another_process():
+    repo = FakeIdempotencyRepo()
+    repo.rows["k"] = IdempotentResponse("fp", None, None)  # held elsewhere
+    service, register = make_service(repo), Register()
+
+    async def other_process_completes():
+        await asyncio.sleep(0.1)
+        await repo.complete("k", 201, {"id": 7})
+
+    (stored, replayed), _ = await asyncio.gather(
+        service.run("k", "fp", register), other_process_completes()
+    )
+    assert (stored.body, replayed, register.calls) == ({"id": 7}, True, 0)
+
+
+@pytest.mark.asyncio
+async def test_gives_up_when_the_first_request_never_finishes():
+    repo = FakeIdempotencyRepo()
+    repo.rows["k"] = IdempotentResponse("fp", None, None)
+
+    with pytest.raises(IdempotencyKeyInProgress):
+        await make_service(repo, wait_seconds=0.1).run("k", "fp", Register())
+
+
+@pytest.mark.asyncio
+async def test_key_reused_for_another_request():
+    service = make_service(FakeIdempotencyRepo())
+    await service.run("k", "fp", Register())
+
+    with pytest.raises(IdempotencyKeyMismatch):
+        await service.run("k", "other", Register())
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_stored():
+    repo = FakeIdempotencyRepo()
+    service = make_service(repo)
+
+    async def busy():
+        raise HasherBusy(retry_after=1)
+
+    with pytest.raises(HasherBusy):
+        await service.run("k", "fp", busy)
+    assert "k" not in repo.rows
+
+    stored, replayed = await service.run("k", "fp", Register())
+    assert (stored.status_code, replayed) == (201, False)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_runs_itself_when_the_first_is_cancelled():
+    repo = FakeIdempotencyRepo()
+    service, register = make_service(repo), Register(delay=0.05)
+
+    first = asyncio.create_task(service.run("k", "fp", register))
+    await asyncio.sleep(0.01)
+    duplicate = asyncio.create_task(service.run("k", "fp", register))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    stored, replayed = await duplicate
+    assert first.cancelled()
+    assert (stored.status_code, replayed, register.calls) == (201, False, 2)
@@ -0,0 +1,177 @@
+import json
+from contextlib import asynccontextmanager
+import pytest
+from fastapi.testclient import TestClient
+from app.api.importing import aiter_sync, iter_lines, parse_csv, parse_ndjson
+from app.core.exceptions import HasherBusy
+from app.domain.interfaces.user_repo import UserRepo
+from app.domain.services.import_service import ImportService
+from app.infrastructure.db import cursor
+from app.main import app
+
+
+class FakeUserRepo(UserRepo):
+    def __init__(self, existing=()):
+        self.emails = set(existing)
+        self.chunks = []
+
+    async def bulk_create_with_tokens(self, rows, ttl_seconds):
+        self.chunks.append(rows)
+        created = {}
+        for line, email, pw_hash, code_hash, code in rows:
+            if email not in self.emails:
+                self.emails.add(email)
+                created[line] = len(self.emails)
+        return created
+
+
+async def fake_hash(value, *subject):
+    return f"hashed:{value}"
+
+
+@pytest.fixture(autouse=True)
+def inline_hashing(monkeypatch):
+    monkeypatch.setattr(
+        "app.domain.services.import_service.hash_password_async", fake_hash
+    )
+    monkeypatch.setattr("app.domain.services.import_service.hash_otp_async", fake_hash)
+
+
+def make_service(repo, chunk_size=2):
+    return ImportService(
+        repo,
+        chunk_size=chunk_size,
+        hash_concurrency=2,
+        otp_length=4,
+        otp_ttl_seconds=60,
+    )
+
+
+async def collect(agen):
+    return [item async for item in agen]
+
+
+@pytest.mark.asyncio
+async def test_csv_import_reports_every_row():
+    repo = FakeUserRepo(existing={"old@example.com"})
+    lines = [
+        "email,password",
+        "new@example.com,password1",
+        "old@example.com,password2",
+        "not-an-email,password3",
+        "other@example.com,short",
+        "last@example.com,password5",
+    ]
+    report = await collect(make_service(repo).import_rows(parse_csv(aiter_sync(lines))))
+
+    assert [(r["line"], r["status"]) for r in report] == [
+        (2, "created"),
+        (3, "duplicate"),
+        (4, "invalid"),
+        (5, "invalid"),
+        (6, "created"),
+    ]
+    assert report[2]["error"].startswith("email:")
+    # chunks hold at most chunk_size rows, invalid rows never reach the repo
+    assert [len(chunk) for chunk in repo.chunks] == [2, 1]
+    line, email, pw_hash, code_hash, code = repo.chunks[0][0]
+    assert pw_hash == "hashed:password1"
+    assert code_hash == f"hashed:{code}"
+
+
+@pytest.mark.asyncio
+async def test_ndjson_import_flags_bad_json():
+    repo = FakeUserRepo()
+    lines = ['{"email": "a@example.com", "password": "password1"}', "{oops", ""]
+    report = await collect(
+        make_service(repo).import_rows(parse_ndjson(aiter_sync(lines)))
+    )
+
+    assert [r["status"] for r in report] == ["created", "invalid"]
+    assert "invalid JSON" in report[1]["error"]
+
+
+@pytest.mark.asyncio
+async def test_hashing_waits_when_pool_is_busy(monkeypatch):
+    calls = []
+
+    async def busy_once(value, *subject):
+        calls.append(value)
+        if len(calls) == 1:
+            raise HasherBusy(retry_after=0)
+        return f"hashed:{value}"
+
+    monkeypatch.setattr(
+        "app.domain.services.import_service.hash_password_async", busy_once
+    )
+    lines = ['{"email": "a@example.com", "password": "password1"}']
+    report = await collect(
+        make_service(FakeUserRepo()).import_rows(parse_ndjson(aiter_sync(lines)))
+    )
+
+    assert report[0]["status"] == "created"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_otp_hashing_waits_when_pool_is_busy(monkeypatch):
+    # OTP_HASHER=argon2 shares the queue with password hashing
+    calls = []
+
+    async def busy_once(value, *subject):
+        calls.append(value)
+        if len(calls) == 1:
+            raise HasherBusy(retry_after=0)
+        return f"hashed:{value}"
+
+    monkeypatch.setattr("app.domain.services.import_service.hash_otp_async", busy_once)
+    lines = ['{"email": "a@example.com", "password": "password1"}']
+    report = await collect(
+        make_service(FakeUserRepo()).import_rows(parse_ndjson(aiter_sync(lines)))
+    )
+
+    assert report[0]["status"] == "created"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_splits_across_chunks():
+    async def chunks():
+        for part in (b"a,b\r\nc", b",d\n", b"e,f"):
+            yield part
+
+    assert await collect(iter_lines(chunks())) == ["a,b", "c,d", "e,f"]
+
+    async def many():
+        yield b"1\n2\n3"
+        yield b"\n\n4\n"
+
+    assert await collect(iter_lines(many())) == ["1", "2", "3", "", "4"]
+
+
+class FakePool:
+    @asynccontextmanager
+    async def connection(self):
+        yield type("Conn", (), {"row_factory": None})()
+
+
+def test_import_endpoint_streams_the_report(monkeypatch):
+    repo = FakeUserRepo(existing={"old@example.com"})
+    monkeypatch.setattr(cursor, "pool", FakePool())
+    monkeypatch.setattr("app.api.routers.users.get_user_repo", lambda conn: repo)
+    monkeypatch.setattr("app.api.dependencies.settings.admin_token", "admin")
+    body = "email,password\nnew@example.com,password1\nold@example.com,password2\n"
+
+    # no context manager: the lifespan (and the real pool) is not started
+    r = TestClient(app).post(
+        "/users/import",
+        content=body,
+        headers={"Authorization": "Bearer admin", "Content-Type": "text/csv"},
+    )
+
+    assert r.status_code == 200
+    report = [json.loads(line) for line in r.text.splitlines()]
+    assert [(e["line"], e["status"]) for e in report] == [
+        (2, "created"),
+        (3, "duplicate"),
+    ]
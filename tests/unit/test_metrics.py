@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from app.core.metrics import MetricsRegistry, timed
+from app.main import app
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    hist = registry.histogram("op_seconds", "op", ("op",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "a")
+    hist.observe(0.5, "a")
+    hist.observe(5, "a")
+
+    text = registry.render()
+    assert 'op_seconds_bucket{op="a",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="a",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{op="a",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="a"} 3' in text
+
+
+def test_processes_are_aggregated_through_the_directory(tmp_path, monkeypatch):
+    # two "workers" sharing a metrics dir, told apart by their pid
+    snapshots = []
+    for pid in (os.getpid(), os.getppid()):
+        registry = MetricsRegistry(str(tmp_path))
+        registry.counter("errors_total", "errors", ("error",)).inc("InvalidOTP")
+        registry.histogram("op_seconds", "op", buckets=(1.0,)).observe(0.5)
+        monkeypatch.setattr("os.getpid", lambda: pid)
+        registry.flush()
+        snapshots.append(registry)
+
+    text = snapshots[0].render()
+    assert 'errors_total{error="InvalidOTP"} 2' in text
+    assert "op_seconds_count 2" in text
+
+
+def test_snapshots_of_exited_processes_are_dropped(tmp_path):
+    exited = subprocess.Popen([sys.executable, "-c", ""])
+    exited.wait()
+    (tmp_path / f"metrics-{exited.pid}.json").write_text(
+        '{"breaker_state": {"open": 1}}'
+    )
+    registry = MetricsRegistry(str(tmp_path))
+    registry.gauge("breaker_state", "state", ("state",)).set(1, "closed")
+
+    text = registry.render()
+    assert 'breaker_state{state="closed"} 1' in text
+    assert "open" not in text
+    assert not (tmp_path / f"metrics-{exited.pid}.json").exists()
+
+
+def test_flush_writes_through_its_own_temp_file(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("errors_total", "errors").inc()
+    # a leftover from another writer must not be picked up or replaced
+    (tmp_path / "stale.tmp").write_text("{")
+    registry.flush()
+    registry.flush()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        f"metrics-{os.getpid()}.json",
+        "stale.tmp",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_timed_records_every_public_coroutine():
+    registry = MetricsRegistry()
+    hist = registry.histogram("repo_seconds", "repo", ("method",))
+
+    @timed(hist, "users")
+    class Repo:
+        async def get(self):
+            return 1
+
+        async def _private(self):
+            return 2
+
+    assert await Repo().get() == 1
+    await Repo()._private()
+    assert list(hist.snapshot()) == ["users.get"]
+
+
+def test_requests_are_labelled_by_route_template():
+    client = TestClient(app)
+    client.get("/health")
+    client.get("/no/such/page")
+
+    text = client.get("/metrics").text
+    assert 'route="/health",status="200"' in text
+    assert 'route="unmatched",status="404"' in text
+
+
+def test_gauge_keeps_the_last_value():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("state", "state", ("state",))
+    gauge.set(1, "open")
+    gauge.set(0, "open")
+    gauge.set(1, "closed")
+
+    text = registry.render()
+    assert "# TYPE state gauge" in text
+    assert 'state{state="open"} 0' in text
+    assert 'state{state="closed"} 1' in text
+
+
+def test_max_gauge_is_not_summed_over_processes(tmp_path, monkeypatch):
+    registries = []
+    for pid, lag in ((os.getpid(), 1.5), (os.getppid(), 4.0)):
+        registry = MetricsRegistry(str(tmp_path))
+        registry.gauge("lag_seconds", "lag", ("replica",), aggregate="max").set(
+            lag, "replica0"
+        )
+        monkeypatch.setattr("os.getpid", lambda: pid)
+        registry.flush()
+        registries.append(registry)
+
+    assert 'lag_seconds{replica="replica0"} 4.0' in registries[-1].render()
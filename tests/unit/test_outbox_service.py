@@ -0,0 +1,128 @@
+import pytest
+from app.core.exceptions import MailerError, MailerRejected
+from app.domain.entities.outbox import OutboxMessage
+from app.domain.interfaces.mailer import Mailer
+from app.domain.interfaces.outbox_repo import OutboxRepo
+from app.core.backoff import backoff_delay
+from app.domain.services.outbox_service import OutboxService
+
+
+class FakeOutboxRepo(OutboxRepo):
+    def __init__(self, messages):
+        self.messages = messages
+        self.sent = []
+        self.retried = []
+        self.failed = []
+
+    async def claim_batch(self, limit, lease_seconds):
+        batch, self.messages = self.messages[:limit], self.messages[limit:]
+        return batch
+
+    async def mark_sent(self, message_ids):
+        self.sent.extend(message_ids)
+
+    async def retry_later(self, message_ids, delays_seconds, error):
+        self.retried.extend(zip(message_ids, delays_seconds))
+
+    async def mark_failed(self, message_ids, error):
+        self.failed.extend(message_ids)
+
+
+class FakeMailer(Mailer):
+    def __init__(self, down=False):
+        self.down = down
+        self.batches = []
+
+    async def send_codes(self, messages):
+        if self.down:
+            raise MailerError("relay down")
+        self.batches.append(messages)
+
+
+def make_service(repo, mailer):
+    return OutboxService(
+        repo,
+        mailer,
+        batch_size=10,
+        lease_seconds=30,
+        max_attempts=3,
+        backoff_base=2,
+        backoff_max=60,
+    )
+
+
+def make_messages():
+    return [
+        OutboxMessage(id=1, email="a@example.com", code="1111", attempts=1),
+        OutboxMessage(id=2, email="b@example.com", code="2222", attempts=3),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sends_claimed_rows_in_one_batch():
+    repo, mailer = FakeOutboxRepo(make_messages()), FakeMailer()
+
+    assert await make_service(repo, mailer).process_batch() == 2
+    assert mailer.batches == [[("a@example.com", "1111"), ("b@example.com", "2222")]]
+    assert repo.sent == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_rescheduled_or_given_up():
+    repo = FakeOutboxRepo(make_messages())
+
+    assert await make_service(repo, FakeMailer(down=True)).process_batch() == 2
+    assert repo.sent == []
+    assert [mid for mid, _ in repo.retried] == [1]
+    assert 0 <= repo.retried[0][1] <= 2
+    assert repo.failed == [2]
+
+
+@pytest.mark.asyncio
+async def test_chunks_sent_before_a_failure_are_not_resent():
+    class FailsAfterTwo(FakeMailer):
+        async def send_codes(self, messages):
+            error = MailerError("relay down")
+            error.delivered = 2
+            raise error
+
+    messages = [
+        OutboxMessage(id=i, email=f"u{i}@example.com", code="1111", attempts=1)
+        for i in range(1, 5)
+    ]
+    repo = FakeOutboxRepo(messages)
+
+    assert await make_service(repo, FailsAfterTwo()).process_batch() == 4
+    assert repo.sent == [1, 2]
+    assert [mid for mid, _ in repo.retried] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_rejected_chunk_is_given_up_at_once():
+    class RejectsSecondChunk(FakeMailer):
+        async def send_codes(self, messages):
+            error = MailerRejected("Relay rejected email: 422")
+            error.delivered, error.rejected = 1, 2
+            raise error
+
+    messages = [
+        OutboxMessage(id=i, email=f"u{i}@example.com", code="1111", attempts=1)
+        for i in range(1, 5)
+    ]
+    repo = FakeOutboxRepo(messages)
+
+    assert await make_service(repo, RejectsSecondChunk()).process_batch() == 4
+    assert repo.sent == [1]
+    assert repo.failed == [2, 3]
+    assert [mid for mid, _ in repo.retried] == [4]
+
+
+@pytest.mark.asyncio
+async def test_empty_outbox():
+    repo = FakeOutboxRepo([])
+    assert await make_service(repo, FakeMailer()).process_batch() == 0
+
+
+def test_backoff_is_capped():
+    for attempt in range(1, 20):
+        assert 0 <= backoff_delay(attempt, base=1, cap=30) <= 30
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.profiler import IDLE, TRUNCATED, ProfileSession, profiler
+from app.main import app
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def parked(event):
+    event.wait()
+
+
+@pytest.mark.asyncio
+async def test_samples_other_threads_into_folded_stacks():
+    worker = threading.Thread(target=spin, args=(0.2,), name="spinner")
+    session = ProfileSession(interval=0.002)
+    session.start()
+    worker.start()
+    await asyncio.to_thread(worker.join)
+    session.stop()
+
+    lines = session.collapsed().splitlines()
+    assert session.samples > 10 and session.sampler_cpu > 0
+    assert any(
+        line.startswith("spinner;") and "test_profiler:spin " in line for line in lines
+    )
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_event_loop_samples_are_attributed_to_the_route():
+    session = ProfileSession(interval=0.002)
+    session.start()
+
+    async def request():
+        session.track(
+            asyncio.current_task(),
+            {"method": "POST", "route": SimpleNamespace(path="/users")},
+        )
+        spin(0.1)  # blocks the loop, like a CPU-bound handler
+
+    await asyncio.create_task(request())
+    await asyncio.sleep(0.05)
+    session.stop()
+
+    routes = session.routes()
+    assert routes["POST /users"]["samples"] > 5
+    assert routes["POST /users"]["busy_share"] > 0.5
+    by_route = session.collapsed(by_route=True)
+    assert "POST /users;" in by_route and "test_profiler:spin" in by_route
+    if IDLE in routes:
+        assert routes[IDLE]["busy_share"] is None
+
+
+def test_stacks_and_depth_are_bounded():
+    release = threading.Event()
+    threads = [threading.Thread(target=parked, args=(release,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    try:
+        session = ProfileSession(interval=0.01, max_stacks=1, max_depth=2)
+        session.sample()
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    assert session.dropped >= 2
+    for _, _, frames in session.stacks:
+        assert len(frames) <= 3
+        assert frames[0] == TRUNCATED or len(frames) < 3
+
+
+def test_profile_endpoint_requires_admin_and_reports(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.post("/debug/profile").status_code == 401
+
+    headers = {"Authorization": "Bearer secret"}
+    r = client.post(
+        "/debug/profile",
+        params={"seconds": 0.05, "interval_ms": 5, "format": "json"},
+        headers=headers,
+    )
+    assert r.status_code == 200
+    report = r.json()
+    assert report["samples"] > 0 and "collapsed" in report and "routes" in report
+    assert profiler.session is None
+
+    r = client.post("/debug/profile", params={"seconds": 0.05}, headers=headers)
+    assert r.status_code == 200 and r.text.endswith("\n")
+    assert "attachment" in r.headers["content-disposition"]
@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import dependencies
+from app.api.dependencies import get_activation_service
+from app.infrastructure.ratelimit.backend import wait_time
+from app.infrastructure.ratelimit.limiter import RateLimiter, Rule
+from app.infrastructure.ratelimit.memory import (
+    InMemoryCounterBackend,
+    ShardedMemoryStore,
+)
+from app.infrastructure.ratelimit.shared import SharedStore
+from app.main import app
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_wait_time_accounts_for_previous_window():
+    # 10 hits in the previous window, none yet: 4 of them still weigh
+    assert wait_time(10, 0, 6, 10, limit=5) == 0
+    # 6 of them still weigh: wait until 4 are left (2 more seconds)
+    assert wait_time(10, 0, 4, 10, limit=5) == pytest.approx(2)
+    # current window full: wait for it to end, then fade below the limit
+    assert wait_time(0, 5, 4, 10, limit=5) == pytest.approx(6 + 2)
+
+
+def test_rules_need_a_positive_limit_and_window():
+    assert Rule.parse("ip", "10/60") == Rule("ip", 10, 60.0)
+    for spec in ("0/60", "-1/60", "10/0"):
+        with pytest.raises(ValueError):
+            Rule.parse("ip", spec)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("shared", [False, True])
+async def test_store_slides_window(shared):
+    clock = Clock()
+    if shared:
+        store = SharedStore(InMemoryCounterBackend(clock=clock), clock=clock)
+    else:
+        store = ShardedMemoryStore(clock=clock)
+
+    results = [await store.hit("k", 3, 10) for _ in range(4)]
+    assert results[:3] == [0, 0, 0]
+    assert results[3] > 0
+    # other keys are independent
+    assert await store.hit("other", 3, 10) == 0
+
+    clock.now += results[3]
+    assert await store.hit("k", 3, 10) == 0
+
+
+@pytest.mark.asyncio
+async def test_sharded_store_stays_bounded():
+    clock = Clock()
+    store = ShardedMemoryStore(shards=4, max_keys=8, clock=clock)
+    for i in range(100):
+        await store.hit(f"k{i}", 1, 10)
+    assert len(store) <= 8
+    assert store.stats()["evictions"] > 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_stops_at_first_rejecting_rule():
+    limiter = RateLimiter(ShardedMemoryStore(clock=Clock()))
+    ip, email = Rule.parse("ip", "1/60"), Rule.parse("email", "5/60")
+
+    assert await limiter.check((ip, "1.2.3.4"), (email, "a@example.com")) == 0
+    # the window ends in 20s, and its hit must then fade out completely
+    assert await limiter.check((ip, "1.2.3.4"), (email, "a@example.com")) == 80
+    assert limiter.stats()["rejected"] == {"ip": 1}
+
+
+def test_activate_answers_429_before_touching_the_db(monkeypatch):
+    limiter = RateLimiter(ShardedMemoryStore())
+    monkeypatch.setattr(dependencies, "limiter", limiter)
+    monkeypatch.setattr(dependencies.settings, "ratelimit_enabled", True)
+    monkeypatch.setattr(
+        dependencies, "_activate_per_email", Rule.parse("activate_email", "1/60")
+    )
+
+    def no_db():
+        raise AssertionError("service built for a rejected request")
+
+    app.dependency_overrides[get_activation_service] = no_db
+    try:
+        client = TestClient(app)
+        # first hit is allowed through to the (failing) service
+        with pytest.raises(AssertionError):
+            client.post("/auth/activate", json={"code": "1234"}, auth=("a@x.io", "pw"))
+        r = client.post("/auth/activate", json={"code": "1234"}, auth=("A@x.io", "pw"))
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 429
+    assert 0 < int(r.headers["Retry-After"]) <= 120
@@ -1,69 +1,166 @@
+import asyncio
 import pytest
 from app.domain.services.registration_service import RegistrationService
+from app.domain.services.activation_dispatcher_service import (
+    ActivationDispatcherService,
+)
 from app.domain.interfaces.user_repo import UserRepo
 from app.domain.interfaces.token_repo import TokenRepo
-from app.domain.interfaces.mailer import Mailer
 from app.core.exceptions import UserAlreadyExists
+from app.core.singleflight import SingleFlight
 
 
 class FakeUserRepo(UserRepo):
     def __init__(self):
         self.users = {}
 
-    def create(self, email, pw_hash):
+    async def create(self, email, pw_hash):
         if email in self.users:
             raise UserAlreadyExists()
         uid = len(self.users) + 1
         self.users[email] = {"id": uid, "hash": pw_hash}
         return uid
 
-    def get_by_email(self, email):
+    async def create_with_token(self, email, pw_hash, code_hash, code):
+        uid = await self.create(email, pw_hash)
+        self.users[email].update(code_hash=code_hash, code=code)
+        return uid
+
+    async def get_by_email(self, email):
         return self.users.get(email)
 
-    def get_by_id(self, user_id):
+    async def get_by_id(self, user_id):
         return None
 
-    def activate(self, user_id):
+    async def activate(self, user_id):
         return True
 
 
 class FakeTokenRepo(TokenRepo):
     def __init__(self):
         self.tokens = {}
+        self.reissued = []
 
-    def upsert(self, user_id, code_hash):
+    async def upsert(self, user_id, code_hash):
         self.tokens[user_id] = code_hash
         return {"id": 1, "user_id": user_id}
 
-    def get_active_for_user(self, user_id):
+    async def get_active_for_user(self, user_id):
         return None
 
-    def consume(self, token_id):
+    async def consume(self, token_id):
         pass
 
+    async def reissue_due(self, email, cooldown_seconds):
+        return email != "active@example.com" and not (
+            self.reissued and cooldown_seconds
+        )
+
+    async def reissue_for_email(self, email, code_hash, code, cooldown_seconds):
+        self.reissued.append((email, code))
+        await asyncio.sleep(0.01)
+        if len(self.reissued) > 1 and cooldown_seconds:
+            return None  # within the cooldown
+        return {"id": 1}
+
+
+async def fake_hash(value, *subject):
+    return f"hashed:{value}"
 
-class FakeMailer(Mailer):
-    def __init__(self):
-        self.sent = []
 
-    def send_code(self, email, code):
-        self.sent.append((email, code))
+@pytest.fixture(autouse=True)
+def inline_hashing(monkeypatch):
+    monkeypatch.setattr(
+        "app.domain.services.registration_service.hash_password_async", fake_hash
+    )
+    monkeypatch.setattr(
+        "app.domain.services.registration_service.hash_otp_async", fake_hash
+    )
+    monkeypatch.setattr(
+        "app.domain.services.activation_dispatcher_service.hash_otp_async", fake_hash
+    )
 
 
-def test_register_user_sends_email():
-    user_repo, token_repo, mailer = FakeUserRepo(), FakeTokenRepo(), FakeMailer()
-    service = RegistrationService(user_repo, token_repo, mailer)
+@pytest.mark.asyncio
+async def test_register_user_creates_token_and_mail():
+    user_repo = FakeUserRepo()
+    service = RegistrationService(user_repo)
 
-    user_id = service.register_user("bob@example.com", "secret")
+    user_id = await service.register_user("bob@example.com", "secret")
     assert user_id == 1
-    assert mailer.sent[0][0] == "bob@example.com"
-    assert len(mailer.sent[0][1]) == 4
+    stored = user_repo.users["bob@example.com"]
+    assert stored["hash"] == "hashed:secret"
+    assert len(stored["code"]) == 4
+    assert stored["code_hash"] == f"hashed:{stored['code']}"
 
 
-def test_register_existing_user_raises():
-    user_repo, token_repo, mailer = FakeUserRepo(), FakeTokenRepo(), FakeMailer()
-    service = RegistrationService(user_repo, token_repo, mailer)
-    service.register_user("bob@example.com", "secret")
+@pytest.mark.asyncio
+async def test_register_existing_user_raises():
+    service = RegistrationService(FakeUserRepo())
+    await service.register_user("bob@example.com", "secret")
 
     with pytest.raises(UserAlreadyExists):
-        service.register_user("bob@example.com", "secret")
+        await service.register_user("bob@example.com", "secret")
+
+
+@pytest.mark.asyncio
+async def test_resend_burst_is_coalesced():
+    token_repo = FakeTokenRepo()
+    dispatcher = ActivationDispatcherService(
+        token_repo,
+        resend_cooldown_seconds=30,
+        flights=SingleFlight("test_resend"),
+    )
+
+    issued = await asyncio.gather(
+        *(dispatcher.resend_code("Bob@example.com") for _ in range(5))
+    )
+    assert issued.count(True) == 1
+    assert len(token_repo.reissued) == 1
+
+    # later resends reach the database, which enforces the cooldown
+    assert not await dispatcher.resend_code("bob@example.com")
+
+
+@pytest.mark.asyncio
+async def test_resend_survives_a_cancelled_first_request():
+    token_repo = FakeTokenRepo()
+    dispatcher = ActivationDispatcherService(
+        token_repo,
+        resend_cooldown_seconds=0,
+        flights=SingleFlight("test_resend"),
+    )
+
+    first = asyncio.create_task(dispatcher.resend_code("bob@example.com"))
+    await asyncio.sleep(0)
+    duplicate = asyncio.create_task(dispatcher.resend_code("bob@example.com"))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await duplicate
+    assert first.cancelled()
+    assert len(token_repo.reissued) == 2
+
+
+@pytest.mark.asyncio
+async def test_resend_hashes_only_when_a_code_is_due(monkeypatch):
+    hashed = []
+
+    async def counting_hash(value, *subject):
+        hashed.append(value)
+        return f"hashed:{value}"
+
+    monkeypatch.setattr(
+        "app.domain.services.activation_dispatcher_service.hash_otp_async",
+        counting_hash,
+    )
+    token_repo = FakeTokenRepo()
+    dispatcher = ActivationDispatcherService(
+        token_repo, resend_cooldown_seconds=30, flights=SingleFlight("test_resend")
+    )
+
+    assert not await dispatcher.resend_code("active@example.com")
+    assert await dispatcher.resend_code("bob@example.com")
+    assert not await dispatcher.resend_code("bob@example.com")  # cooldown
+    assert len(hashed) == 1
+    assert len(token_repo.reissued) == 1
@@ -0,0 +1,160 @@
+from contextlib import asynccontextmanager
+import pytest
+from psycopg import OperationalError
+from app.infrastructure.db import cursor, replicas
+from app.infrastructure.db.replicas import Replica, ReplicaRouter, parse_lsn
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        pass
+
+    async def fetchone(self):
+        return self.row
+
+
+class FakeConn:
+    def __init__(self, name, row=None):
+        self.name = name
+        self.row = row
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.row)
+
+
+class FakePool:
+    def __init__(self, conn=None, down=False):
+        self.conn = conn
+        self.down = down
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        if self.down:
+            raise OSError("connection refused")
+        yield self.conn
+
+    def get_stats(self):
+        return {"pool_size": 1, "pool_available": 1}
+
+
+def make_router(*names, policy="least_busy"):
+    replica_list = []
+    for name in names:
+        replica = Replica(name, FakePool(FakeConn(name)))
+        replica.healthy = True
+        replica_list.append(replica)
+    return ReplicaRouter(replica_list, max_lag=5, sticky_seconds=60, policy=policy)
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = make_router("r0", "r1")
+    monkeypatch.setattr(replicas, "router", router)
+    return router
+
+
+async def which(conn):
+    return conn.name
+
+
+async def missing_on_replicas(conn):
+    return None if conn.name.startswith("r") else conn.name
+
+
+def test_parse_lsn():
+    assert parse_lsn("0/16B3748") == 0x16B3748
+    assert parse_lsn("1/0") == 1 << 32
+
+
+def test_pick_skips_ejected_replicas_and_balances():
+    router = make_router("r0", "r1", "r2", policy="round_robin")
+    router.replicas[1].healthy = False
+    assert [router.pick().name for _ in range(4)] == ["r0", "r2", "r0", "r2"]
+
+    router = make_router("r0", "r1")
+    router.replicas[0].in_flight = 3
+    assert {router.pick().name for _ in range(4)} == {"r1"}
+
+    for replica in router.replicas:
+        replica.healthy = False
+    assert router.pick() is None
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replicas_unless_pinned_or_sticky(router):
+    primary = FakeConn("primary")
+    assert (await replicas.read(primary, which, "email:a")).startswith("r")
+
+    router.wrote("email:a")
+    assert await replicas.read(primary, which, "email:a") == "primary"
+    assert (await replicas.read(primary, which, "email:b")).startswith("r")
+    assert await replicas.read(primary, which, "email:b", sticky=True) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_replica_miss_is_confirmed_on_the_primary(router):
+    primary = FakeConn("primary")
+    # e.g. a user created by another process, not replayed yet
+    assert await replicas.read(primary, missing_on_replicas, "email:new") == "primary"
+    assert (
+        await replicas.read(primary, missing_on_replicas, None, confirm_miss=False)
+        is None
+    )
+
+
+@pytest.mark.asyncio
+async def test_lagging_or_unreachable_replicas_are_ejected(monkeypatch):
+    monkeypatch.setattr(cursor, "pool", FakePool(FakeConn("primary", ("0/200",))))
+    caught_up = Replica("r0", FakePool(FakeConn("r0", ("0/200", 999.0))))
+    lagging = Replica("r1", FakePool(FakeConn("r1", ("0/100", 12.5))))
+    down = Replica("r2", FakePool(down=True))
+    router = ReplicaRouter([caught_up, lagging, down], max_lag=5, sticky_seconds=6)
+
+    await router.check_lag()
+    assert caught_up.healthy and caught_up.lag == 0.0
+    assert not lagging.healthy and lagging.lag == 12.5
+    assert not down.healthy and down.lag is None
+
+    lagging.pool.conn.row = ("0/180", 1.0)
+    await router.check_lag()
+    assert lagging.healthy
+
+
+class FailingConn(FakeConn):
+    def cursor(self, **kwargs):
+        raise OperationalError("server closed the connection unexpectedly")
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_read_is_retried_on_the_primary(router):
+    for replica in router.replicas:
+        replica.pool.conn = FailingConn(replica.name)
+
+    async def read_row(conn):
+        async with conn.cursor():
+            return conn.name
+
+    assert await replicas.read(FakeConn("primary"), read_row) == "primary"
+    # the replica that failed is ejected until the next lag check
+    assert [r.healthy for r in router.replicas].count(False) == 1
+    assert all(r.in_flight == 0 for r in router.replicas)
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_check_out_no_primary_connection(router, monkeypatch):
+    monkeypatch.setattr(cursor, "pool", FakePool(FakeConn("primary"), down=True))
+    assert (await replicas.read(None, which)).startswith("r")
+
+    monkeypatch.setattr(cursor, "pool", FakePool(FakeConn("primary")))
+    for replica in router.replicas:
+        replica.healthy = False
+    assert await replicas.read(None, which) == "primary"
@@ -0,0 +1,124 @@
+import pytest
+from app.core import calibration, security
+from app.core.config import settings
+from app.core.security import (
+    Argon2Params,
+    HmacOtpHasher,
+    hash_otp,
+    hash_password,
+    verify_otp_async,
+)
+
+
+@pytest.fixture
+def hmac_settings(monkeypatch):
+    monkeypatch.setattr(settings, "otp_hasher", "hmac")
+    monkeypatch.setattr(settings, "otp_secret", "s3cret")
+    security._hmac_hasher.cache_clear()
+    yield
+    security._hmac_hasher.cache_clear()
+
+
+@pytest.fixture
+def inline_executor(monkeypatch):
+    async def run(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(security.executor, "run", run)
+
+
+@pytest.mark.asyncio
+async def test_hmac_roundtrip_is_bound_to_subject(hmac_settings):
+    hash_ = await security.hash_otp_async("1234", "U@example.com")
+
+    assert hash_.startswith(HmacOtpHasher.PREFIX)
+    assert await verify_otp_async(hash_, "1234", "u@example.com")
+    assert not await verify_otp_async(hash_, "4321", "u@example.com")
+    assert not await verify_otp_async(hash_, "1234", "other@example.com")
+
+
+@pytest.mark.asyncio
+async def test_hmac_depends_on_secret(hmac_settings, monkeypatch):
+    hash_ = await security.hash_otp_async("1234", "u@example.com")
+
+    monkeypatch.setattr(settings, "otp_secret", "rotated")
+    security._hmac_hasher.cache_clear()
+    assert not await verify_otp_async(hash_, "1234", "u@example.com")
+
+
+@pytest.mark.asyncio
+async def test_legacy_argon2_tokens_still_verify(hmac_settings, inline_executor):
+    legacy = hash_otp("1234")
+
+    assert await verify_otp_async(legacy, "1234", "u@example.com")
+    assert not await verify_otp_async(legacy, "0000", "u@example.com")
+
+
+def test_hmac_requires_secret(monkeypatch):
+    monkeypatch.setattr(settings, "otp_hasher", "hmac")
+    monkeypatch.setattr(settings, "otp_secret", "")
+    security._hmac_hasher.cache_clear()
+    with pytest.raises(RuntimeError):
+        security.otp_hasher()
+    security._hmac_hasher.cache_clear()
+
+
+def test_needs_rehash_follows_the_current_params(monkeypatch):
+    light = Argon2Params(time_cost=1, memory_cost=1024, parallelism=1)
+    hash_ = hash_password("pw", light)
+
+    monkeypatch.setattr(security, "_params", light)
+    assert not security.password_needs_rehash(hash_)
+    monkeypatch.setattr(security, "_params", Argon2Params(2, 1024, 1))
+    assert security.password_needs_rehash(hash_)
+    assert not security.password_needs_rehash(HmacOtpHasher.PREFIX + "00")
+
+
+def test_calibrate_fits_passes_to_the_target():
+    # 20ms per pass per 64 MiB
+    def measure(p):
+        return 20 * p.time_cost * p.memory_cost / 65536
+
+    params, elapsed = calibration.calibrate(100, 65536, 2, measure=measure)
+    assert params == Argon2Params(5, 65536, 2)
+    assert elapsed == 100
+
+
+def test_calibrate_halves_memory_when_one_pass_is_too_slow():
+    def measure(p):
+        return 400 * p.time_cost * p.memory_cost / 65536
+
+    params, elapsed = calibration.calibrate(150, 65536, 1, measure=measure)
+    assert elapsed < 150
+    assert params == Argon2Params(1, calibration.MIN_MEMORY_KIB, 1)
+
+
+def test_startup_calibration_needs_a_params_file(monkeypatch):
+    monkeypatch.setattr(settings, "argon2_calibrate", True)
+    monkeypatch.setattr(settings, "argon2_params_file", "")
+    with pytest.raises(RuntimeError):
+        calibration.configure_argon2()
+
+
+def test_startup_reuses_the_calibrated_params(tmp_path, monkeypatch):
+    path = str(tmp_path / "argon2.json")
+    stored = Argon2Params(2, 19456, 1)
+    calibration.store_params(path, stored)
+    monkeypatch.setattr(settings, "argon2_calibrate", True)
+    monkeypatch.setattr(settings, "argon2_params_file", path)
+    monkeypatch.setattr(security, "_params", security.argon2_params())
+
+    def calibrate(*args):
+        raise AssertionError("calibrated again")
+
+    monkeypatch.setattr(calibration, "calibrate", calibrate)
+    assert calibration.configure_argon2() == stored
+
+
+def test_first_stored_params_win(tmp_path):
+    path = str(tmp_path / "argon2.json")
+    first = Argon2Params(3, 65536, 2)
+    assert calibration.store_params(path, first) == first
+    assert calibration.store_params(path, Argon2Params(1, 19456, 2)) == first
+    assert calibration.load_params(path) == first
+    assert list(tmp_path.iterdir()) == [tmp_path / "argon2.json"]
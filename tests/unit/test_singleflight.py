@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from app.core.exceptions import InvalidOTP
+from app.core.metrics import singleflight_calls
+from app.core.singleflight import SingleFlight, flight_key
+from app.domain.services.registration_service import RegistrationService
+
+
+class Slow:
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_flight_key_depends_on_every_input():
+    assert flight_key("U@Example.com", "pw", "1234") == flight_key(
+        "u@example.com", "pw", "1234"
+    )
+    assert flight_key("u@example.com", "pw", "1234") != flight_key(
+        "u@example.com", "pw", "1235"
+    )
+    assert flight_key("u@example.com", "ab", "c") != flight_key(
+        "u@example.com", "a", "bc"
+    )
+    assert "pw" not in flight_key("u@example.com", "pw")
+
+
+@pytest.mark.asyncio
+async def test_duplicates_share_the_result():
+    flights, fn = SingleFlight("test_share"), Slow(result=42)
+    before = singleflight_calls.snapshot().get("test_share|coalesced", 0)
+    results = await asyncio.gather(*(flights.do("k", fn) for _ in range(5)))
+    assert results == [42] * 5 and fn.calls == 1
+    assert singleflight_calls.snapshot()["test_share|coalesced"] - before == 4
+    assert flights.in_flight() == 0
+
+    # finished calls are not cached
+    assert await flights.do("k", fn) == 42 and fn.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicates_share_the_exception():
+    flights, fn = SingleFlight("test_error"), Slow(error=InvalidOTP())
+    results = await asyncio.gather(
+        *(flights.do("k", fn) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(r, InvalidOTP) for r in results) and fn.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_other_keys_run_separately():
+    flights, fn = SingleFlight("test_keys"), Slow(result=1)
+    await asyncio.gather(flights.do("a", fn), flights.do("b", fn))
+    assert fn.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_duplicate_runs_the_call_when_the_first_is_cancelled():
+    flights, fn = SingleFlight("test_cancel"), Slow(result=7)
+    first = asyncio.create_task(flights.do("k", fn))
+    await asyncio.sleep(0)
+    duplicate = asyncio.create_task(flights.do("k", fn))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await duplicate == 7 and fn.calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_identical_signups_hash_and_insert_once(monkeypatch):
+    class FakeUserRepo:
+        def __init__(self):
+            self.created = []
+
+        async def create_with_token(self, email, password_hash, code_hash, code):
+            await asyncio.sleep(0.01)
+            self.created.append(email)
+            return len(self.created)
+
+    hashed = []
+
+    async def fake_hash(value, *subject):
+        hashed.append(value)
+        return f"h:{value}"
+
+    for name in ("hash_password_async", "hash_otp_async"):
+        monkeypatch.setattr(
+            f"app.domain.services.registration_service.{name}", fake_hash
+        )
+    repo = FakeUserRepo()
+    service = RegistrationService(repo, SingleFlight("test_register"))
+    ids = await asyncio.gather(
+        service.register_user("u@example.com", "secret123"),
+        service.register_user("U@example.com", "secret123"),
+        service.register_user("u@example.com", "other-password"),
+    )
+    assert ids[0] == ids[1] and ids[2] != ids[0]
+    assert repo.created == ["u@example.com", "u@example.com"]
+    assert len(hashed) == 4
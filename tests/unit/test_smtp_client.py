@@ -0,0 +1,182 @@
+import json
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.exceptions import MailerError, MailerRejected, MailerUnavailable
+from app.infrastructure.smtp.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+)
+from app.infrastructure.smtp.smtp_client import SmtpMailer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_mailer(handler, max_retries=1, breaker=None):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return SmtpMailer(
+        max_retries=max_retries,
+        client=client,
+        breaker=breaker or CircuitBreaker("test"),
+    )
+
+
+@pytest.mark.asyncio
+async def test_send_codes_chunks_batches(monkeypatch):
+    monkeypatch.setattr(settings, "smtp_batch_size", 2)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"status": "sent"})
+
+    mailer = make_mailer(handler)
+    await mailer.send_codes([(f"u{i}@example.com", f"{i:04d}") for i in range(5)])
+    await mailer.aclose()
+
+    assert [r.url.path for r in requests] == ["/send_batch"] * 3
+    assert [len(json.loads(r.content)) for r in requests] == [2, 2, 1]
+    assert json.loads(requests[0].content)[1]["to"] == "u1@example.com"
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_reports_what_was_delivered(monkeypatch):
+    monkeypatch.setattr(settings, "smtp_batch_size", 2)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502 if len(calls) == 2 else 200)
+
+    mailer = make_mailer(handler)
+    with pytest.raises(MailerError) as raised:
+        await mailer.send_codes([(f"u{i}@example.com", "1234") for i in range(5)])
+    await mailer.aclose()
+    assert raised.value.delivered == 2 and len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_rejected_chunk_is_reported(monkeypatch):
+    monkeypatch.setattr(settings, "smtp_batch_size", 2)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(422 if len(calls) == 2 else 200)
+
+    mailer = make_mailer(handler, max_retries=3)
+    with pytest.raises(MailerRejected) as raised:
+        await mailer.send_codes([(f"u{i}@example.com", "1234") for i in range(5)])
+    await mailer.aclose()
+    assert (raised.value.delivered, raised.value.rejected) == (2, 2)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_send_code_retries_then_raises(monkeypatch):
+    monkeypatch.setattr(settings, "smtp_retry_backoff_base", 0)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(502)
+
+    mailer = make_mailer(handler, max_retries=3)
+    with pytest.raises(MailerError):
+        await mailer.send_code("u@example.com", "1234")
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(422)
+
+    breaker = CircuitBreaker("test", min_calls=1)
+    mailer = make_mailer(handler, max_retries=3, breaker=breaker)
+    with pytest.raises(MailerRejected):
+        await mailer.send_code("u@example.com", "1234")
+    assert len(calls) == 1
+    # the relay answered: that is not an outage
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_without_calling_the_relay():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("connection refused")
+
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", min_calls=2, open_seconds=10, clock=clock)
+    mailer = make_mailer(handler, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(MailerError):
+            await mailer.send_code("u@example.com", "1234")
+    assert breaker.state == OPEN
+
+    with pytest.raises(MailerUnavailable) as exc:
+        await mailer.send_code("u@example.com", "1234")
+    assert len(calls) == 2
+    assert exc.value.retry_after == 10
+    assert breaker.stats()["rejected_total"] == 1
+
+
+def test_breaker_opens_on_failure_rate_within_the_window():
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        "test", failure_rate=0.5, min_calls=4, window_seconds=10, clock=clock
+    )
+
+    def outcome(ok):
+        try:
+            with breaker.call():
+                if not ok:
+                    raise RuntimeError("down")
+        except RuntimeError:
+            pass
+
+    for ok in (False, False, True):
+        outcome(ok)
+    clock.now += 11  # those fell out of the window
+    for ok in (True, True, False):
+        outcome(ok)
+    assert breaker.state == CLOSED
+    outcome(False)  # 2 failures out of 4
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", min_calls=1, open_seconds=5, clock=clock)
+    with pytest.raises(RuntimeError), breaker.call():
+        raise RuntimeError("down")
+    assert breaker.state == OPEN
+
+    clock.now += 5
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(RuntimeError), breaker.call():
+        # a second caller is rejected while the probe is in flight
+        with pytest.raises(MailerUnavailable), breaker.call():
+            pass
+        raise RuntimeError("still down")
+    assert breaker.state == OPEN and breaker.retry_after() == 5
+
+    clock.now += 5
+    with breaker.call():
+        pass
+    assert breaker.state == CLOSED
+    assert breaker.stats()["opened_total"] == 2
@@ -0,0 +1,61 @@
+import subprocess
+import sys
+import pytest
+from app.cli.startup_profile import parse_importtime, summarize
+from app.core import forksafety
+from app.core.hashing import HashingExecutor
+from app.infrastructure.db import cursor
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     argon2._utils
+import time:       300 |        420 |   argon2
+import time:      1500 |       1500 |   fastapi.routing
+import time:       700 |       2620 | app.main
+"""
+
+
+def test_parse_importtime_and_summarize():
+    rows = parse_importtime(IMPORTTIME)
+    assert [r["module"] for r in rows] == [
+        "argon2._utils",
+        "argon2",
+        "fastapi.routing",
+        "app.main",
+    ]
+    assert rows[0]["depth"] == 2 and rows[0]["self_ms"] == 0.12
+
+    report = summarize(rows, "app.main", top=2)
+    assert report["total_ms"] == 2.62
+    assert [m["module"] for m in report["slowest_modules"]] == [
+        "app.main",
+        "fastapi.routing",
+    ]
+    assert report["packages_self_ms"] == {"fastapi": 1.5, "app": 0.7}
+
+
+def test_importing_the_app_defers_heavy_modules_and_is_fork_safe():
+    code = (
+        "import sys, app.main\n"
+        "from app.core.forksafety import assert_fork_safe\n"
+        "assert_fork_safe()\n"
+        "print(','.join(m for m in ('argon2', 'httpx', 'requests') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_assert_fork_safe_rejects_a_pool_created_before_fork(monkeypatch):
+    monkeypatch.setattr(cursor, "pool", object())
+    with pytest.raises(RuntimeError, match="database pool"):
+        forksafety.assert_fork_safe()
+
+
+def test_executor_starts_over_in_a_forked_child():
+    executor = HashingExecutor(max_workers=1, max_pending=2)
+    executor._pool = object()
+    executor._pending = 2
+    executor._after_fork_in_child()
+    assert executor._pool is None and executor.pending == 0
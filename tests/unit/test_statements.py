@@ -0,0 +1,57 @@
+import pytest
+from app.infrastructure.db.statements import StatementRegistry
+
+
+class FakeConnection:
+    prepared_max = 100
+
+
+class FakeCursor:
+    def __init__(self, connection, fail=False):
+        self.connection = connection
+        self.fail = fail
+        self.executed = []
+
+    async def execute(self, sql, params=None, prepare=None):
+        if self.fail:
+            raise RuntimeError("boom")
+        self.executed.append((sql, params, prepare))
+
+
+def test_duplicate_names_are_rejected():
+    registry = StatementRegistry()
+    registry.register("users.by_id", "SELECT 1")
+    with pytest.raises(ValueError):
+        registry.register("users.by_id", "SELECT 2")
+
+
+@pytest.mark.asyncio
+async def test_counts_executions_and_first_uses_per_connection():
+    registry = StatementRegistry()
+    stmt = registry.register("users.by_id", "SELECT * FROM users WHERE id = %s")
+    conn_a, conn_b = FakeConnection(), FakeConnection()
+    await registry.configure(conn_a)
+
+    cur = FakeCursor(conn_a)
+    await registry.execute(cur, stmt, (1,))
+    await registry.execute(cur, stmt, (2,))
+    await registry.execute(FakeCursor(conn_b), stmt, (3,))
+
+    assert cur.executed[0] == (stmt.sql, (1,), True)
+    stats = registry.stats()["users.by_id"]
+    assert stats["executions"] == 3
+    assert stats["first_uses"] == 2
+    assert stats["errors"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_are_counted_and_raised():
+    registry = StatementRegistry(prepare=False)
+    stmt = registry.register("users.by_id", "SELECT 1")
+
+    with pytest.raises(RuntimeError):
+        await registry.execute(FakeCursor(FakeConnection(), fail=True), stmt)
+    stats = registry.stats()["users.by_id"]
+    assert stats["executions"] == 1
+    assert stats["errors"] == 1
+    assert stats["first_uses"] == 0
@@ -0,0 +1,48 @@
+import pytest
+from app.domain.interfaces.token_repo import TokenRepo
+from app.domain.services.token_reaper_service import TokenReaperService
+
+
+class FakeTokenRepo(TokenRepo):
+    def __init__(self, consumed, expired):
+        self.consumed = consumed
+        self.expired = expired
+        self.calls = []
+
+    async def delete_consumed(self, limit):
+        deleted = min(limit, self.consumed)
+        self.consumed -= deleted
+        self.calls.append(("consumed", deleted))
+        return deleted
+
+    async def delete_expired(self, limit, grace_seconds):
+        deleted = min(limit, self.expired)
+        self.expired -= deleted
+        self.calls.append(("expired", deleted))
+        return deleted
+
+
+@pytest.mark.asyncio
+async def test_reaper_drains_in_bounded_batches():
+    repo = FakeTokenRepo(consumed=25, expired=10)
+    service = TokenReaperService(repo, batch_size=10, grace_seconds=60)
+
+    report = await service.run_once()
+
+    assert (report["consumed"], report["expired"]) == (25, 10)
+    assert repo.calls == [
+        ("consumed", 10),
+        ("consumed", 10),
+        ("consumed", 5),
+        ("expired", 10),
+        ("expired", 0),
+    ]
+    assert report["batches"] == 5
+
+
+@pytest.mark.asyncio
+async def test_reaper_with_nothing_to_do():
+    report = await TokenReaperService(
+        FakeTokenRepo(0, 0), batch_size=10, grace_seconds=60
+    ).run_once()
+    assert (report["consumed"], report["expired"], report["batches"]) == (0, 0, 2)
@@ -0,0 +1,153 @@
+import pytest
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from app.domain.entities.token import ActivationToken
+from app.domain.entities.user import User
+from app.infrastructure.cache.memory import MISSING, InMemoryBackend, TTLCache
+from app.infrastructure.cache.user_repo_cached import CachedUserRepo, UserCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingUserRepo:
+    def __init__(self, user=None, token=None):
+        self.user = user
+        self.token = token
+        self.calls = 0
+        self.token_reads = 0
+
+    async def get_by_email(self, email):
+        self.calls += 1
+        return self.user
+
+    async def get_with_active_token(self, email):
+        self.calls += 1
+        return self.user, self.token
+
+    async def get_active_token(self, user_id):
+        self.token_reads += 1
+        return self.token
+
+    async def create_with_token(self, email, password_hash, code_hash, code):
+        self.user = User(
+            id=1, email=email, is_active=False, password_hash=password_hash
+        )
+        return 1
+
+    async def activate_with_token(self, user_id, token_id, max_failed_attempts):
+        self.user = replace(self.user, is_active=True)
+        self.token = None
+        return True
+
+
+def make_cache(shared=None):
+    return UserCache(max_entries=100, ttl=5, negative_ttl=1, shared=shared)
+
+
+def test_ttl_cache_evicts_lru_and_expires():
+    clock = FakeClock()
+    cache = TTLCache(max_entries=2, clock=clock)
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=1)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3, ttl=10)
+    assert cache.get("b") is MISSING
+    assert cache.evictions == 1
+
+    clock.now = 11
+    assert cache.get("a") is MISSING
+    assert cache.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_lookups_hit_the_cache():
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="h")
+    inner = CountingUserRepo(user)
+    repo = CachedUserRepo(inner, make_cache())
+
+    assert await repo.get_by_email("u@example.com") is user
+    assert await repo.get_by_email("U@Example.com") is user
+    assert inner.calls == 1
+    assert repo.cache.stats()["local"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_create_invalidates_negative_entry():
+    inner = CountingUserRepo()
+    repo = CachedUserRepo(inner, make_cache())
+
+    assert await repo.get_by_email("u@example.com") is None
+    await repo.create_with_token("u@example.com", "h", "ch", "1234")
+    assert (await repo.get_by_email("u@example.com")).id == 1
+    assert inner.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_activation_invalidates_by_user_id():
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="h")
+    inner = CountingUserRepo(user)
+    repo = CachedUserRepo(inner, make_cache())
+
+    assert not (await repo.get_by_email("u@example.com")).is_active
+    await repo.activate_with_token(1, 7, 5)
+    assert (await repo.get_by_email("u@example.com")).is_active
+    assert inner.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_activation_caches_the_user_but_reads_the_token():
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="h")
+    token = ActivationToken(
+        id=7,
+        user_id=1,
+        code_hash="ch",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    inner = CountingUserRepo(user, token)
+    repo = CachedUserRepo(inner, make_cache())
+
+    assert (await repo.get_with_active_token("u@example.com"))[1] is token
+    # a resend in another worker replaces the hash under the same token id
+    inner.token = replace(token, code_hash="new")
+    assert (await repo.get_with_active_token("u@example.com"))[1].code_hash == "new"
+    assert await repo.get_by_email("u@example.com") is user
+    assert (inner.calls, inner.token_reads) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_serves_misses_but_never_credentials():
+    shared = InMemoryBackend()
+    user = User(id=1, email="u@example.com", is_active=False, password_hash="h")
+    token = ActivationToken(
+        id=7,
+        user_id=1,
+        code_hash="ch",
+        expires_at=datetime.now(timezone.utc) + timedelta(minutes=1),
+        consumed_at=None,
+    )
+    worker_a = CachedUserRepo(CountingUserRepo(user, token), make_cache(shared))
+    inner_b = CountingUserRepo()
+    worker_b = CachedUserRepo(inner_b, make_cache(shared))
+
+    await worker_a.get_with_active_token("u@example.com")
+    await worker_a.get_by_email("u@example.com")
+    assert await shared.get("user:activation:u@example.com") is None
+    assert await shared.get("user:email:u@example.com") is None
+
+    # a miss in one worker is a hit in the other
+    assert await worker_b.get_by_email("nobody@example.com") is None
+    assert (
+        await CachedUserRepo(CountingUserRepo(user), make_cache(shared)).get_by_email(
+            "nobody@example.com"
+        )
+        is None
+    )
+    assert inner_b.calls == 1
+    assert await shared.get("user:email:nobody@example.com") is not None